@@ -0,0 +1,98 @@
+"""
+Микробенчмарк разбора дат RSS/Atom
+
+Запуск: python benchmarks/date_parser_bench.py [--repeat N]
+Сравнивает date_parser (с запоминанием формата ленты) с прежним RSSParser.parse_date.
+"""
+import re
+import sys
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bot.utils.date_parser import DateParser
+
+# Даты в том виде, в каком их отдают ленты из config.RSS_FEEDS: (лента, дата)
+CORPUS = [
+    ("https://lenta.ru/rss", "Sat, 17 Oct 2026 21:04:00 +0300"),
+    ("https://lenta.ru/rss", "Sat, 17 Oct 2026 20:41:37 +0300"),
+    ("https://ria.ru/export/rss2/archive/index.xml", "Sat, 17 Oct 2026 21:05:12 +0300"),
+    ("https://www.vedomosti.ru/rss/news", "Sat, 17 Oct 2026 18:02:45 +0000"),
+    ("https://tass.ru/rss/v2.xml", "Sat, 17 Oct 2026 21:00:05 +0300"),
+    ("https://habr.com/ru/rss/all/all/", "Sat, 17 Oct 2026 17:48:09 GMT"),
+    ("https://feeds.bbci.co.uk/news/world/rss.xml", "Sat, 17 Oct 2026 17:52:31 GMT"),
+    ("https://techcrunch.com/feed/", "Sat, 17 Oct 2026 16:30:11 +0000"),
+    ("https://www.theverge.com/rss/index.xml", "2026-10-17T12:45:03-04:00"),
+    ("https://www.wired.com/feed/rss", "Sat, 17 Oct 2026 15:00:00 +0000"),
+    ("https://rss.nytimes.com/services/xml/rss/nyt/World.xml", "Sat, 17 Oct 2026 13:12:45 EDT"),
+    ("https://www.reddit.com/r/technology/.rss", "2026-10-17T17:22:11+00:00"),
+    ("https://github.blog/feed/", "Fri, 16 Oct 2026 16:00:41 +0000"),
+    ("https://www.youtube.com/feeds/videos.xml", "2026-10-17T14:00:07+00:00"),
+    ("https://openai.com/news/rss.xml", "Thu, 15 Oct 2026 10:00:00 GMT"),
+    ("https://export.arxiv.org/rss/cs.AI", "Sat, 17 Oct 2026 00:00:00 -0400"),
+    ("https://www.rbc.ru/rss", "Sat, 17 Oct 2026 20:55:00 +0300"),
+    ("https://www.kommersant.ru/RSS/news.xml", "Sat, 17 Oct 2026 20:58:41 +0300"),
+    ("https://blog.google/rss/", "Fri, 16 Oct 2026 17:00:00 +0000"),
+    ("https://www.dw.com/rss", "Sat, 17 Oct 2026 18:44:00 Z"),
+    ("https://feeds.arstechnica.com/arstechnica/index", "Sat, 17 Oct 2026 16:21:09 +0000"),
+    ("https://atom.example/medium", "2026-10-17T16:21:09.123Z"),
+    ("https://atom.example/blogger", "2026-10-17T19:21:09.123+03:00"),
+    ("https://atom.example/wordpress", "2026-10-17 19:21:09"),
+    ("https://rss.example/short-year", "17 Oct 26 19:21 +0300"),
+]
+
+def legacy_parse_date(date_str: str):
+    """Прежний RSSParser.parse_date (без feedparser, если он не установлен)"""
+    try:
+        import feedparser
+        parsed_time = feedparser._parse_date(date_str)
+        if parsed_time:
+            return datetime(*parsed_time[:6])
+    except Exception:
+        pass
+
+    formats = [
+        '%a, %d %b %Y %H:%M:%S %z',
+        '%a, %d %b %Y %H:%M:%S %Z',
+        '%Y-%m-%dT%H:%M:%S%z',
+        '%Y-%m-%dT%H:%M:%SZ',
+        '%Y-%m-%d %H:%M:%S',
+        '%Y-%m-%d',
+    ]
+    for fmt in formats:
+        try:
+            clean_date = re.sub(r'\s*$$[^)]+$$', '', date_str.strip())
+            return datetime.strptime(clean_date, fmt.replace('%z', '').replace('%Z', ''))
+        except ValueError:
+            continue
+    return None
+
+def bench(name: str, func, repeat: int):
+    parsed = sum(1 for feed_url, date_str in CORPUS if func(date_str, feed_url))
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for feed_url, date_str in CORPUS:
+            func(date_str, feed_url)
+    elapsed = time.perf_counter() - started
+    per_call = elapsed / (repeat * len(CORPUS)) * 1e6
+    print(f"{name:<24} {per_call:8.2f} мкс/дата   разобрано {parsed}/{len(CORPUS)}")
+    return per_call
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--repeat', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    learning = DateParser()
+    cold = DateParser()
+
+    legacy = bench("legacy parse_date", lambda date_str, feed_url: legacy_parse_date(date_str), args.repeat)
+    bench("date_parser без ленты", lambda date_str, feed_url: cold.parse(date_str), args.repeat)
+    fast = bench("date_parser с лентой", learning.parse, args.repeat)
+    print(f"Ускорение: x{legacy / fast:.1f}, статистика: {learning.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Бенчмарк очистки HTML в описаниях новостей
+
+Запуск: python benchmarks/html_cleaner_bench.py [--repeat N]
+Сравнивает однопроходные clean_html/clean_html_entities из html_utils
+с прежними RSSParser.clean_html и html_utils.clean_html_entities.
+"""
+import re
+import sys
+import html
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bot.utils.html_utils import clean_html, clean_html_entities
+
+# Описания записей в том виде, в каком их отдают ленты (после разбора XML)
+SUMMARIES = [
+    '<p>Президент подписал закон о&nbsp;поддержке IT-отрасли. Документ опубликован на&nbsp;портале правовой информации.</p>',
+    '<img src="https://icdn.lenta.ru/images/2026/10/17/21/20261017210400123/pic_3c6b.jpg" width="300" /><p>&laquo;Мы ожидаем роста&raquo;, &mdash; заявил глава ЦБ. Ставка сохранена на&nbsp;уровне 16%.</p>',
+    '<div class="field field-name-body"><p>Компания представила новую модель &ndash; она быстрее предыдущей на 40%&hellip;</p><p><a href="https://habr.com/ru/articles/1/?utm_source=habrahabr&amp;utm_medium=rss">Читать далее</a></p></div>',
+    'OpenAI announced a new reasoning model on Thursday, saying it &#8220;outperforms&#8221; previous versions on math &amp; coding benchmarks.',
+    '<p>The company&rsquo;s shares rose 5% after it reported record revenue.</p>\n<p>Analysts said the results &#8212; driven by cloud &#8212; beat expectations.</p>',
+    '<figure><img src="https://cdn.example.com/a.jpg" alt=""/><figcaption>Фото: пресс-служба</figcaption></figure>\n\n  Команда выиграла   матч со счетом 3:1.<br/><br/>Следующая игра &mdash; в субботу.',
+    'Новая версия Python 3.15 вышла с поддержкой free-threading и JIT-компилятором.',
+    '<![CDATA[ignored]]><p><strong>Срочно:</strong> землетрясение магнитудой 6,1 произошло у&nbsp;берегов Японии. Угрозы цунами нет.</p>',
+] * 4
+
+RSS_ENTITIES = {
+    '&amp;': '&', '&lt;': '<', '&gt;': '>', '&quot;': '"', '&apos;': "'", '&nbsp;': ' ',
+    '&laquo;': '«', '&raquo;': '»', '&ldquo;': '"', '&rdquo;': '"', '&lsquo;': "'", '&rsquo;': "'",
+    '&mdash;': '—', '&ndash;': '–', '&hellip;': '…', '&#8220;': '"', '&#8221;': '"',
+    '&#8216;': "'", '&#8217;': "'", '&#8212;': '—', '&#8211;': '–', '&#8230;': '…',
+}
+
+def legacy_rss_clean_html(text: str) -> str:
+    """Прежний RSSParser.clean_html: regex по тегам + 22 прохода str.replace + regex по пробелам"""
+    text = re.sub(r'<[^>]+>', '', text)
+    for entity, replacement in RSS_ENTITIES.items():
+        text = text.replace(entity, replacement)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def legacy_clean_html_entities(text: str) -> str:
+    """Прежний html_utils.clean_html_entities: html.unescape + 17 проходов str.replace"""
+    text = html.unescape(text)
+    for entity in ('&laquo;', '&raquo;', '&ldquo;', '&rdquo;', '&lsquo;', '&rsquo;', '&mdash;', '&ndash;',
+                   '&hellip;', '&#8220;', '&#8221;', '&#8216;', '&#8217;', '&#8212;', '&#8211;', '&#8230;', '&nbsp;'):
+        text = text.replace(entity, RSS_ENTITIES[entity])
+    return text
+
+def bench(name: str, func, repeat: int) -> float:
+    size = sum(len(summary) for summary in SUMMARIES)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for summary in SUMMARIES:
+            func(summary)
+    elapsed = time.perf_counter() - started
+    throughput = size * repeat / elapsed / 1e6
+    print(f"{name:<32} {throughput:8.2f} млн символов/с")
+    return throughput
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--repeat', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    legacy = bench("legacy RSSParser.clean_html", legacy_rss_clean_html, args.repeat)
+    current = bench("html_utils.clean_html", clean_html, args.repeat)
+    print(f"Ускорение: x{current / legacy:.2f}")
+
+    legacy = bench("legacy clean_html_entities", legacy_clean_html_entities, args.repeat)
+    current = bench("html_utils.clean_html_entities", clean_html_entities, args.repeat)
+    print(f"Ускорение: x{current / legacy:.2f}")
+
+    print("\nПример:", clean_html(SUMMARIES[1]))
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import asyncio
 from aiogram import Bot
-from database import Session, User
-from bot.user_manager import get_favorites, is_night_enabled, get_subscription
+from bot.subscriber_index import subscriber_index
+from bot.services.delivery import delivery_queue, deliver, lane_for_level
 
 # 🔧 Здесь должна быть твоя логика получения свежей новости
 async def get_fresh_news_for(category: str) -> str:
@@ -9,27 +9,18 @@ async def get_fresh_news_for(category: str) -> str:
     return f"📣 Свежая новость по теме {category}!"
 
 async def auto_news_sender(bot: Bot):
+    delivery_queue.start(bot)
     while True:
-        session = Session()
-        users = session.query(User).filter(User.subscription_level > 0).all()
+        # Подписчики и их избранное — из индекса, один запрос за цикл
+        await subscriber_index.refresh()
 
-        for user in users:
-            user_id = user.telegram_id
-            level = user.subscription_level
-            now_hour = int(asyncio.get_event_loop().time() // 3600 % 24)
-
-            # Ночные ограничения
-            if not is_night_enabled(user_id) and (now_hour < 7 or now_hour >= 22):
-                continue
-
-            favorites = get_favorites(user_id)
+        for user_id, level, favorites in subscriber_index.subscribed_users():
             limit = 3 if level == 1 else 6
-            for category in favorites[:limit]:
-                news = await get_fresh_news_for(category)
-                try:
-                    await bot.send_message(user_id, news)
-                except Exception:
-                    pass  # user blocked bot, etc.
+            # Ночные ограничения по местному времени пользователя применяет deliver():
+            # в тихие часы новости копятся в дайджест до утра
+            await deliver([
+                (user_id, None, await get_fresh_news_for(category))
+                for category in favorites[:limit]
+            ], lane=lane_for_level(level))
 
-        session.close()
         await asyncio.sleep(600)  # каждые 10 минут
@@ -59,6 +59,18 @@ class Config:
     NEWS_ARCHIVE_PATH: str = os.getenv('NEWS_ARCHIVE_PATH', '/app/news_archive')
     MAX_NEWS_PER_CATEGORY: int = int(os.getenv('MAX_NEWS_PER_CATEGORY', '50'))
     NEWS_CACHE_HOURS: int = int(os.getenv('NEWS_CACHE_HOURS', '48'))
+    NEWS_STORAGE_BACKEND: str = os.getenv('NEWS_STORAGE_BACKEND', 'sqlite')
+    NEWS_DB_PATH: str = os.getenv('NEWS_DB_PATH', '')
+    HOT_CACHE_MAX_ITEMS: int = int(os.getenv('HOT_CACHE_MAX_ITEMS', '1000'))
+    HOT_CACHE_LATEST_SIZE: int = int(os.getenv('HOT_CACHE_LATEST_SIZE', '50'))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv('USER_CACHE_TTL_SECONDS', '300'))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000'))
+    READ_HISTORY_TTL_HOURS: int = int(os.getenv('READ_HISTORY_TTL_HOURS', '72'))
+    READ_HISTORY_MAX_PER_USER: int = int(os.getenv('READ_HISTORY_MAX_PER_USER', '500'))
+    READ_HISTORY_CACHED_USERS: int = int(os.getenv('READ_HISTORY_CACHED_USERS', '5000'))
+    READ_HISTORY_FLUSH_SIZE: int = int(os.getenv('READ_HISTORY_FLUSH_SIZE', '200'))
+    READ_HISTORY_FLUSH_SECONDS: int = int(os.getenv('READ_HISTORY_FLUSH_SECONDS', '5'))
+    INCREMENTAL_PROCESSING: bool = os.getenv('INCREMENTAL_PROCESSING', 'true').lower() == 'true'
     
     # Bot Settings
     DEBUG: bool = os.getenv('DEBUG', 'false').lower() == 'true'
@@ -70,16 +82,58 @@ class Config:
     UPDATE_INTERVAL_MINUTES: int = int(os.getenv('UPDATE_INTERVAL_MINUTES', '10'))
     CLEANUP_INTERVAL_HOURS: int = int(os.getenv('CLEANUP_INTERVAL_HOURS', '6'))
     REPORT_INTERVAL_HOURS: int = int(os.getenv('REPORT_INTERVAL_HOURS', '24'))
+    MAX_PARALLEL_CATEGORIES: int = int(os.getenv('MAX_PARALLEL_CATEGORIES', '3'))
+    INGEST_INTERVAL_SECONDS: int = int(os.getenv('INGEST_INTERVAL_SECONDS', '600'))
     
     # AI Processing Settings
     MAX_RETRIES: int = int(os.getenv('MAX_RETRIES', '3'))
     AI_TIMEOUT_SECONDS: int = int(os.getenv('AI_TIMEOUT_SECONDS', '30'))
     BATCH_SIZE: int = int(os.getenv('BATCH_SIZE', '5'))
+    AI_MAX_CONCURRENT_REQUESTS: int = int(os.getenv('AI_MAX_CONCURRENT_REQUESTS', '4'))
+    AI_REQUESTS_PER_SECOND: float = float(os.getenv('AI_REQUESTS_PER_SECOND', '2'))
+    AI_TOKENS_PER_MINUTE: int = int(os.getenv('AI_TOKENS_PER_MINUTE', '60000'))
+    AI_MAX_BACKOFF_SECONDS: int = int(os.getenv('AI_MAX_BACKOFF_SECONDS', '60'))
+    AI_CACHE_TTL_HOURS: int = int(os.getenv('AI_CACHE_TTL_HOURS', '72'))
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv('AI_CACHE_MAX_ENTRIES', '5000'))
+    
+    # HTTP Fetch Settings
+    HTTP_TIMEOUT_SECONDS: int = int(os.getenv('HTTP_TIMEOUT_SECONDS', '30'))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv('HTTP_MAX_CONNECTIONS', '40'))
+    HTTP_MAX_PER_HOST: int = int(os.getenv('HTTP_MAX_PER_HOST', '2'))
+    HTTP_DNS_CACHE_TTL: int = int(os.getenv('HTTP_DNS_CACHE_TTL', '600'))
+    HTTP_KEEPALIVE_TIMEOUT: int = int(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '60'))
+    
+    # Feed Parsing Settings
+    PARSE_WORKERS: int = int(os.getenv('PARSE_WORKERS', '2'))  # 0 - разбор в event loop
+    PARSE_INLINE_MAX_BYTES: int = int(os.getenv('PARSE_INLINE_MAX_BYTES', '32768'))
+    FEED_STREAMING: bool = os.getenv('FEED_STREAMING', 'true').lower() == 'true'
+    FEED_MAX_BYTES: int = int(os.getenv('FEED_MAX_BYTES', str(5 * 1024 * 1024)))
+    FEED_STREAM_CHUNK: int = int(os.getenv('FEED_STREAM_CHUNK', '65536'))
+    FEED_STALE_ENTRIES_STOP: int = int(os.getenv('FEED_STALE_ENTRIES_STOP', '5'))  # подряд устаревших записей до остановки
+    
+    # Near-Duplicate Settings
+    NEAR_DUP_THRESHOLD: float = float(os.getenv('NEAR_DUP_THRESHOLD', '0.6'))  # оценка сходства Жаккара
+    NEAR_DUP_WINDOW_HOURS: int = int(os.getenv('NEAR_DUP_WINDOW_HOURS', '48'))
+    NEAR_DUP_PERMUTATIONS: int = int(os.getenv('NEAR_DUP_PERMUTATIONS', '64'))
+    NEAR_DUP_BANDS: int = int(os.getenv('NEAR_DUP_BANDS', '16'))
     
     # Telegram Message Limits
     MAX_MESSAGE_LENGTH: int = 4096
     MAX_CAPTION_LENGTH: int = 1024
     
+    # Delivery Queue Settings
+    TELEGRAM_GLOBAL_RATE: float = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))
+    TELEGRAM_CHAT_RATE: float = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+    DELIVERY_WORKERS: int = int(os.getenv('DELIVERY_WORKERS', '4'))
+    DELIVERY_BACKEND: str = os.getenv('DELIVERY_BACKEND', 'local')  # local | rq
+    
+    # Quiet Hours Settings
+    DEFAULT_TIMEZONE: str = os.getenv('DEFAULT_TIMEZONE', 'Europe/Moscow')
+    QUIET_HOURS_START: int = int(os.getenv('QUIET_HOURS_START', '22'))
+    QUIET_HOURS_END: int = int(os.getenv('QUIET_HOURS_END', '7'))
+    QUIET_DIGEST_MAX_ITEMS: int = int(os.getenv('QUIET_DIGEST_MAX_ITEMS', '10'))
+    QUIET_RELEASE_PER_SECOND: float = float(os.getenv('QUIET_RELEASE_PER_SECOND', '5'))
+    
     # News Processing Settings - убрано ограничение на минимальный возраст
     MAX_NEWS_AGE_HOURS: int = 48
     
@@ -113,6 +167,7 @@ class Config:
         logger.info(f"👑 Admin ID: {cls.ADMIN_ID}")
         logger.info(f"📁 Archive Path: {cls.NEWS_ARCHIVE_PATH}")
         logger.info(f"🔄 Update Interval: {cls.UPDATE_INTERVAL_MINUTES} min")
+        logger.info(f"🧵 Parallel Categories: {cls.MAX_PARALLEL_CATEGORIES}")
         logger.info(f"📰 Max News Age: {cls.MAX_NEWS_AGE_HOURS} hours")
 
 # Создаем экземпляр конфигурации
@@ -14,10 +14,17 @@ engine = create_engine(DB_URL, echo=False)
 # Сессии для синхронного кода (например, Alembic, RSS-парсеры и рассылки)
 Session = sessionmaker(bind=engine)
 
-# 🚀 Необязательно: если хочешь использовать асинхронные сессии
-# ASYNC_DB_URL = DB_URL.replace("postgresql+psycopg2", "postgresql+asyncpg")
-# async_engine = create_async_engine(ASYNC_DB_URL, echo=False)
-# AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+# 🚀 Асинхронный движок (asyncpg) для кода внутри event loop: воркеры, рассылки, пользователи
+ASYNC_DB_URL = DB_URL.replace("postgresql+psycopg2://", "postgresql://", 1).replace("postgresql://", "postgresql+asyncpg://", 1)
+async_engine = create_async_engine(
+    ASYNC_DB_URL,
+    echo=False,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_pre_ping=True,
+    pool_recycle=1800,
+)
+AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
 
 # Утилита для создания всех таблиц вручную (если не используешь Alembic)
 def init_db():
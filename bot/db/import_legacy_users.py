@@ -0,0 +1,118 @@
+"""Однократный перенос пользователей из прежней SQLite базы (bot.db) в Postgres
+
+Прежний bot/database.py хранил пользователей в sqlite:///bot.db, telegram_id там
+мог быть строкой. Скрипт приводит id к BIGINT и пишет пачками в таблицу users:
+
+    python -m bot.db.import_legacy_users bot.db
+    python -m bot.db.import_legacy_users bot.db --overwrite
+
+По умолчанию пользователи, уже появившиеся в Postgres, не меняются;
+--overwrite заменяет их данными из SQLite. Повторный запуск безопасен.
+"""
+import argparse
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+
+from bot.db.database import Session
+from bot.models import User
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _favorites(raw) -> str:
+    """Избранное в JSON; поврежденное значение заменяется пустым списком"""
+    try:
+        favorites = json.loads(raw) if raw else []
+    except (TypeError, ValueError):
+        return "[]"
+    return json.dumps(favorites) if isinstance(favorites, list) else "[]"
+
+
+def convert_row(row: Dict) -> Optional[Dict]:
+    """Строка SQLite -> значения для users; None - если telegram_id не число"""
+    try:
+        telegram_id = int(str(row["telegram_id"]).strip())
+    except (TypeError, ValueError):
+        return None
+
+    return {
+        "telegram_id": telegram_id,
+        "subscription_level": int(row.get("subscription_level") or 0),
+        "night_news": bool(row.get("night_news") or False),
+        "favorite_categories": _favorites(row.get("favorite_categories")),
+    }
+
+
+def read_legacy_users(db_path: Path) -> List[Dict]:
+    """Читает пользователей прежней базы; отсутствующие в старой схеме колонки берутся по умолчанию"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = [dict(row) for row in conn.execute("SELECT * FROM users")]
+    finally:
+        conn.close()
+
+    users = {}
+    for row in rows:
+        user = convert_row(row)
+        if user is None:
+            logger.warning(f"⚠️ Пропущен пользователь с некорректным telegram_id: {row.get('telegram_id')!r}")
+            continue
+        # Один id мог встречаться как '123' и 123 - остается последняя запись
+        users[user["telegram_id"]] = user
+    return list(users.values())
+
+
+def import_users(users: List[Dict], overwrite: bool = False) -> int:
+    """Пишет пользователей в Postgres одной транзакцией, возвращает число записанных"""
+    imported = 0
+    session = Session()
+    try:
+        for start in range(0, len(users), BATCH_SIZE):
+            statement = insert(User).values(users[start:start + BATCH_SIZE])
+            if overwrite:
+                statement = statement.on_conflict_do_update(
+                    index_elements=[User.telegram_id],
+                    set_={
+                        "subscription_level": statement.excluded.subscription_level,
+                        "night_news": statement.excluded.night_news,
+                        "favorite_categories": statement.excluded.favorite_categories,
+                    },
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=[User.telegram_id])
+            imported += session.execute(statement).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос пользователей из SQLite (bot.db) в Postgres")
+    parser.add_argument("db_path", nargs="?", default="bot.db", type=Path, help="путь к прежней базе bot.db")
+    parser.add_argument("--overwrite", action="store_true", help="заменять пользователей, уже существующих в Postgres")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s: %(message)s")
+
+    if not args.db_path.exists():
+        parser.error(f"файл не найден: {args.db_path}")
+
+    users = read_legacy_users(args.db_path)
+    imported = import_users(users, overwrite=args.overwrite)
+    logger.info(f"📦 Перенесено пользователей: {imported} из {len(users)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy.dialects.postgresql import insert
+
+from bot.models import News, NewsUid
+
+# Размер пачки для одного многострочного INSERT
+INSERT_BATCH_SIZE = 500
+
+
+def entry_to_row(entry, category: str) -> Dict:
+    """Преобразует запись feedparser в строку таблицы news"""
+    return {
+        "uid": hashlib.md5(entry.link.encode()).hexdigest(),
+        "title": entry.get("title", ""),
+        "link": entry.link,
+        "category": category,
+        "summary": entry.get("summary", "")[:1000],
+        "published": datetime.now(),
+    }
+
+
+async def insert_new_news(session, rows: List[Dict]) -> List[Dict]:
+    """Пакетно вставляет новости и возвращает только действительно новые строки
+
+    Сначала uid занимаются в news_uids (INSERT ... ON CONFLICT DO NOTHING RETURNING):
+    в секционированной news первичный ключ (uid, published) не мешает двум воркерам
+    вставить одну ссылку, а news_uids - мешает. Параллельный воркер ждет коммита
+    первого и получает пустой RETURNING. Затем в news вставляются только занятые uid.
+    """
+    # Убираем повторы внутри пачки (одна ссылка в нескольких лентах)
+    unique_rows = {}
+    for row in rows:
+        unique_rows.setdefault(row["uid"], row)
+
+    if not unique_rows:
+        return []
+
+    now = datetime.now()
+    claimed = set()
+    uids = list(unique_rows)
+    for start in range(0, len(uids), INSERT_BATCH_SIZE):
+        stmt = (
+            insert(NewsUid)
+            .values([{"uid": uid, "seen_at": now} for uid in uids[start:start + INSERT_BATCH_SIZE]])
+            .on_conflict_do_nothing(index_elements=[NewsUid.uid])
+            .returning(NewsUid.uid)
+        )
+        claimed.update(await session.scalars(stmt))
+
+    candidates = [row for uid, row in unique_rows.items() if uid in claimed]
+
+    inserted = []
+    for start in range(0, len(candidates), INSERT_BATCH_SIZE):
+        batch = candidates[start:start + INSERT_BATCH_SIZE]
+        stmt = (
+            insert(News)
+            .values(batch)
+            # uid уже занят в news_uids; конфликт возможен только со строками до миграции
+            .on_conflict_do_nothing()
+            .returning(News.uid, News.title, News.link, News.category, News.summary, News.published)
+        )
+        inserted.extend(dict(row) for row in (await session.execute(stmt)).mappings())
+
+    await session.commit()
+    return inserted
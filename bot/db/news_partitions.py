@@ -0,0 +1,95 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import List
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Секционирование news по дням: news_YYYYMMDD + news_default для записей вне диапазона
+PARTITION_PREFIX = "news_"
+DEFAULT_PARTITION = "news_default"
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def create_partition_sql(day: date) -> str:
+    """DDL секции за день [day, day + 1)"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF news "
+        f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+    )
+
+
+def partition_day(name: str):
+    """Дата секции по имени, None для news_default и чужих таблиц"""
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+async def is_partitioned(session) -> bool:
+    result = await session.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'news')"
+    ))
+    return bool(result)
+
+
+async def list_partitions(session) -> List[str]:
+    result = await session.scalars(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "WHERE parent.relname = 'news'"
+    ))
+    return list(result)
+
+
+async def ensure_partitions(session, days_ahead: int = 3) -> List[str]:
+    """Создает секции на сегодня и несколько дней вперед, возвращает не созданные
+
+    Секция не создается, если в news_default уже есть строки ее дня - каждая
+    попытка идет в своей точке сохранения, чтобы не обрывать транзакцию.
+    """
+    failed = []
+    today = date.today()
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        try:
+            async with session.begin_nested():
+                await session.execute(text(create_partition_sql(day)))
+        except Exception:
+            failed.append(partition_name(day))
+    return failed
+
+
+async def drop_expired_partitions(session, threshold: datetime) -> List[str]:
+    """Удаляет секции, все записи которых старше threshold"""
+    dropped = []
+    for name in await list_partitions(session):
+        day = partition_day(name)
+        if day is not None and datetime.combine(day + timedelta(days=1), datetime.min.time()) <= threshold:
+            await session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+
+    # Редкие записи вне диапазона секций удаляются обычным DELETE
+    await session.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE published < :threshold"),
+        {"threshold": threshold},
+    )
+    return dropped
+
+
+async def maintain_partitions(session, days_ahead: int = 3) -> bool:
+    """Заранее создает секции, если news секционирована; False - таблица обычная"""
+    if not await is_partitioned(session):
+        return False
+    failed = await ensure_partitions(session, days_ahead)
+    await session.commit()
+    if failed:
+        logger.error(f"❌ Не созданы секции news (строки уже в {DEFAULT_PARTITION}): {failed}")
+    return True
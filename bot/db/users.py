@@ -0,0 +1,106 @@
+import json
+from typing import List, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from bot.db.database import AsyncSessionLocal
+from bot.models import User
+
+# Доступ к пользователям поверх async_engine; кеш профилей - bot/services/user_profiles.py
+
+
+def parse_favorites(raw) -> List[str]:
+    try:
+        return json.loads(raw) if raw else []
+    except Exception:
+        return []
+
+
+async def get_or_create_user(telegram_id: int) -> User:
+    async with AsyncSessionLocal() as session:
+        user = await session.get(User, telegram_id)
+        if not user:
+            user = User(telegram_id=telegram_id)
+            session.add(user)
+            await session.commit()
+        return user
+
+
+async def set_subscription(telegram_id: int, level: int):
+    async with AsyncSessionLocal() as session:
+        user = await session.get(User, telegram_id)
+        if user:
+            user.subscription_level = level
+            await session.commit()
+            return user.get_favorites()
+    return None
+
+
+async def get_subscription(telegram_id: int) -> int:
+    async with AsyncSessionLocal() as session:
+        level = await session.scalar(select(User.subscription_level).where(User.telegram_id == telegram_id))
+        return level or 0
+
+
+async def toggle_night_news(telegram_id: int) -> bool:
+    async with AsyncSessionLocal() as session:
+        # Один запрос: вставка с night_news=True или инверсия существующего значения
+        stmt = insert(User).values(telegram_id=telegram_id, night_news=True)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={"night_news": ~User.night_news},
+        ).returning(User.night_news)
+        new_state = await session.scalar(stmt)
+        await session.commit()
+        return bool(new_state)
+
+
+async def is_night_enabled(telegram_id: int) -> bool:
+    async with AsyncSessionLocal() as session:
+        night = await session.scalar(select(User.night_news).where(User.telegram_id == telegram_id))
+        return bool(night)
+
+
+async def save_favorites(telegram_id: int, categories: List[str]):
+    async with AsyncSessionLocal() as session:
+        level = await session.scalar(
+            update(User)
+            .where(User.telegram_id == telegram_id)
+            .values(favorite_categories=json.dumps(categories))
+            .returning(User.subscription_level)
+        )
+        await session.commit()
+        return level
+
+
+async def get_favorites(telegram_id: int) -> List[str]:
+    async with AsyncSessionLocal() as session:
+        raw = await session.scalar(select(User.favorite_categories).where(User.telegram_id == telegram_id))
+    return parse_favorites(raw)
+
+
+async def get_subscribed_users() -> List[Tuple[int, int, bool, str]]:
+    """Все платные подписчики одним запросом: (telegram_id, уровень, ночные новости, избранное)"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(User.telegram_id, User.subscription_level, User.night_news, User.favorite_categories)
+            .where(User.subscription_level > 0)
+        )
+        return [tuple(row) for row in result]
+
+
+async def set_timezone(telegram_id: int, timezone: str):
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(User).where(User.telegram_id == telegram_id).values(timezone=timezone))
+        await session.commit()
+
+
+async def get_profiles(telegram_ids: List[int]) -> List[Tuple[int, int, bool, str, str]]:
+    """Профили пачки пользователей одним запросом: (telegram_id, уровень, ночные новости, избранное, часовой пояс)"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(User.telegram_id, User.subscription_level, User.night_news, User.favorite_categories, User.timezone)
+            .where(User.telegram_id.in_(telegram_ids))
+        )
+        return [tuple(row) for row in result]
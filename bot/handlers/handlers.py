@@ -2,7 +2,6 @@
 Основные обработчики команд и сообщений бота
 """
 import logging
-import asyncio
 from typing import List, Dict, Any
 from aiogram import types
 from aiogram.filters import Command
@@ -12,6 +11,8 @@ from bot.bot_instance import dp, bot
 from bot.data.rss_feeds import RSS_FEEDS
 from bot.utils.rss_parser import parse_rss_feed
 from bot.utils.html_utils import format_news_html
+from bot.services.delivery import delivery_queue, lane_for_level
+from bot.services.user_profiles import user_profiles
 
 logger = logging.getLogger(__name__)
 
@@ -135,18 +136,11 @@ async def process_category_callback(callback_query: types.CallbackQuery):
         # Отправляем новости (максимум 5)
         max_news = min(5, len(news_items))
         
-        for i, news_item in enumerate(news_items[:max_news]):
-            try:
-                formatted_news = format_news_html(news_item)
-                await callback_query.message.answer(formatted_news)
-                
-                # Небольшая задержка между сообщениями
-                if i < max_news - 1:
-                    await asyncio.sleep(0.5)
-                    
-            except Exception as e:
-                logger.error(f"Ошибка отправки новости {i}: {e}")
-                continue
+        # Ответ идет в полосу уровня подписки пользователя, очередь соблюдает лимиты Telegram
+        chat_id = callback_query.message.chat.id
+        lane = lane_for_level(await user_profiles.get_subscription(callback_query.from_user.id))
+        for news_item in news_items[:max_news]:
+            delivery_queue.enqueue(chat_id, format_news_html(news_item), lane=lane)
         
         # Добавляем кнопку "Еще новости"
         more_button = InlineKeyboardMarkup(inline_keyboard=[[
@@ -160,8 +154,10 @@ async def process_category_callback(callback_query: types.CallbackQuery):
             )
         ]])
         
-        await callback_query.message.answer(
+        delivery_queue.enqueue(
+            chat_id,
             f"📰 Показано {max_news} новостей по категории <b>{category}</b>",
+            lane=lane,
             reply_markup=more_button
         )
         
@@ -208,7 +204,7 @@ async def get_news_by_category(category: str) -> List[Dict[str, Any]]:
                 continue
         
         # Сортируем по дате (новые сначала)
-        all_news.sort(key=lambda x: x.get('published_parsed', (0,)), reverse=True)
+        all_news.sort(key=lambda x: x.get('published_timestamp', 0), reverse=True)
         
         logger.info(f"Получено {len(all_news)} новостей для категории {category}")
         return all_news
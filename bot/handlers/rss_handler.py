@@ -21,13 +21,13 @@ async def show_news_categories(message: Message):
 @router.callback_query(F.data.in_(list(RSS_FEEDS.keys())))
 async def send_news_by_category(callback: CallbackQuery):
     category = callback.data
-    url = RSS_FEEDS.get(category)
+    urls = RSS_FEEDS.get(category)
 
-    if not url:
+    if not urls:
         await callback.answer("❌ Неизвестная категория", show_alert=True)
         return
 
-    news = get_first_news(url)
+    news = await get_first_news(urls)
 
     if news:
         title, summary, link = news
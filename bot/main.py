@@ -11,6 +11,9 @@ from bot.config import config
 from bot.bot_instance import bot
 from bot.services.scheduler import news_scheduler
 from bot.utils.together_api import together_api
+from bot.utils.fetch_engine import fetch_engine
+from bot.utils.parse_executor import parse_executor
+from bot.services.delivery import delivery_queue
 
 # Настройка логирования
 logging.basicConfig(
@@ -47,6 +50,9 @@ class NewsBot:
             
             logger.info("✅ AI API работает корректно")
             
+            # Запускаем очередь доставки сообщений
+            delivery_queue.start(bot)
+            
             # Запускаем планировщик
             logger.info("📅 Запуск планировщика новостей...")
             scheduler_task = asyncio.create_task(news_scheduler.start())
@@ -84,6 +90,14 @@ class NewsBot:
         # Останавливаем планировщик
         await news_scheduler.stop()
         
+        # Останавливаем очередь доставки
+        await delivery_queue.stop()
+        
+        # Закрываем общий пул HTTP соединений и сессию AI API
+        await fetch_engine.close()
+        await together_api.close()
+        parse_executor.shutdown()
+        
         # Отменяем все задачи
         for task in self.tasks:
             if not task.done():
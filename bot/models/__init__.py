@@ -1,4 +1,4 @@
 from .user import User
-from .news import News
+from .news import News, NewsUid
 
-__all__ = ["User", "News"]
+__all__ = ["User", "News", "NewsUid"]
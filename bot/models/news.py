@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy import Column, String, Text, DateTime, Index
 from bot.db.base import Base
 
 class News(Base):
@@ -9,4 +9,18 @@ class News(Base):
     link = Column(String)
     category = Column(String)
     summary = Column(Text)
-    published = Column(DateTime)
+    published = Column(DateTime)
+
+    __table_args__ = (
+        # Выборки по категории за окно времени и очистка по возрасту
+        Index("ix_news_category_published", "category", "published"),
+        Index("ix_news_published", "published"),
+    )
+
+
+class NewsUid(Base):
+    """Уникальность uid новостей: в секционированной news первичный ключ (uid, published)"""
+    __tablename__ = "news_uids"
+
+    uid = Column(String, primary_key=True)
+    seen_at = Column(DateTime, nullable=False, index=True)
@@ -1,9 +1,21 @@
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, BigInteger, Integer, Boolean, String, Text
+import json
 from bot.db.base import Base
 
 class User(Base):
     __tablename__ = "users"
 
-    telegram_id = Column(String, primary_key=True)
+    telegram_id = Column(BigInteger, primary_key=True)
     subscription_level = Column(Integer, default=0)
-    # ������ ��������� ����, ������� �����������
+    night_news = Column(Boolean, default=False)
+    favorite_categories = Column(Text, default="[]")  # список кодов категорий в JSON
+    timezone = Column(String, default="Europe/Moscow")  # IANA имя для тихих часов
+
+    def get_favorites(self):
+        try:
+            return json.loads(self.favorite_categories) if self.favorite_categories else []
+        except Exception:
+            return []
+
+    def set_favorites(self, favs: list):
+        self.favorite_categories = json.dumps(favs)
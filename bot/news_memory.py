@@ -1,29 +1,170 @@
-import json
-import os
-
-NEWS_HISTORY_FILE = "news_history.json"
-
-def load_history():
-    if not os.path.exists(NEWS_HISTORY_FILE):
-        return {}
-    with open(NEWS_HISTORY_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def save_history(data):
-    with open(NEWS_HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def add_viewed_news(user_id: int, category: str, news_id: str):
-    data = load_history()
-    str_id = str(user_id)
-    if str_id not in data:
-        data[str_id] = {}
-    if category not in data[str_id]:
-        data[str_id][category] = []
-    if news_id not in data[str_id][category]:
-        data[str_id][category].append(news_id)
-    save_history(data)
-
-def has_viewed(user_id: int, category: str, news_id: str) -> bool:
-    data = load_history()
-    return news_id in data.get(str(user_id), {}).get(category, [])
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+# История просмотров: ограниченные наборы с TTL в памяти + SQLite (WAL) на диске.
+# Добавления копятся в буфере и пишутся пачкой одной транзакцией (upsert по
+# user_id + news_id), поэтому несколько процессов могут писать в одну базу без гонок.
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS read_history (
+        user_id INTEGER NOT NULL,
+        news_id TEXT NOT NULL,
+        viewed_at REAL NOT NULL,
+        PRIMARY KEY (user_id, news_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_read_history_viewed_at ON read_history (viewed_at);
+"""
+
+class ReadHistory:
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = db_path or Path(config.NEWS_ARCHIVE_PATH) / "meta" / "read_history.db"
+        self.ttl_seconds = config.READ_HISTORY_TTL_HOURS * 3600
+        self.max_per_user = config.READ_HISTORY_MAX_PER_USER
+        self.max_cached_users = config.READ_HISTORY_CACHED_USERS
+        self.flush_size = config.READ_HISTORY_FLUSH_SIZE
+        self.flush_seconds = config.READ_HISTORY_FLUSH_SECONDS
+
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        # user_id -> OrderedDict(news_id -> viewed_at), пользователи в порядке LRU
+        self.users: "OrderedDict[int, OrderedDict]" = OrderedDict()
+        self.pending: List[tuple] = []
+        self.last_flush = time.monotonic()
+        # Запись на диск из event loop уже выполняется в потоке
+        self.flushing = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+        return self.conn
+
+    def _user_history(self, user_id: int) -> "OrderedDict[str, float]":
+        """Набор просмотров пользователя; при первом обращении загружается одним запросом"""
+        history = self.users.get(user_id)
+        if history is None:
+            threshold = time.time() - self.ttl_seconds
+            rows = self._connect().execute(
+                "SELECT news_id, viewed_at FROM read_history WHERE user_id = ? AND viewed_at >= ? "
+                "ORDER BY viewed_at DESC LIMIT ?",
+                (user_id, threshold, self.max_per_user)
+            ).fetchall()
+            history = OrderedDict((news_id, viewed_at) for news_id, viewed_at in reversed(rows))
+            self.users[user_id] = history
+            while len(self.users) > self.max_cached_users:
+                self.users.popitem(last=False)
+        self.users.move_to_end(user_id)
+        return history
+
+    def _is_fresh(self, viewed_at: float) -> bool:
+        return time.time() - viewed_at <= self.ttl_seconds
+
+    def filter_unseen(self, user_id: int, news_ids: Iterable[str]) -> List[str]:
+        """Оставляет только непросмотренные новости, порядок сохраняется"""
+        with self.lock:
+            history = self._user_history(user_id)
+            unseen = []
+            for news_id in news_ids:
+                viewed_at = history.get(news_id)
+                if viewed_at is None or not self._is_fresh(viewed_at):
+                    unseen.append(news_id)
+            return unseen
+
+    async def filter_unseen_async(self, user_id: int, news_ids: Iterable[str]) -> List[str]:
+        """filter_unseen для event loop: история, которой нет в памяти, читается из SQLite в потоке"""
+        news_ids = list(news_ids)
+        if user_id in self.users:
+            return self.filter_unseen(user_id, news_ids)
+        return await asyncio.to_thread(self.filter_unseen, user_id, news_ids)
+
+    def _remember(self, user_id: int, news_ids: Iterable[str]):
+        """Добавляет просмотры в память и в буфер записи"""
+        now = time.time()
+        with self.lock:
+            history = self._user_history(user_id)
+            for news_id in news_ids:
+                history[news_id] = now
+                history.move_to_end(news_id)
+                self.pending.append((user_id, news_id, now))
+            while len(history) > self.max_per_user:
+                history.popitem(last=False)
+
+    def _flush_due(self) -> bool:
+        return len(self.pending) >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_seconds
+
+    def mark_viewed(self, user_id: int, news_ids: Iterable[str]):
+        """Отмечает новости просмотренными (после отправки); запись на диск откладывается до flush"""
+        self._remember(user_id, news_ids)
+        if self._flush_due():
+            self.flush()
+
+    async def mark_viewed_async(self, user_id: int, news_ids: Iterable[str]):
+        """mark_viewed для event loop: чтение истории и запись на диск идут в потоке"""
+        news_ids = list(news_ids)
+        try:
+            if user_id in self.users:
+                self._remember(user_id, news_ids)
+            else:
+                await asyncio.to_thread(self._remember, user_id, news_ids)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Ошибка чтения истории просмотров {user_id}: {e}")
+            return
+
+        if self._flush_due() and not self.flushing:
+            await self.flush_async()
+
+    def flush(self):
+        """Пишет накопленные просмотры одной транзакцией и удаляет устаревшие
+
+        При ошибке записи буфер возвращается и уйдет со следующим flush.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, []
+            self.last_flush = time.monotonic()
+            if not pending:
+                return
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO read_history (user_id, news_id, viewed_at) VALUES (?, ?, ?)",
+                        pending
+                    )
+                    conn.execute("DELETE FROM read_history WHERE viewed_at < ?", (time.time() - self.ttl_seconds,))
+            except sqlite3.Error as e:
+                self.pending = pending + self.pending
+                logger.error(f"❌ Ошибка записи истории просмотров ({len(self.pending)} в буфере): {e}")
+
+    async def flush_async(self):
+        """flush в потоке, чтобы запись SQLite не блокировала event loop"""
+        self.flushing = True
+        try:
+            await asyncio.to_thread(self.flush)
+        finally:
+            self.flushing = False
+
+    def stats(self) -> Dict:
+        return {'cached_users': len(self.users), 'pending': len(self.pending)}
+
+read_history = ReadHistory()
+
+# Прежний API модуля. История общая для всех категорий: category принимается
+# для совместимости со старыми вызовами и не используется
+def add_viewed_news(user_id: int, category: Optional[str], news_id: str):
+    read_history.mark_viewed(user_id, [news_id])
+
+def has_viewed(user_id: int, category: Optional[str], news_id: str) -> bool:
+    return not read_history.filter_unseen(user_id, [news_id])
@@ -0,0 +1,309 @@
+import asyncio
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from bot.config import config
+from bot.utils.rate_limiter import TokenBucket
+from bot.news_memory import read_history
+from bot.services.quiet_hours import quiet_hours
+from bot.services.user_profiles import user_profiles
+
+logger = logging.getLogger(__name__)
+
+# Полосы приоритета совпадают с очередями RQ в bot/tasks.py
+LANES = {'premium': 0, 'extended': 1, 'basic': 2}
+
+def lane_for_level(subscription_level: int) -> str:
+    """Возвращает полосу доставки для уровня подписки"""
+    if subscription_level >= 2:
+        return 'premium'
+    if subscription_level == 1:
+        return 'extended'
+    return 'basic'
+
+def extract_retry_after(error: Exception) -> Optional[float]:
+    """Извлекает retry_after из ошибки 429 Telegram (aiogram и pyTelegramBotAPI)"""
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        return float(retry_after)
+
+    if getattr(error, 'error_code', None) == 429:
+        result_json = getattr(error, 'result_json', None) or {}
+        return float(result_json.get('parameters', {}).get('retry_after', 1))
+
+    return None
+
+def is_permanent_error(error: Exception) -> bool:
+    """Ошибки, которые не исчезнут при повторе: бот заблокирован, чат не найден"""
+    if getattr(error, 'error_code', None) in (400, 403):
+        return True
+    return type(error).__name__ in ('TelegramForbiddenError', 'TelegramBadRequest', 'TelegramNotFound')
+
+class DeliveryQueue:
+    """Центральная очередь отправки сообщений в Telegram с лимитами и приоритетами"""
+
+    def __init__(self):
+        self.bot = None
+        self.global_bucket = TokenBucket(rate=config.TELEGRAM_GLOBAL_RATE, capacity=config.TELEGRAM_GLOBAL_RATE)
+        self.chat_interval = 1 / config.TELEGRAM_CHAT_RATE
+        self.workers_count = config.DELIVERY_WORKERS
+        self.max_message_length = config.MAX_MESSAGE_LENGTH
+        self.max_retries = config.MAX_RETRIES
+
+        # Очередь готовых к отправке чатов: (приоритет полосы, порядковый номер, chat_id)
+        self.ready: Optional[asyncio.PriorityQueue] = None
+        self.pending: Dict[int, List[Dict]] = {}
+        self.scheduled: set = set()
+        # Чаты, отправка в которые идет прямо сейчас: второй обработчик их не берет
+        self.inflight: set = set()
+        # (chat_id, uid новости) в очереди: в историю просмотров попадают только после отправки
+        self.queued_news: set = set()
+        self.last_sent: Dict[int, float] = {}
+        self.paused_until = 0.0
+        self.sequence = itertools.count()
+        self.workers: List[asyncio.Task] = []
+
+        self.stats = {'enqueued': 0, 'sent_messages': 0, 'batched_items': 0, 'rate_limited': 0, 'failed': 0}
+
+    def start(self, bot):
+        """Запускает обработчики очереди"""
+        if self.workers:
+            return
+
+        self.bot = bot
+        self.ready = asyncio.PriorityQueue()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+        quiet_hours.start(_dispatch)
+
+        # Сообщения, поставленные до запуска, переходят в очередь
+        for chat_id in list(self.pending):
+            self.scheduled.discard(chat_id)
+            self._schedule(chat_id)
+
+        logger.info(f"📬 Очередь доставки запущена (обработчиков: {self.workers_count})")
+
+    async def stop(self):
+        """Останавливает обработчики очереди"""
+        for task in self.workers:
+            if not task.done():
+                task.cancel()
+        if self.workers:
+            await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers.clear()
+        await quiet_hours.stop()
+        await read_history.flush_async()
+
+        undelivered = sum(len(items) for items in self.pending.values())
+        logger.info(
+            f"📬 Очередь доставки остановлена: отправлено сообщений {self.stats['sent_messages']}, "
+            f"не доставлено {undelivered}"
+        )
+
+    def enqueue(self, chat_id: int, text: str, lane: str = 'basic',
+                parse_mode: Optional[str] = 'HTML', reply_markup=None, news_uid: Optional[str] = None):
+        """Ставит сообщение в очередь и сразу возвращает управление"""
+        if news_uid:
+            self.queued_news.add((chat_id, news_uid))
+        self.pending.setdefault(chat_id, []).append({
+            'news_uid': news_uid,
+            'text': text,
+            'lane': lane if lane in LANES else 'basic',
+            'parse_mode': parse_mode,
+            'reply_markup': reply_markup,
+            'attempts': 0
+        })
+        self.stats['enqueued'] += 1
+        self._schedule(chat_id)
+
+    def is_queued(self, chat_id: int, news_uid: str) -> bool:
+        """Новость уже ждет отправки в этот чат"""
+        return (chat_id, news_uid) in self.queued_news
+
+    async def _finish(self, chat_id: int, batch: List[Dict], sent: bool):
+        """Снимает отметку очереди; отправленные новости попадают в историю просмотров"""
+        news_uids = [item['news_uid'] for item in batch if item.get('news_uid')]
+        for news_uid in news_uids:
+            self.queued_news.discard((chat_id, news_uid))
+        if sent and news_uids:
+            await read_history.mark_viewed_async(chat_id, news_uids)
+
+    def _schedule(self, chat_id: int):
+        """Помещает чат в очередь готовых с приоритетом самого важного сообщения"""
+        if (chat_id in self.scheduled or chat_id in self.inflight
+                or self.ready is None or not self.pending.get(chat_id)):
+            return
+        priority = min(LANES[item['lane']] for item in self.pending[chat_id])
+        self.ready.put_nowait((priority, next(self.sequence), chat_id))
+        self.scheduled.add(chat_id)
+
+    def _reschedule_later(self, chat_id: int, delay: float):
+        """Возвращает чат в очередь по истечении задержки"""
+        # Пока чат ждет, новые сообщения только копятся в pending
+        self.scheduled.add(chat_id)
+        asyncio.get_running_loop().call_later(delay, self._wake, chat_id)
+
+    def _wake(self, chat_id: int):
+        self.scheduled.discard(chat_id)
+        self._schedule(chat_id)
+
+    def _take_batch(self, chat_id: int) -> List[Dict]:
+        """Забирает из очереди чата сообщения, которые помещаются в одно сообщение Telegram"""
+        items = self.pending[chat_id]
+        batch = [items.pop(0)]
+
+        # Сообщения с клавиатурой отправляются отдельно
+        if batch[0]['reply_markup'] is None:
+            length = len(batch[0]['text'])
+            while items and items[0]['reply_markup'] is None and items[0]['parse_mode'] == batch[0]['parse_mode']:
+                length += len(items[0]['text']) + 2
+                if length > self.max_message_length:
+                    break
+                batch.append(items.pop(0))
+
+        if not items:
+            del self.pending[chat_id]
+        return batch
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            _, _, chat_id = await self.ready.get()
+            self.scheduled.discard(chat_id)
+
+            if not self.pending.get(chat_id) or chat_id in self.inflight:
+                continue
+
+            # Лимит Telegram на чат: не чаще одного сообщения в интервал
+            wait = self.last_sent.get(chat_id, 0) + self.chat_interval - loop.time()
+            wait = max(wait, self.paused_until - loop.time())
+            if wait > 0:
+                self._reschedule_later(chat_id, wait)
+                continue
+
+            # Чат занят до конца отправки, иначе новый enqueue отдаст его другому обработчику
+            self.inflight.add(chat_id)
+            retry_delay = 0.0
+            try:
+                retry_delay = await self._send_batch(chat_id, self._take_batch(chat_id))
+            finally:
+                self.inflight.discard(chat_id)
+
+            if retry_delay > 0:
+                self._reschedule_later(chat_id, retry_delay)
+            else:
+                self._schedule(chat_id)
+
+            # Очищаем отметки давно неактивных чатов
+            if len(self.last_sent) > 10000:
+                threshold = loop.time() - self.chat_interval
+                self.last_sent = {cid: ts for cid, ts in self.last_sent.items() if ts > threshold}
+
+    async def _send_batch(self, chat_id: int, batch: List[Dict]) -> float:
+        """Отправляет пачку; возвращает задержку до повтора (0 - повтор не нужен или сразу)"""
+        loop = asyncio.get_running_loop()
+        await self.global_bucket.acquire()
+
+        first = batch[0]
+        text = '\n\n'.join(item['text'] for item in batch)
+        try:
+            kwargs = {'parse_mode': first['parse_mode']}
+            if first['reply_markup'] is not None:
+                kwargs['reply_markup'] = first['reply_markup']
+            await self.bot.send_message(chat_id, text, **kwargs)
+
+            self.last_sent[chat_id] = loop.time()
+            self.stats['sent_messages'] += 1
+            self.stats['batched_items'] += len(batch)
+            await self._finish(chat_id, batch, sent=True)
+            return 0.0
+
+        except asyncio.CancelledError:
+            # Пачка не отправлена - возвращаем ее, чтобы не потерять при остановке
+            self.pending[chat_id] = batch + self.pending.get(chat_id, [])
+            raise
+        except Exception as e:
+            self.last_sent[chat_id] = loop.time()
+            retry_after = extract_retry_after(e)
+            if retry_after is not None:
+                # Flood control: пауза для всех отправок и возврат пачки в начало очереди чата
+                self.stats['rate_limited'] += 1
+                self.paused_until = max(self.paused_until, loop.time() + retry_after)
+                self.pending[chat_id] = batch + self.pending.get(chat_id, [])
+                logger.warning(f"⏳ Telegram 429, пауза отправки {retry_after:.0f} сек")
+                return retry_after
+
+            if is_permanent_error(e):
+                # Бот заблокирован или чат удален - повтор бесполезен
+                self.stats['failed'] += len(batch)
+                await self._finish(chat_id, batch, sent=False)
+                logger.warning(f"Не отправлено {chat_id}: {e}")
+                return 0.0
+
+            retry = [item for item in batch if item['attempts'] + 1 < self.max_retries]
+            exhausted = [item for item in batch if item['attempts'] + 1 >= self.max_retries]
+            for item in retry:
+                item['attempts'] += 1
+            self.stats['failed'] += len(exhausted)
+            await self._finish(chat_id, exhausted, sent=False)
+            if not retry:
+                logger.warning(f"Не отправлено {chat_id}: {e}")
+                return 0.0
+
+            # Экспоненциальная задержка перед повтором: 2, 4, 8... сек
+            self.pending[chat_id] = retry + self.pending.get(chat_id, [])
+            return float(2 ** max(item['attempts'] for item in retry))
+
+# Создаем глобальный экземпляр очереди доставки
+delivery_queue = DeliveryQueue()
+
+async def _dispatch(deliveries: List[Tuple[int, Optional[str], str]], lane: str) -> int:
+    """Передает сообщения в выбранный бэкенд доставки"""
+    if config.DELIVERY_BACKEND == 'rq':
+        # Доставка в отдельных процессах RQ, ключи идемпотентности по uid новости
+        from bot.tasks import enqueue_deliveries
+        # Конвейеры Redis синхронные - выполняются вне цикла событий
+        return await asyncio.to_thread(
+            enqueue_deliveries, [(chat_id, lane, news_uid, text) for chat_id, news_uid, text in deliveries]
+        )
+
+    for chat_id, news_uid, text in deliveries:
+        delivery_queue.enqueue(chat_id, text, lane=lane, news_uid=news_uid)
+    return len(deliveries)
+
+async def deliver(deliveries: List[Tuple[int, Optional[str], str]], lane: str = 'basic') -> int:
+    """Рассылка: (chat_id, id истории или None, текст) с учетом истории просмотров и тихих часов"""
+    # Уже доставленное пользователю отсеивается одним вызовом на чат
+    by_chat: Dict[int, List[Tuple[Optional[str], str]]] = {}
+    for chat_id, news_uid, text in deliveries:
+        by_chat.setdefault(chat_id, []).append((news_uid, text))
+
+    profiles = await user_profiles.get_many(by_chat)
+    now = datetime.now(timezone.utc)
+
+    immediate = []
+    for chat_id, items in by_chat.items():
+        # В историю новость попадает после отправки; до этого повтор отсекает очередь
+        unseen = {
+            news_uid for news_uid in await read_history.filter_unseen_async(
+                chat_id, [news_uid for news_uid, _ in items if news_uid]
+            )
+            if not delivery_queue.is_queued(chat_id, news_uid)
+        }
+        fresh = []
+        for news_uid, text in items:
+            if news_uid is None:
+                fresh.append((news_uid, text))
+            elif news_uid in unseen:
+                unseen.discard(news_uid)
+                fresh.append((news_uid, text))
+
+        # В тихие часы пользователя новости копятся в утренний дайджест
+        profile = profiles[chat_id]
+        if not profile.night_news and quiet_hours.is_quiet(profile.timezone, now):
+            await quiet_hours.defer(chat_id, profile.timezone, fresh, lane)
+        else:
+            immediate.extend((chat_id, news_uid, text) for news_uid, text in fresh)
+
+    return await _dispatch(immediate, lane)
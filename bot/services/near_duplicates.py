@@ -0,0 +1,206 @@
+import re
+import time
+import asyncio
+import zlib
+import random
+import logging
+from typing import Dict, List, Optional, Tuple
+from bot.config import config
+from bot.utils.html_utils import clean_html
+
+logger = logging.getLogger(__name__)
+
+# Простое число Мерсенна 2^61 - 1 для универсального хеширования перестановок MinHash
+MERSENNE_PRIME = (1 << 61) - 1
+
+WORD_RE = re.compile(r'\w+')
+
+def shingles(text: str) -> set:
+    """Пары соседних слов нормализованного текста (для коротких текстов - отдельные слова)"""
+    words = [word for word in WORD_RE.findall(clean_html(text).lower()) if len(word) > 1]
+    if len(words) < 2:
+        return set(words)
+    return {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+class NearDuplicateIndex:
+    """Поиск почти одинаковых новостей: MinHash подписи заголовка и описания + LSH индекс
+
+    Индекс общий для всех категорий процесса и помнит истории за NEAR_DUP_WINDOW_HOURS.
+    Первая увиденная новость истории становится канонической, ее id - id истории для
+    всех копий (та же новость Reuters у CNN, DW, Euronews). Сами копии не отбрасываются:
+    рассылка сверяет id истории с историей просмотров каждого чата, поэтому подписчик
+    только одной из категорий все равно получает новость.
+    """
+
+    def __init__(self):
+        self.threshold = config.NEAR_DUP_THRESHOLD
+        self.window_seconds = config.NEAR_DUP_WINDOW_HOURS * 3600
+        self.permutations = config.NEAR_DUP_PERMUTATIONS
+        self.bands = config.NEAR_DUP_BANDS
+        self.rows = self.permutations // self.bands
+
+        # Фиксированное зерно: подписи одинаковы во всех процессах и после перезапуска
+        generator = random.Random(20240501)
+        self.hash_params = [
+            (generator.randrange(1, MERSENNE_PRIME), generator.randrange(0, MERSENNE_PRIME))
+            for _ in range(self.permutations)
+        ]
+
+        # id новости -> (время добавления, подпись или None, id канонической новости, ключи LSH)
+        self.entries: Dict[str, Tuple[float, Optional[tuple], str, List[tuple]]] = {}
+        # ключ полосы LSH -> id канонических новостей
+        self.buckets: Dict[tuple, List[str]] = {}
+        self.stats = {'checked': 0, 'duplicates': 0}
+
+    def signature(self, text: str) -> Optional[tuple]:
+        """MinHash подпись текста; None - если в тексте нет слов"""
+        hashes = [zlib.crc32(shingle.encode()) for shingle in shingles(text)]
+        if not hashes:
+            return None
+        return tuple(
+            min((a * value + b) % MERSENNE_PRIME for value in hashes)
+            for a, b in self.hash_params
+        )
+
+    def _band_keys(self, signature: tuple) -> List[tuple]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def similarity(self, first: tuple, second: tuple) -> float:
+        """Оценка сходства Жаккара по доле совпавших минимумов"""
+        return sum(1 for a, b in zip(first, second) if a == b) / self.permutations
+
+    def _find_canonical(self, signature: tuple, band_keys: List[tuple]) -> Optional[str]:
+        """Каноническая новость, похожая на подпись не меньше порога"""
+        checked = set()
+        for band_key in band_keys:
+            for candidate_id in self.buckets.get(band_key, ()):
+                if candidate_id in checked:
+                    continue
+                checked.add(candidate_id)
+                candidate_signature = self.entries[candidate_id][1]
+                if self.similarity(signature, candidate_signature) >= self.threshold:
+                    return candidate_id
+        return None
+
+    def _expire(self, now: float):
+        """Удаляет истории старше окна (записи идут в порядке добавления)"""
+        threshold = now - self.window_seconds
+        expired = []
+        for news_id, (added_at, _, _, band_keys) in self.entries.items():
+            if added_at >= threshold:
+                break
+            expired.append(news_id)
+            for band_key in band_keys:
+                bucket = self.buckets.get(band_key)
+                if bucket is not None:
+                    bucket.remove(news_id)
+                    if not bucket:
+                        del self.buckets[band_key]
+        for news_id in expired:
+            del self.entries[news_id]
+
+    @staticmethod
+    def _text(news: Dict) -> str:
+        return f"{news.get('title', '')} {news.get('summary', '')}"
+
+    def assign(self, news_list: List[Dict], key: str = 'id',
+               signatures: Optional[Dict[str, Optional[tuple]]] = None) -> List[Optional[str]]:
+        """id истории для каждой новости (None - у новости нет id)
+
+        Новости, уже известные индексу, не пересчитываются. key - поле с id новости
+        ('id' у новостей лент, 'uid' у строк БД); signatures - заранее посчитанные
+        подписи по id новости.
+        """
+        now = time.time()
+        self._expire(now)
+
+        story_ids = []
+        for news in news_list:
+            news_id = news.get(key)
+            if not news_id:
+                story_ids.append(None)
+                continue
+
+            entry = self.entries.get(news_id)
+            if entry is not None:
+                story_ids.append(entry[2])
+                continue
+
+            self.stats['checked'] += 1
+            if signatures is not None and news_id in signatures:
+                signature = signatures[news_id]
+            else:
+                signature = self.signature(self._text(news))
+            if signature is None:
+                story_ids.append(news_id)
+                continue
+
+            band_keys = self._band_keys(signature)
+            canonical_id = self._find_canonical(signature, band_keys)
+
+            if canonical_id:
+                self.stats['duplicates'] += 1
+                self.entries[news_id] = (now, None, canonical_id, [])
+                logger.debug(f"🧬 Копия новости {news_id} -> {canonical_id}: {news.get('title', '')[:80]}")
+                story_ids.append(canonical_id)
+                continue
+
+            self.entries[news_id] = (now, signature, news_id, band_keys)
+            for band_key in band_keys:
+                self.buckets.setdefault(band_key, []).append(news_id)
+            story_ids.append(news_id)
+
+        return story_ids
+
+    async def assign_async(self, news_list: List[Dict], key: str = 'id') -> List[Optional[str]]:
+        """assign, в котором MinHash подписи новых новостей считаются в потоке
+
+        Подписи - чистый Python (перестановки x шинглы), в event loop они задерживали
+        бы остальные задачи. Сам индекс меняется только в event loop.
+        """
+        pending = {
+            news[key]: self._text(news) for news in news_list
+            if news.get(key) and news[key] not in self.entries
+        }
+        signatures = None
+        if pending:
+            signatures = await asyncio.to_thread(
+                lambda: {news_id: self.signature(text) for news_id, text in pending.items()}
+            )
+        return self.assign(news_list, key, signatures)
+
+    async def collapse(self, news_list: List[Dict], key: str = 'id') -> List[Dict]:
+        """Оставляет по одной новости каждой истории внутри списка, порядок сохраняется
+
+        Новости возвращаются копиями с полем story_id: по нему AI обработка берет
+        готовый результат истории, если ее копию уже обработала другая категория.
+        История из другой категории или прошлого цикла список не сокращает -
+        за повторы у конкретного чата отвечает рассылка.
+        """
+        seen = set()
+        unique_news = []
+        for news, story_id in zip(news_list, await self.assign_async(news_list, key)):
+            if story_id is not None:
+                if story_id in seen:
+                    continue
+                seen.add(story_id)
+            unique_news.append({**news, 'story_id': story_id})
+
+        collapsed = len(news_list) - len(unique_news)
+        if collapsed:
+            logger.info(f"🧬 Схлопнуто почти одинаковых новостей: {collapsed} из {len(news_list)}")
+        return unique_news
+
+    def get_stats(self) -> Dict:
+        """Возвращает статистику индекса"""
+        return {
+            **self.stats,
+            'entries': len(self.entries),
+            'buckets': len(self.buckets)
+        }
+
+# Создаем глобальный экземпляр индекса почти одинаковых новостей
+near_duplicates = NearDuplicateIndex()
@@ -1,21 +1,48 @@
 import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from bot.utils.rss_parser import parse_multiple_feeds
+from bot.utils.rss_parser import parse_multiple_feeds, parse_feeds_by_url, merge_feed_news
 from bot.utils.together_api import together_api
+from bot.services.near_duplicates import near_duplicates
 from bot.utils.news_cache import news_cache
 from bot.data.rss_feeds import RSS_FEEDS
+from bot.config import config
 
 logger = logging.getLogger(__name__)
 
 class NewsProcessor:
     def __init__(self):
-        self.processing_lock = asyncio.Lock()
+        # Блокировки по категориям: разные категории обрабатываются параллельно
+        self.category_locks: Dict[str, asyncio.Lock] = {}
+        self.max_parallel_categories = max(1, config.MAX_PARALLEL_CATEGORIES)
+        # Инкрементальный режим: через AI проходят только новые новости
+        self.incremental = config.INCREMENTAL_PROCESSING
+        self.max_news_per_category = config.MAX_NEWS_PER_CATEGORY
+        self.max_news_age_hours = config.NEWS_CACHE_HOURS
+        # Отчет о последнем полном цикле обработки
+        self.last_cycle_report: Dict = {}
+    
+    def build_fetch_plan(self, categories: List[str]) -> Dict[str, List[str]]:
+        """Строит план загрузки: уникальная лента -> категории, в которых она указана"""
+        plan: Dict[str, List[str]] = {}
+        for category in categories:
+            for url in RSS_FEEDS.get(category, []):
+                categories_for_url = plan.setdefault(url, [])
+                if category not in categories_for_url:
+                    categories_for_url.append(category)
+        return plan
+    
+    def _get_category_lock(self, category: str) -> asyncio.Lock:
+        """Возвращает блокировку категории"""
+        if category not in self.category_locks:
+            self.category_locks[category] = asyncio.Lock()
+        return self.category_locks[category]
         
-    async def process_category_news(self, category: str, force_update: bool = False) -> bool:
+    async def process_category_news(self, category: str, force_update: bool = False,
+                                    parsed_feeds: Optional[Dict[str, List[Dict]]] = None) -> bool:
         """Обрабатывает новости для конкретной категории"""
-        async with self.processing_lock:
+        async with self._get_category_lock(category):
             try:
                 logger.info(f"🔄 Начинаем обработку категории: {category}")
                 
@@ -24,13 +51,20 @@ class NewsProcessor:
                     return False
                 
                 # Получаем RSS ленты для категории
-                feeds = RSS_FEEDS[category]
-                feed_urls = list(feeds.values())
+                feed_urls = list(RSS_FEEDS[category])
                 
-                logger.info(f"📡 Парсинг {len(feed_urls)} RSS лент для категории {category}")
+                if parsed_feeds is not None:
+                    # Ленты уже загружены общим планом цикла
+                    all_news = merge_feed_news(feed_urls, parsed_feeds)
+                else:
+                    logger.info(f"📡 Парсинг {len(feed_urls)} RSS лент для категории {category}")
+                    
+                    # Парсим все RSS ленты параллельно
+                    all_news = await parse_multiple_feeds(feed_urls, max_items_per_feed=5)
                 
-                # Парсим все RSS ленты параллельно
-                all_news = await parse_multiple_feeds(feed_urls, max_items_per_feed=5)
+                # Одна история из нескольких источников идет в AI один раз: копии внутри
+                # категории схлопываются, копии из других категорий берут результат по story_id
+                all_news = await near_duplicates.collapse(all_news)
                 
                 if not all_news:
                     logger.warning(f"⚠️ Не получено новостей для категории {category}")
@@ -38,8 +72,11 @@ class NewsProcessor:
                 
                 logger.info(f"📰 Получено {len(all_news)} новостей для категории {category}")
                 
-                # Обрабатываем новости через AI
-                processed_news = await self._process_news_with_ai(all_news, category)
+                if self.incremental and not force_update:
+                    processed_news = await self._process_incremental(all_news, category)
+                else:
+                    # Обрабатываем новости через AI
+                    processed_news = await self._process_news_with_ai(all_news, category)
                 
                 if processed_news:
                     # Сохраняем в кеш
@@ -58,40 +95,52 @@ class NewsProcessor:
                 logger.error(f"❌ Критическая ошибка обработки категории {category}: {e}")
                 return False
     
+    async def _process_incremental(self, all_news: List[Dict], category: str) -> List[Dict]:
+        """Обрабатывает через AI только новости, которых еще нет в кеше категории"""
+        cached_news = await news_cache.load_news(category) or []
+        
+        # Новости, не прошедшие AI в прошлый раз, пробуем обработать снова
+        cached_by_id = {
+            news_item['id']: news_item for news_item in cached_news
+            if news_item.get('id') and news_item.get('ai_processed')
+        }
+        
+        new_news = [news_item for news_item in all_news if news_item['id'] not in cached_by_id]
+        
+        logger.info(
+            f"🧮 Инкрементальная обработка {category}: новых {len(new_news)}, "
+            f"уже обработано {len(all_news) - len(new_news)}"
+        )
+        
+        processed_new = await self._process_news_with_ai(new_news, category) if new_news else []
+        
+        # Объединяем новые результаты с кешем и убираем устаревшие записи
+        cutoff = (datetime.now() - timedelta(hours=self.max_news_age_hours)).timestamp()
+        merged = {news_item['id']: news_item for news_item in cached_by_id.values()}
+        merged.update({news_item['id']: news_item for news_item in processed_new})
+        
+        fresh_news = [
+            news_item for news_item in merged.values()
+            if news_item.get('published_timestamp', 0) >= cutoff
+        ]
+        fresh_news.sort(key=lambda x: x.get('published_timestamp', 0), reverse=True)
+        
+        evicted = len(merged) - len(fresh_news)
+        if evicted:
+            logger.info(f"🗑️ Удалено устаревших новостей из {category}: {evicted}")
+        
+        return fresh_news[:self.max_news_per_category]
+    
     async def _process_news_with_ai(self, news_list: List[Dict], category: str) -> List[Dict]:
         """Обрабатывает новости через AI как редактор"""
         try:
             logger.info(f"🤖 Обрабатываем {len(news_list)} новостей для категории {category}")
             
-            # Обрабатываем новости батчами
-            batch_size = 3  # Уменьшаем размер батча для стабильности
-            processed_news = []
-            
-            for i in range(0, len(news_list), batch_size):
-                batch = news_list[i:i + batch_size]
-                
-                logger.info(f"🔄 Обрабатываем батч {i//batch_size + 1} из {(len(news_list) + batch_size - 1)//batch_size}")
-                
-                # Обрабатываем батч через AI
-                batch_results = await together_api.process_news_batch(batch)
-                
-                if batch_results:
-                    processed_news.extend(batch_results)
-                    logger.info(f"✅ Обработано {len(batch_results)} новостей в батче")
-                else:
-                    logger.warning(f"⚠️ Батч не обработан, добавляем оригиналы")
-                    # Добавляем необработанные новости
-                    for news_item in batch:
-                        processed_news.append({
-                            **news_item,
-                            'content': news_item.get('summary', ''),
-                            'ai_processed': False
-                        })
-                
-                # Пауза между батчами
-                await asyncio.sleep(2)
+            # Параллелизм и темп запросов ограничиваются лимитами TogetherAPI
+            processed_news = await together_api.process_news_batch(news_list)
             
-            logger.info(f"✅ Обработано {len(processed_news)} из {len(news_list)} новостей для категории {category}")
+            ai_processed = sum(1 for news_item in processed_news if news_item.get('ai_processed'))
+            logger.info(f"✅ Обработано {ai_processed} из {len(news_list)} новостей для категории {category}")
             return processed_news
             
         except Exception as e:
@@ -110,28 +159,66 @@ class NewsProcessor:
         
         logger.info("🚀 Начинаем полную обработку всех категорий новостей")
         
-        for category in RSS_FEEDS.keys():
-            try:
-                logger.info(f"🔄 Обрабатываем категорию: {category}")
-                success = await self.process_category_news(category)
-                results[category] = success
-                
-                if success:
-                    logger.info(f"✅ Категория {category} успешно обработана")
-                else:
-                    logger.error(f"❌ Ошибка обработки категории {category}")
-                
-                # Пауза между категориями
-                await asyncio.sleep(3)
-                
-            except Exception as e:
-                logger.error(f"❌ Критическая ошибка обработки категории {category}: {e}")
-                results[category] = False
+        categories = list(RSS_FEEDS.keys())
+        
+        # Загружаем каждую уникальную ленту один раз на цикл
+        fetch_plan = self.build_fetch_plan(categories)
+        total_feeds = sum(len(RSS_FEEDS[category]) for category in categories)
+        fetches_saved = total_feeds - len(fetch_plan)
+        shared_feeds = sum(1 for owners in fetch_plan.values() if len(owners) > 1)
+        
+        logger.info(
+            f"🗺️ План загрузки: {len(fetch_plan)} уникальных лент из {total_feeds} "
+            f"(общих лент: {shared_feeds}, сэкономлено загрузок: {fetches_saved})"
+        )
+        
+        parsed_feeds = await parse_feeds_by_url(list(fetch_plan.keys()), max_items_per_feed=5)
+        
+        self.last_cycle_report = {
+            'finished_at': None,
+            'total_feeds': total_feeds,
+            'unique_feeds': len(fetch_plan),
+            'shared_feeds': shared_feeds,
+            'fetches_saved': fetches_saved
+        }
+        
+        # Ограничиваем число одновременно обрабатываемых категорий
+        semaphore = asyncio.Semaphore(self.max_parallel_categories)
+        
+        async def process_one(category: str) -> bool:
+            async with semaphore:
+                try:
+                    logger.info(f"🔄 Обрабатываем категорию: {category}")
+                    success = await self.process_category_news(category, parsed_feeds=parsed_feeds)
+                    
+                    if success:
+                        logger.info(f"✅ Категория {category} успешно обработана")
+                    else:
+                        logger.error(f"❌ Ошибка обработки категории {category}")
+                    
+                    return success
+                    
+                except Exception as e:
+                    logger.error(f"❌ Критическая ошибка обработки категории {category}: {e}")
+                    return False
+        
+        logger.info(f"🧵 Обрабатываем до {self.max_parallel_categories} категорий одновременно")
+        outcomes = await asyncio.gather(*(process_one(category) for category in categories))
+        
+        # Сохраняем порядок категорий из RSS_FEEDS
+        for category, success in zip(categories, outcomes):
+            results[category] = success
         
         successful = sum(1 for success in results.values() if success)
         total = len(results)
         
+        self.last_cycle_report['finished_at'] = datetime.now().isoformat()
+        
         logger.info(f"🏁 Полная обработка завершена: {successful}/{total} категорий успешно обработано")
+        logger.info(
+            f"📊 Отчет цикла: загружено {len(fetch_plan)} уникальных лент, "
+            f"сэкономлено {fetches_saved} загрузок"
+        )
         
         return results
 
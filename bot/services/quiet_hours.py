@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from bot.config import config
+from bot.news_memory import read_history
+from bot.utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Отложенные дайджесты общие для всех процессов (бот, ingest, шарды): SQLite (WAL).
+# Выпуск захватывает дайджест арендой (claimed_until) одним UPDATE, поэтому
+# дайджест выпускает ровно один процесс; после аварии аренда истекает.
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS quiet_digests (
+        chat_id INTEGER PRIMARY KEY,
+        release_at REAL NOT NULL,
+        lane TEXT NOT NULL,
+        claimed_until REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_quiet_digests_release_at ON quiet_digests (release_at);
+    CREATE TABLE IF NOT EXISTS quiet_digest_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        news_uid TEXT,
+        text TEXT NOT NULL,
+        UNIQUE (chat_id, news_uid)
+    );
+    CREATE INDEX IF NOT EXISTS idx_quiet_digest_items_chat ON quiet_digest_items (chat_id, id);
+"""
+
+# Сколько дайджест остается за процессом, захватившим его для выпуска
+CLAIM_SECONDS = 300
+
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    """Часовой пояс пользователя; неизвестное имя заменяется поясом по умолчанию"""
+    try:
+        return ZoneInfo(name or config.DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(config.DEFAULT_TIMEZONE)
+
+def split_text(text: str, limit: int) -> List[str]:
+    """Делит текст на части не длиннее limit: по строкам, затем по словам, в крайнем случае по символам"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit + 1)
+        if cut <= 0:
+            cut = text.rfind(' ', 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        parts.append(text)
+    return parts
+
+class QuietHoursScheduler:
+    """Откладывает новости в тихие часы пользователя и выпускает их утренним дайджестом"""
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.start_hour = config.QUIET_HOURS_START
+        self.end_hour = config.QUIET_HOURS_END
+        self.max_items = config.QUIET_DIGEST_MAX_ITEMS
+        self.max_message_length = config.MAX_MESSAGE_LENGTH
+        self.db_path = db_path or Path(config.NEWS_ARCHIVE_PATH) / "meta" / "quiet_digests.db"
+        # Файл прежней версии: переносится в базу при первом подключении
+        self.legacy_file = self.db_path.with_name("quiet_digests.json")
+
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        # Плавный выпуск: не больше QUIET_RELEASE_PER_SECOND дайджестов в секунду
+        self.release_bucket = TokenBucket(rate=config.QUIET_RELEASE_PER_SECOND, capacity=config.QUIET_RELEASE_PER_SECOND)
+        self.dispatch: Optional[Callable] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {'deferred': 0, 'dropped': 0, 'released': 0, 'failed': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+            self._import_legacy()
+        return self.conn
+
+    def _import_legacy(self):
+        """Переносит дайджесты из quiet_digests.json; файл забирает один процесс (rename атомарен)"""
+        claimed_file = self.legacy_file.with_suffix(f".{os.getpid()}.importing")
+        try:
+            os.rename(self.legacy_file, claimed_file)
+        except OSError:
+            return
+
+        try:
+            with open(claimed_file, 'r', encoding='utf-8') as f:
+                digests = json.load(f)
+            for chat_id, digest in digests.items():
+                release_at = datetime.fromisoformat(digest['release_at']).timestamp()
+                self._insert(int(chat_id), release_at, digest['lane'], [tuple(item) for item in digest['items']])
+            claimed_file.unlink()
+            logger.info(f"🌙 Перенесено отложенных дайджестов из JSON: {len(digests)}")
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка переноса отложенных дайджестов ({claimed_file}): {e}")
+
+    def _insert(self, chat_id: int, release_at: float, lane: str, items: List[Tuple[Optional[str], str]]) -> int:
+        """Дописывает новости в дайджест чата, возвращает число вытесненных старых"""
+        conn = self.conn
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO quiet_digests (chat_id, release_at, lane) VALUES (?, ?, ?)",
+                (chat_id, release_at, lane)
+            )
+            # Новость из нескольких лент попадает в дайджест один раз (UNIQUE по chat_id, news_uid)
+            conn.executemany(
+                "INSERT OR IGNORE INTO quiet_digest_items (chat_id, news_uid, text) VALUES (?, ?, ?)",
+                [(chat_id, news_uid, text) for news_uid, text in items]
+            )
+            return conn.execute(
+                """DELETE FROM quiet_digest_items WHERE chat_id = ? AND id NOT IN (
+                       SELECT id FROM quiet_digest_items WHERE chat_id = ? ORDER BY id DESC LIMIT ?
+                   )""",
+                (chat_id, chat_id, self.max_items)
+            ).rowcount
+
+    def is_quiet(self, timezone_name: str, now: Optional[datetime] = None) -> bool:
+        """Попадает ли текущее местное время пользователя в тихие часы"""
+        hour = (now or datetime.now(timezone.utc)).astimezone(get_zone(timezone_name)).hour
+        if self.start_hour > self.end_hour:
+            return hour >= self.start_hour or hour < self.end_hour
+        return self.start_hour <= hour < self.end_hour
+
+    def next_release(self, timezone_name: str, now: Optional[datetime] = None) -> datetime:
+        """Ближайшее окончание тихих часов (по умолчанию 07:00 местного времени) в UTC"""
+        local_now = (now or datetime.now(timezone.utc)).astimezone(get_zone(timezone_name))
+        release = local_now.replace(hour=self.end_hour, minute=0, second=0, microsecond=0)
+        if release <= local_now:
+            release += timedelta(days=1)
+        return release.astimezone(timezone.utc)
+
+    def _defer(self, chat_id: int, release_at: float, items: List[Tuple[Optional[str], str]], lane: str):
+        with self.lock:
+            self._connect()
+            dropped = self._insert(chat_id, release_at, lane, items)
+        self.stats['deferred'] += len(items)
+        self.stats['dropped'] += dropped
+
+    async def defer(self, chat_id: int, timezone_name: str, items: List[Tuple[Optional[str], str]], lane: str):
+        """Добавляет новости (uid, текст) в ограниченный дайджест; старые вытесняются новыми"""
+        if items:
+            release_at = self.next_release(timezone_name).timestamp()
+            await asyncio.to_thread(self._defer, chat_id, release_at, items, lane)
+
+    def _compose(self, items: List[Tuple[Optional[str], str]]) -> List[str]:
+        """Собирает дайджест в сообщения не длиннее лимита Telegram; ни одна новость не теряется"""
+        messages = []
+        text = "🌅 <b>Новости за ночь</b>"
+        for _, item_text in items:
+            # Новость длиннее лимита уходит несколькими сообщениями
+            for part in split_text(item_text, self.max_message_length):
+                if len(text) + len(part) + 2 > self.max_message_length:
+                    messages.append(text)
+                    text = part
+                else:
+                    text += "\n\n" + part
+        messages.append(text)
+        return messages
+
+    def _claim_due(self, limit: int = 100) -> List[Tuple[int, float, str, int, List[Tuple[Optional[str], str]]]]:
+        """Захватывает наступившие дайджесты: (chat_id, release_at, полоса, последний id, новости)"""
+        now = time.time()
+        claimed = []
+        with self.lock:
+            conn = self._connect()
+            due = conn.execute(
+                """SELECT chat_id, release_at, lane FROM quiet_digests
+                   WHERE release_at <= ? AND (claimed_until IS NULL OR claimed_until < ?)
+                   ORDER BY release_at LIMIT ?""",
+                (now, now, limit)
+            ).fetchall()
+            for chat_id, release_at, lane in due:
+                # UPDATE с условием атомарен: дайджест достается одному процессу
+                with conn:
+                    won = conn.execute(
+                        """UPDATE quiet_digests SET claimed_until = ?
+                           WHERE chat_id = ? AND (claimed_until IS NULL OR claimed_until < ?)""",
+                        (now + CLAIM_SECONDS, chat_id, now)
+                    ).rowcount
+                if not won:
+                    continue
+                rows = conn.execute(
+                    "SELECT id, news_uid, text FROM quiet_digest_items WHERE chat_id = ? ORDER BY id", (chat_id,)
+                ).fetchall()
+                last_id = rows[-1][0] if rows else 0
+                claimed.append((chat_id, release_at, lane, last_id, [(news_uid, text) for _, news_uid, text in rows]))
+        return claimed
+
+    def _finish(self, chat_id: int, last_id: int, released: bool):
+        """Удаляет выпущенные новости (добавленные во время выпуска остаются) или снимает захват"""
+        with self.lock, self.conn:
+            if released:
+                self.conn.execute(
+                    "DELETE FROM quiet_digest_items WHERE chat_id = ? AND id <= ?", (chat_id, last_id)
+                )
+                self.conn.execute(
+                    """DELETE FROM quiet_digests WHERE chat_id = ?
+                       AND NOT EXISTS (SELECT 1 FROM quiet_digest_items WHERE chat_id = ?)""",
+                    (chat_id, chat_id)
+                )
+            self.conn.execute("UPDATE quiet_digests SET claimed_until = NULL WHERE chat_id = ?", (chat_id,))
+
+    def start(self, dispatch: Callable):
+        """Запускает выпуск дайджестов; dispatch(deliveries, lane) передает их в доставку"""
+        self.dispatch = dispatch
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._release_loop())
+
+    async def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def _release_loop(self):
+        while True:
+            try:
+                await self._release_due()
+            except Exception as e:
+                logger.error(f"❌ Ошибка выпуска утренних дайджестов: {e}")
+
+            await asyncio.sleep(30)
+
+    async def _release_due(self):
+        # В одном часовом поясе утро наступает у всех сразу - выпускаем с ограничением скорости
+        released = 0
+        for chat_id, release_at, lane, last_id, items in await asyncio.to_thread(self._claim_due):
+            if not items:
+                await asyncio.to_thread(self._finish, chat_id, last_id, True)
+                continue
+
+            await self.release_bucket.acquire()
+            digest_uid = f"digest:{datetime.fromtimestamp(release_at, timezone.utc):%Y%m%d}"
+            messages = self._compose(items)
+            try:
+                await self.dispatch([
+                    (chat_id, f"{digest_uid}:{number}" if number else digest_uid, text)
+                    for number, text in enumerate(messages)
+                ], lane)
+            except Exception as e:
+                # Дайджест остается и будет выпущен на следующем проходе
+                self.stats['failed'] += 1
+                logger.warning(f"⚠️ Дайджест для {chat_id} не передан в доставку: {e}")
+                await asyncio.to_thread(self._finish, chat_id, last_id, False)
+                continue
+
+            # Удаляем только после успешной передачи в доставку
+            await asyncio.to_thread(self._finish, chat_id, last_id, True)
+            await read_history.mark_viewed_async(chat_id, [news_uid for news_uid, _ in items if news_uid])
+            self.stats['released'] += 1
+            released += 1
+
+        if released:
+            logger.info(f"🌅 Выпущено утренних дайджестов: {released}")
+
+# Создаем глобальный экземпляр планировщика тихих часов
+quiet_hours = QuietHoursScheduler()
@@ -213,6 +213,13 @@ class NewsScheduler:
                 time_since_update = datetime.now() - self.last_full_update
                 logger.info(f"🔄 Последнее полное обновление: {time_since_update.total_seconds()/3600:.1f} часов назад")
             
+            cycle_report = news_processor.last_cycle_report
+            if cycle_report:
+                logger.info(
+                    f"🗺️ Последний цикл: {cycle_report.get('unique_feeds', 0)} уникальных лент из "
+                    f"{cycle_report.get('total_feeds', 0)}, сэкономлено загрузок: {cycle_report.get('fetches_saved', 0)}"
+                )
+
             if self.last_cleanup:
                 time_since_cleanup = datetime.now() - self.last_cleanup
                 logger.info(f"🧹 Последняя очистка: {time_since_cleanup.total_seconds()/3600:.1f} часов назад")
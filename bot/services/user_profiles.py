@@ -0,0 +1,131 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple
+from bot.config import config
+from bot.db import users
+from bot.subscriber_index import subscriber_index
+
+logger = logging.getLogger(__name__)
+
+class UserProfile(NamedTuple):
+    subscription_level: int
+    night_news: bool
+    favorites: List[str]
+    timezone: str
+
+# Профиль пользователя, которого нет в базе
+EMPTY_PROFILE = UserProfile(0, False, [], config.DEFAULT_TIMEZONE)
+
+def _to_profile(level, night_news, raw_favorites, timezone) -> UserProfile:
+    return UserProfile(level or 0, bool(night_news), users.parse_favorites(raw_favorites), timezone or config.DEFAULT_TIMEZONE)
+
+class UserProfileService:
+    """Профили пользователей из БД с LRU/TTL кешем в памяти процесса"""
+
+    def __init__(self):
+        self.ttl_seconds = config.USER_CACHE_TTL_SECONDS
+        self.max_entries = config.USER_CACHE_MAX_ENTRIES
+
+        # telegram_id -> (время загрузки, профиль), порядок - от давно использованных
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'queries': 0}
+
+    def _get_cached(self, telegram_id: int):
+        entry = self.entries.get(telegram_id)
+        if entry is None:
+            return None
+        loaded_at, profile = entry
+        if time.monotonic() - loaded_at > self.ttl_seconds:
+            del self.entries[telegram_id]
+            return None
+        self.entries.move_to_end(telegram_id)
+        return profile
+
+    def _put(self, telegram_id: int, profile: UserProfile):
+        self.entries[telegram_id] = (time.monotonic(), profile)
+        self.entries.move_to_end(telegram_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, telegram_id: int):
+        """Сбрасывает профиль после изменения"""
+        self.entries.pop(telegram_id, None)
+
+    async def get_many(self, telegram_ids: Iterable[int]) -> Dict[int, UserProfile]:
+        """Профили пачки пользователей: промахи кеша догружаются одним запросом"""
+        profiles = {}
+        missing = []
+        for telegram_id in telegram_ids:
+            profile = self._get_cached(telegram_id)
+            if profile is None:
+                missing.append(telegram_id)
+            else:
+                profiles[telegram_id] = profile
+
+        self.stats['hits'] += len(profiles)
+        self.stats['misses'] += len(missing)
+
+        if missing:
+            self.stats['queries'] += 1
+            loaded = {
+                telegram_id: _to_profile(level, night_news, raw_favorites, timezone)
+                for telegram_id, level, night_news, raw_favorites, timezone in await users.get_profiles(missing)
+            }
+            for telegram_id in missing:
+                # Отсутствующие в базе тоже кешируются, чтобы не запрашивать их снова
+                profile = loaded.get(telegram_id, EMPTY_PROFILE)
+                self._put(telegram_id, profile)
+                profiles[telegram_id] = profile
+
+        return profiles
+
+    async def get(self, telegram_id: int) -> UserProfile:
+        return (await self.get_many([telegram_id]))[telegram_id]
+
+    async def get_subscription(self, telegram_id: int) -> int:
+        return (await self.get(telegram_id)).subscription_level
+
+    async def is_night_enabled(self, telegram_id: int) -> bool:
+        return (await self.get(telegram_id)).night_news
+
+    async def get_favorites(self, telegram_id: int) -> List[str]:
+        return list((await self.get(telegram_id)).favorites)
+
+    async def get_or_create_user(self, telegram_id: int):
+        user = await users.get_or_create_user(telegram_id)
+        self.invalidate(telegram_id)
+        return user
+
+    async def set_subscription(self, telegram_id: int, level: int):
+        favorites = await users.set_subscription(telegram_id, level)
+        self.invalidate(telegram_id)
+        if favorites is not None:
+            subscriber_index.update_user(telegram_id, level, favorites)
+
+    async def toggle_night_news(self, telegram_id: int) -> bool:
+        new_state = await users.toggle_night_news(telegram_id)
+        self.invalidate(telegram_id)
+        return new_state
+
+    async def set_timezone(self, telegram_id: int, timezone: str):
+        await users.set_timezone(telegram_id, timezone)
+        self.invalidate(telegram_id)
+
+    async def save_favorites(self, telegram_id: int, categories: List[str]):
+        level = await users.save_favorites(telegram_id, categories)
+        self.invalidate(telegram_id)
+        if level is not None:
+            subscriber_index.update_user(telegram_id, level, categories)
+
+    def get_stats(self) -> Dict:
+        """Возвращает статистику кеша профилей"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self.entries),
+            'hit_rate': round(self.stats['hits'] / lookups * 100, 1) if lookups else 0
+        }
+
+# Создаем глобальный экземпляр сервиса профилей
+user_profiles = UserProfileService()
@@ -0,0 +1,70 @@
+from typing import Dict, List, Set, Tuple
+
+from bot.db.users import get_subscribed_users, parse_favorites
+
+PREMIUM_LEVEL = 2
+
+
+class SubscriberIndex:
+    """Обратный индекс подписчиков: код категории -> telegram_id премиум пользователей"""
+
+    def __init__(self):
+        self.by_category: Dict[str, Set[int]] = {}
+        # telegram_id -> (уровень подписки, избранные категории) для всех платных подписчиков
+        self.profiles: Dict[int, Tuple[int, List[str]]] = {}
+        self.built = False
+
+    async def refresh(self):
+        """Строит индекс одним асинхронным запросом (при запуске и раз в цикл рассылки)"""
+        rows = await get_subscribed_users()
+        self._build([(telegram_id, level, raw_favorites) for telegram_id, level, _, raw_favorites in rows])
+
+    def _build(self, rows):
+        by_category: Dict[str, Set[int]] = {}
+        profiles: Dict[int, Tuple[int, List[str]]] = {}
+        for telegram_id, level, raw_favorites in rows:
+            favorites = parse_favorites(raw_favorites)
+            profiles[telegram_id] = (level, favorites)
+            if level == PREMIUM_LEVEL:
+                for code in favorites:
+                    by_category.setdefault(code, set()).add(telegram_id)
+
+        self.by_category = by_category
+        self.profiles = profiles
+        self.built = True
+
+    def _require_built(self):
+        # Синхронного запроса к БД из event loop нет: индекс строится refresh() при запуске
+        if not self.built:
+            raise RuntimeError("Индекс подписчиков не построен: вызовите await subscriber_index.refresh()")
+
+    def update_user(self, telegram_id: int, level: int, favorites: List[str]):
+        """Обновляет запись пользователя после изменения подписки или избранного"""
+        if not self.built:
+            return
+
+        # Множества не меняются на месте: рассылка может итерировать старую версию
+        _, old_favorites = self.profiles.pop(telegram_id, (0, []))
+        for code in old_favorites:
+            if telegram_id in self.by_category.get(code, ()):
+                self.by_category[code] = self.by_category[code] - {telegram_id}
+
+        if not level:
+            return
+        self.profiles[telegram_id] = (level, favorites)
+        if level == PREMIUM_LEVEL:
+            for code in favorites:
+                self.by_category[code] = self.by_category.get(code, set()) | {telegram_id}
+
+    def subscribers(self, category_code: str) -> Set[int]:
+        """Премиум подписчики категории"""
+        self._require_built()
+        return self.by_category.get(category_code, set())
+
+    def subscribed_users(self) -> List[Tuple[int, int, List[str]]]:
+        """Все платные подписчики: (telegram_id, уровень, избранные категории)"""
+        self._require_built()
+        return [(telegram_id, level, favorites) for telegram_id, (level, favorites) in self.profiles.items()]
+
+
+subscriber_index = SubscriberIndex()
@@ -1,17 +1,194 @@
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from typing import Iterable, Optional, Tuple
+
+import requests
 from redis import Redis
-from rq import Queue, Retry
-from config import REDIS_URL
-
-conn = Redis.from_url(REDIS_URL)
-queues = {
-    "premium": Queue("premium", connection=conn),
-    "extended": Queue("extended", connection=conn),
-    "basic": Queue("basic", connection=conn),
-}
-
-def send_news(user_id, text):
-    print(f"📤 Отправка: {user_id} ← {text}")
-
-def enqueue_news(user):
-    q = queues.get(user.tariff, queues["basic"])
-    q.enqueue(send_news, args=(user.id, "новость"), retry=Retry(max=3, interval=[30, 60]))
+from rq import Callback, Queue, Retry, get_current_job
+
+from bot.config import config
+from bot.news_memory import read_history
+from bot.utils.rate_limiter import RedisTokenBucket, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+# Сколько живет отметка о доставке (защита от повторной отправки)
+DELIVERY_KEY_TTL = 2 * 24 * 3600
+# Размер пачки для одного конвейера Redis
+ENQUEUE_CHUNK_SIZE = 500
+# Пауза всех отправок после 429 от Telegram
+PAUSE_KEY = "telegram:pause"
+# Дольше этого ждать лимита чата в воркере не стоит - задача откладывается
+MAX_INLINE_WAIT = 1.0
+LANE_NAMES = ("premium", "extended", "basic")
+
+
+def get_connection():
+    """Подключение к Redis; fakeredis:// - локальная замена для тестов"""
+    if config.REDIS_URL.startswith("fakeredis://"):
+        import fakeredis
+        return fakeredis.FakeRedis()
+    return Redis.from_url(config.REDIS_URL)
+
+
+conn = get_connection()
+queues = {lane: Queue(lane, connection=conn) for lane in LANE_NAMES}
+
+# Лимиты Telegram общие для всех процессов RQ: глобальный и на чат
+global_bucket = RedisTokenBucket(conn, "telegram:bucket", config.TELEGRAM_GLOBAL_RATE, config.TELEGRAM_GLOBAL_RATE)
+
+# Keep-alive соединение с Bot API внутри процесса RQ воркера
+http = requests.Session()
+
+
+def delivery_id(user_id, news_uid) -> str:
+    return hashlib.sha1(f"{user_id}:{news_uid}".encode()).hexdigest()
+
+
+def chat_bucket(user_id) -> RedisTokenBucket:
+    return RedisTokenBucket(conn, f"telegram:chat:{user_id}", config.TELEGRAM_CHAT_RATE, 1)
+
+
+def delivery_failed(job, connection, exc_type, exc_value, traceback):
+    """on_failure задачи: после последней попытки освобождаем ключ доставки
+
+    Иначе ключ остается "queued" на DELIVERY_KEY_TTL и блокирует повторную постановку.
+    """
+    if job.retries_left:
+        return
+    key = job.args[2] if len(job.args) > 2 else None
+    if key and connection.get(key) == b"queued":
+        connection.delete(key)
+    logger.warning(f"❌ Доставка {job.args[0]} не удалась: {exc_value}")
+
+
+def defer(user_id, text, key, delay: float, news_uid=None) -> str:
+    """Откладывает отправку на delay секунд в ту же очередь (нужен воркер с планировщиком)"""
+    job = get_current_job()
+    queue = queues.get(job.origin if job else "basic", queues["basic"])
+    queue.enqueue_in(
+        timedelta(seconds=delay), send_news, user_id, text, key, news_uid,
+        retry=Retry(max=3, interval=[30, 60]), on_failure=Callback(delivery_failed),
+    )
+    return "deferred"
+
+
+def extract_retry_after(data: dict, headers) -> Optional[float]:
+    """retry_after из ответа 429: parameters.retry_after или заголовок Retry-After"""
+    retry_after = (data.get("parameters") or {}).get("retry_after")
+    if retry_after is not None:
+        return parse_retry_after(str(retry_after))
+    return parse_retry_after(headers.get("Retry-After")) or 1.0
+
+
+def send_news(user_id, text, key=None, news_uid=None):
+    """Задача RQ: отправляет новость пользователю через Bot API с лимитами Telegram"""
+    # После повтора задачи не отправляем то, что уже дошло
+    if key and conn.get(key) in (b"sent", b"blocked"):
+        return "duplicate"
+
+    # После 429 все воркеры ждут, пока Telegram снимет ограничение
+    pause_ms = conn.pttl(PAUSE_KEY)
+    if pause_ms and pause_ms > 0:
+        return defer(user_id, text, key, pause_ms / 1000, news_uid)
+
+    wait = chat_bucket(user_id).try_acquire()
+    if wait > MAX_INLINE_WAIT:
+        return defer(user_id, text, key, wait, news_uid)
+    if wait > 0:
+        time.sleep(wait)
+        chat_bucket(user_id).acquire()
+    global_bucket.acquire()
+
+    response = http.post(
+        f"https://api.telegram.org/bot{config.BOT_TOKEN}/sendMessage",
+        json={"chat_id": user_id, "text": text, "parse_mode": "HTML"},
+        timeout=config.HTTP_TIMEOUT_SECONDS,
+    )
+    data = response.json()
+
+    if not data.get("ok"):
+        error_code = data.get("error_code")
+        if error_code == 429:
+            retry_after = extract_retry_after(data, response.headers)
+            conn.set(PAUSE_KEY, "1", px=max(1, int(retry_after * 1000)))
+            logger.warning(f"⏳ Telegram 429, пауза отправки {retry_after:.0f} сек")
+            return defer(user_id, text, key, retry_after, news_uid)
+        if error_code in (400, 403):
+            # Бот заблокирован или чат не найден - повторять бессмысленно
+            if key:
+                conn.set(key, "blocked", ex=DELIVERY_KEY_TTL)
+            return "blocked"
+        # Исключение запускает повтор по Retry задачи
+        raise RuntimeError(f"Telegram {error_code}: {data.get('description')}")
+
+    if key:
+        conn.set(key, "sent", ex=DELIVERY_KEY_TTL)
+    if news_uid:
+        # Воркер RQ выполняет задачу в дочернем процессе - буфер истории пишется сразу
+        read_history.mark_viewed(user_id, [news_uid])
+        read_history.flush()
+    return "sent"
+
+
+def enqueue_deliveries(deliveries: Iterable[Tuple[int, str, str, str]]) -> int:
+    """Пакетно ставит доставки в очереди RQ: (user_id, полоса, uid новости или None, текст)
+
+    Ключи идемпотентности занимаются через SET NX, задачи ставятся
+    через enqueue_many - по одному конвейеру Redis на каждую операцию.
+    """
+    deliveries = list(deliveries)
+    enqueued = 0
+
+    for start in range(0, len(deliveries), ENQUEUE_CHUNK_SIZE):
+        chunk = deliveries[start:start + ENQUEUE_CHUNK_SIZE]
+        # Ключ идемпотентности есть только у доставок с uid новости;
+        # сообщения без uid (рассылки auto_sender) ставятся всегда
+        ids = [delivery_id(user_id, news_uid) if news_uid else None for user_id, _, news_uid, _ in chunk]
+
+        # Доставки, уже поставленные другим воркером, отсеиваются
+        with conn.pipeline(transaction=False) as pipe:
+            for job_id in ids:
+                if job_id:
+                    pipe.set(f"delivery:{job_id}", "queued", nx=True, ex=DELIVERY_KEY_TTL)
+            results = iter(pipe.execute())
+        claimed = [next(results) if job_id else True for job_id in ids]
+
+        jobs_by_lane = {}
+        for (user_id, lane, news_uid, text), job_id, is_new in zip(chunk, ids, claimed):
+            if not is_new:
+                continue
+            jobs_by_lane.setdefault(lane, []).append(Queue.prepare_data(
+                send_news,
+                args=(user_id, text, f"delivery:{job_id}" if job_id else None, news_uid),
+                job_id=f"delivery-{job_id}" if job_id else None,
+                retry=Retry(max=3, interval=[30, 60]),
+                on_failure=Callback(delivery_failed),
+            ))
+
+        with conn.pipeline() as pipe:
+            for lane, jobs in jobs_by_lane.items():
+                queues.get(lane, queues["basic"]).enqueue_many(jobs, pipeline=pipe)
+                enqueued += len(jobs)
+            pipe.execute()
+
+    logger.info(f"📤 В очереди RQ поставлено доставок: {enqueued} из {len(deliveries)}")
+    return enqueued
+
+
+def enqueue_news(user_id, lane, news_uid, text):
+    """Ставит в очередь одну доставку"""
+    return enqueue_deliveries([(user_id, lane, news_uid, text)])
+
+
+def run_worker(lanes=LANE_NAMES):
+    """RQ воркер доставки с планировщиком (нужен для отложенных задач) на config.REDIS_URL"""
+    from rq import Worker
+
+    Worker([queues[lane] for lane in lanes], connection=conn).work(with_scheduler=True)
+
+
+if __name__ == "__main__":
+    run_worker()
@@ -0,0 +1,144 @@
+import os
+import json
+import asyncio
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+class AICache:
+    """Кеш результатов AI редактирования с адресацией по содержимому (TTL + LRU)"""
+
+    def __init__(self):
+        self.cache_file = Path(config.NEWS_ARCHIVE_PATH) / "meta" / "ai_cache.json"
+        self.ttl_seconds = config.AI_CACHE_TTL_HOURS * 3600
+        self.max_entries = config.AI_CACHE_MAX_ENTRIES
+
+        # Порядок записей - от давно использованных к недавно использованным
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.dirty = False
+        # Сохранения из параллельных категорий пишут файл по очереди
+        self.save_lock = asyncio.Lock()
+        self._load()
+
+    def _load(self):
+        """Загружает кеш с диска"""
+        try:
+            if self.cache_file.exists():
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    for key, entry in json.load(f):
+                        self.entries[key] = entry
+                self._purge_expired()
+                logger.info(f"🗄️ Загружено записей AI кеша: {len(self.entries)}")
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка загрузки AI кеша: {e}")
+            self.entries = OrderedDict()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Нормализует текст: регистр и пробелы не влияют на ключ"""
+        return ' '.join((text or '').lower().split())
+
+    def make_key(self, model: str, prompt_version: str, title: str, content: str) -> str:
+        """Вычисляет ключ кеша по модели, версии промпта и содержимому новости"""
+        raw = '\n'.join([model, prompt_version, self._normalize(title), self._normalize(content)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _is_expired(self, entry: Dict) -> bool:
+        return time.time() - entry.get('created_at', 0) > self.ttl_seconds
+
+    def _purge_expired(self):
+        """Удаляет устаревшие записи"""
+        expired = [key for key, entry in self.entries.items() if self._is_expired(entry)]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self.dirty = True
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Возвращает сохраненный результат редактирования"""
+        entry = self.entries.get(key)
+
+        if entry is None or self._is_expired(entry):
+            if entry is not None:
+                del self.entries[key]
+                self.dirty = True
+            self.stats['misses'] += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry['result']
+
+    def set(self, key: str, result: Dict[str, str]):
+        """Сохраняет результат редактирования, вытесняя давно неиспользуемые записи"""
+        self.entries[key] = {
+            'result': result,
+            'created_at': time.time()
+        }
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+        self.dirty = True
+
+    def get_stats(self) -> Dict:
+        """Возвращает статистику кеша"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self.entries),
+            'hit_rate': round(self.stats['hits'] / lookups * 100, 1) if lookups else 0
+        }
+
+    def _write(self, items: list) -> bool:
+        """Пишет записи в файл кеша атомарной заменой"""
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(items, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения AI кеша: {e}")
+            return False
+
+    def save(self) -> bool:
+        """Сохраняет кеш на диск"""
+        if not self.dirty:
+            return True
+
+        self._purge_expired()
+        if not self._write(list(self.entries.items())):
+            return False
+        self.dirty = False
+        return True
+
+    async def save_async(self) -> bool:
+        """Сохраняет кеш на диск, не блокируя event loop
+
+        Снимок записей берется в event loop, сериализация и запись файла идут в потоке.
+        """
+        async with self.save_lock:
+            if not self.dirty:
+                return True
+
+            self._purge_expired()
+            items = list(self.entries.items())
+            self.dirty = False
+            if not await asyncio.to_thread(self._write, items):
+                self.dirty = True
+                return False
+            return True
+
+# Создаем глобальный экземпляр кеша
+ai_cache = AICache()
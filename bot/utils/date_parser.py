@@ -0,0 +1,173 @@
+import re
+import logging
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+
+# Буквенные часовые пояса, встречающиеся в RSS (RFC 822 и распространенные отклонения)
+ZONE_OFFSETS = {
+    'UT': 0, 'UTC': 0, 'GMT': 0, 'Z': 0,
+    'EST': -5, 'EDT': -4, 'CST': -6, 'CDT': -5,
+    'MST': -7, 'MDT': -6, 'PST': -8, 'PDT': -7,
+    'CET': 1, 'CEST': 2, 'EET': 2, 'EEST': 3, 'MSK': 3,
+    'HKT': 8, 'SGT': 8, 'JST': 9, 'KST': 9,
+    'ACST': 9.5, 'AEST': 10, 'AEDT': 11, 'NZST': 12, 'NZDT': 13
+}
+
+RFC822_RE = re.compile(
+    r'\s*(?:[A-Za-z]+,?\s+)?(\d{1,2})\s+([A-Za-z]{3})[A-Za-z]*\.?\s+(\d{2,4})\s+'
+    r'(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([A-Za-z]{1,5}|[+-]\d{2}:?\d{2})?\s*$'
+)
+
+# Буквенный пояс в конце строки (для проверки результата email.utils и feedparser)
+TRAILING_ZONE_RE = re.compile(r'\s[A-Za-z]{1,5}\s*$')
+
+ISO8601_RE = re.compile(
+    r'\s*(\d{4})-(\d{2})-(\d{2})(?:[Tt ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?'
+    r'\s*([Zz]|[+-]\d{2}(?::?\d{2})?)?)?\s*$'
+)
+
+def _zone(value: Optional[str]) -> Optional[timezone]:
+    """Часовой пояс из смещения (+0300, +03:00, +03) или аббревиатуры; без пояса - UTC
+
+    Неизвестная или неоднозначная аббревиатура (IST) - None: UTC не подставляется,
+    и ни один формат, включая feedparser, такую дату не принимает.
+    """
+    if not value:
+        return timezone.utc
+    if value[0] in '+-':
+        digits = value[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + (int(digits[2:4]) if len(digits) > 2 else 0)
+        return timezone(timedelta(minutes=-minutes if value[0] == '-' else minutes))
+    offset = ZONE_OFFSETS.get(value.upper())
+    if offset is None:
+        return None
+    return timezone(timedelta(hours=offset))
+
+def _to_utc(parsed: datetime) -> datetime:
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def parse_isoformat(date_str: str) -> Optional[datetime]:
+    """ISO 8601 средствами datetime.fromisoformat (реализован на C)"""
+    return _to_utc(datetime.fromisoformat(date_str.strip()))
+
+def parse_rfc822(date_str: str) -> Optional[datetime]:
+    """RFC 822 / RFC 2822: 'Sat, 18 Oct 2026 10:15:00 +0300'"""
+    match = RFC822_RE.match(date_str)
+    if not match:
+        return None
+    day, month, year, hour, minute, second, zone = match.groups()
+    month_number = MONTHS.get(month.lower())
+    if not month_number:
+        return None
+    tzinfo = _zone(zone)
+    if tzinfo is None:
+        return None
+    year = int(year)
+    if year < 100:
+        year += 2000 if year < 70 else 1900
+    parsed = datetime(year, month_number, int(day), int(hour), int(minute), int(second or 0), tzinfo=tzinfo)
+    return parsed.astimezone(timezone.utc)
+
+def parse_iso8601(date_str: str) -> Optional[datetime]:
+    """ISO 8601 с вариантами, которые не принимает fromisoformat (запятая, короткое смещение)"""
+    match = ISO8601_RE.match(date_str)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    tzinfo = _zone(zone)
+    if tzinfo is None:
+        return None
+    microsecond = int((fraction or '0')[:6].ljust(6, '0'))
+    parsed = datetime(
+        int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+        microsecond, tzinfo=tzinfo
+    )
+    return parsed.astimezone(timezone.utc)
+
+def parse_email(date_str: str) -> Optional[datetime]:
+    """Устаревшие формы RFC 822, которые понимает email.utils"""
+    parsed = parsedate_to_datetime(date_str)
+    # Неизвестный буквенный пояс email.utils молча считает UTC - такую дату не принимаем
+    if parsed.tzinfo is None and TRAILING_ZONE_RE.search(date_str):
+        return None
+    return _to_utc(parsed)
+
+def parse_feedparser(date_str: str) -> Optional[datetime]:
+    """Последний вариант - все форматы feedparser (W3CDTF, asctime, греческие, корейские и т.д.)"""
+    from feedparser.datetimes import _parse_date
+
+    # Неизвестный буквенный пояс feedparser молча считает UTC - лучше без даты, чем сдвиг на часы
+    trailing = TRAILING_ZONE_RE.search(date_str)
+    if trailing and trailing.group().strip().upper() not in {*ZONE_OFFSETS, 'AM', 'PM'}:
+        return None
+
+    parsed_time = _parse_date(date_str)
+    if not parsed_time:
+        return None
+    # feedparser возвращает время в UTC
+    return datetime(*parsed_time[:6], tzinfo=timezone.utc)
+
+class DateParser:
+    """Разбор дат RSS/Atom с запоминанием формата каждой ленты
+
+    Все даты возвращаются в UTC с tzinfo. Формат, который сработал для ленты
+    последним, пробуется первым - обычно лента использует один формат.
+    """
+
+    def __init__(self):
+        self.formats: Dict[str, Callable[[str], Optional[datetime]]] = {
+            'isoformat': parse_isoformat,
+            'rfc822': parse_rfc822,
+            'iso8601': parse_iso8601,
+            'email': parse_email,
+            'feedparser': parse_feedparser,
+        }
+        # feed_url -> имя формата, который сработал последним
+        self.feed_formats: Dict[str, str] = {}
+        self.stats = {'learned_hits': 0, 'learned_misses': 0, 'failed': 0}
+
+    def _try(self, name: str, date_str: str) -> Optional[datetime]:
+        try:
+            return self.formats[name](date_str)
+        except (ValueError, TypeError, OverflowError, IndexError):
+            return None
+
+    def parse(self, date_str: str, feed_url: Optional[str] = None) -> Optional[datetime]:
+        """Парсит дату; None - если ни один формат не подошел"""
+        if not date_str:
+            return None
+
+        learned = self.feed_formats.get(feed_url) if feed_url else None
+        if learned:
+            parsed = self._try(learned, date_str)
+            if parsed:
+                self.stats['learned_hits'] += 1
+                return parsed
+            self.stats['learned_misses'] += 1
+
+        for name in self.formats:
+            if name == learned:
+                continue
+            parsed = self._try(name, date_str)
+            if parsed:
+                # feedparser - запасной вариант для редких форматов, поэтому не запоминается
+                if feed_url and name != 'feedparser':
+                    self.feed_formats[feed_url] = name
+                return parsed
+
+        self.stats['failed'] += 1
+        logger.warning(f"Не удалось распарсить дату: {date_str}")
+        return None
+
+# Создаем глобальный экземпляр парсера дат
+date_parser = DateParser()
@@ -0,0 +1,105 @@
+from typing import Dict, Iterator, List, Optional
+from xml.etree.ElementTree import Element, ParseError, XMLPullParser
+
+MEDIA_NS = '{http://search.yahoo.com/mrss/}'
+
+def _local(tag: str) -> str:
+    """Имя тега без пространства имен"""
+    return tag.rsplit('}', 1)[-1]
+
+def _text(element: Element) -> str:
+    """Текст элемента вместе с вложенной разметкой (HTML в description без CDATA)"""
+    if len(element) == 0:
+        return (element.text or '').strip()
+    return ''.join(element.itertext()).strip()
+
+class StreamEntry(dict):
+    """Запись ленты с доступом к полям как к атрибутам (как у FeedParserDict)"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+def element_to_entry(element: Element) -> StreamEntry:
+    """Преобразует <item> (RSS) или <entry> (Atom) в запись в формате feedparser"""
+    entry = StreamEntry()
+    media_content: List[Dict] = []
+    media_thumbnail: List[Dict] = []
+    enclosures: List[Dict] = []
+
+    for child in element:
+        tag = child.tag
+        name = _local(tag)
+
+        if tag.startswith(MEDIA_NS):
+            if name == 'content':
+                media_content.append({'url': child.get('url'), 'type': child.get('type', '')})
+            elif name == 'thumbnail':
+                media_thumbnail.append({'url': child.get('url')})
+        elif name == 'link':
+            # Atom: <link href rel>; RSS: <link>url</link>
+            href = child.get('href')
+            rel = child.get('rel', 'alternate')
+            if href and rel == 'enclosure':
+                enclosures.append({'href': href, 'type': child.get('type', '')})
+            elif href and rel == 'alternate':
+                entry.setdefault('link', href)
+            elif not href:
+                entry.setdefault('link', _text(child))
+        elif name == 'enclosure':
+            enclosures.append({'href': child.get('url'), 'type': child.get('type', '')})
+        elif name in ('encoded', 'content'):
+            entry['content'] = [{'value': _text(child)}]
+        elif name in ('title', 'summary', 'description', 'published', 'updated', 'pubDate', 'date'):
+            entry.setdefault('published' if name == 'date' else name, _text(child))
+
+    if media_content:
+        entry['media_content'] = media_content
+    if media_thumbnail:
+        entry['media_thumbnail'] = media_thumbnail
+    if enclosures:
+        entry['enclosures'] = enclosures
+    return entry
+
+class FeedStreamReader:
+    """Инкрементальный разбор RSS/Atom: записи выдаются по мере поступления байтов"""
+
+    def __init__(self):
+        self.parser = XMLPullParser(events=('start', 'end'))
+        self.source_title: Optional[str] = None
+        self.depth = 0
+        self.entry_depth: Optional[int] = None
+        self.entries_seen = 0
+
+    def feed(self, chunk: bytes) -> Iterator[StreamEntry]:
+        """Принимает очередной кусок тела и возвращает завершенные записи
+
+        ParseError пробрасывается: вызывающий код решает, переходить ли на feedparser.
+        """
+        self.parser.feed(chunk)
+        for event, element in self.parser.read_events():
+            if event == 'start':
+                self.depth += 1
+                if self.entry_depth is None and _local(element.tag) in ('item', 'entry'):
+                    self.entry_depth = self.depth
+                continue
+
+            self.depth -= 1
+            name = _local(element.tag)
+
+            if self.entry_depth is not None and self.depth + 1 == self.entry_depth and name in ('item', 'entry'):
+                self.entry_depth = None
+                self.entries_seen += 1
+                yield element_to_entry(element)
+                # Освобождаем память разобранной записи
+                element.clear()
+            elif name == 'title' and self.entry_depth is None and self.source_title is None:
+                self.source_title = _text(element)
+
+    def close(self):
+        try:
+            self.parser.close()
+        except ParseError:
+            pass
@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+class FeedValidatorStore:
+    """Хранилище валидаторов RSS лент (ETag, Last-Modified, хеш содержимого)"""
+
+    def __init__(self):
+        self.store_file = Path(config.NEWS_ARCHIVE_PATH) / "meta" / "feed_validators.json"
+        self.validators: Dict[str, Dict] = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        """Загружает валидаторы с диска"""
+        try:
+            if self.store_file.exists():
+                with open(self.store_file, 'r', encoding='utf-8') as f:
+                    self.validators = json.load(f)
+                logger.info(f"📁 Загружено валидаторов RSS лент: {len(self.validators)}")
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка загрузки валидаторов RSS лент: {e}")
+            self.validators = {}
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        """Вычисляет хеш содержимого ленты"""
+        return hashlib.sha1(content).hexdigest()
+
+    def get(self, feed_url: str) -> Optional[Dict]:
+        """Возвращает сохраненные валидаторы ленты"""
+        return self.validators.get(feed_url)
+
+    def get_request_headers(self, feed_url: str) -> Dict[str, str]:
+        """Формирует заголовки условного GET запроса"""
+        record = self.validators.get(feed_url)
+        # Без сохраненных новостей ответ 304 бесполезен - запрашиваем ленту целиком
+        if not record or record.get('items') is None:
+            return {}
+
+        headers = {}
+        if record.get('etag'):
+            headers['If-None-Match'] = record['etag']
+        if record.get('last_modified'):
+            headers['If-Modified-Since'] = record['last_modified']
+        return headers
+
+    def update(self, feed_url: str, etag: Optional[str], last_modified: Optional[str],
+               content_hash: str, items: List[Dict]):
+        """Обновляет валидаторы и последний результат парсинга ленты"""
+        self.validators[feed_url] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': content_hash,
+            'items': items,
+            'checked_at': datetime.now().isoformat()
+        }
+        self.dirty = True
+
+    def touch(self, feed_url: str):
+        """Отмечает время последней проверки неизменившейся ленты"""
+        record = self.validators.get(feed_url)
+        if record:
+            record['checked_at'] = datetime.now().isoformat()
+            self.dirty = True
+
+    def save(self) -> bool:
+        """Сохраняет валидаторы на диск"""
+        if not self.dirty:
+            return True
+
+        try:
+            self.store_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.store_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.validators, f, ensure_ascii=False)
+            os.replace(tmp_file, self.store_file)
+            self.dirty = False
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения валидаторов RSS лент: {e}")
+            return False
+
+# Создаем глобальный экземпляр хранилища
+feed_validators = FeedValidatorStore()
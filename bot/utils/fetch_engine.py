@@ -0,0 +1,125 @@
+import asyncio
+import aiohttp
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlparse
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+class FetchEngine:
+    """Общий HTTP движок загрузки лент с пулом соединений и лимитами"""
+
+    def __init__(self):
+        self.timeout = config.HTTP_TIMEOUT_SECONDS
+        self.max_connections = config.HTTP_MAX_CONNECTIONS
+        self.max_per_host = config.HTTP_MAX_PER_HOST
+        self.dns_cache_ttl = config.HTTP_DNS_CACHE_TTL
+        self.keepalive_timeout = config.HTTP_KEEPALIVE_TIMEOUT
+        self.max_bytes = config.FEED_MAX_BYTES
+        self.chunk_size = config.FEED_STREAM_CHUNK
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        # Статистика запросов
+        self.stats = {'requests': 0, 'errors': 0, 'truncated': 0}
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Возвращает общую сессию, создавая её при первом обращении"""
+        loop = asyncio.get_running_loop()
+
+        # Сессия привязана к event loop - пересоздаем при смене loop
+        if self.session is None or self.session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+                }
+            )
+            self._loop = loop
+            self._global_semaphore = asyncio.Semaphore(self.max_connections)
+            self._host_semaphores = {}
+            logger.info(
+                f"🌐 HTTP движок запущен (соединений: {self.max_connections}, "
+                f"на хост: {self.max_per_host}, DNS кеш: {self.dns_cache_ttl} сек)"
+            )
+
+        return self.session
+
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Возвращает семафор для хоста URL"""
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_semaphores[host]
+
+    async def read_body(self, response: aiohttp.ClientResponse, chunks: Optional[List[bytes]] = None,
+                        size: int = 0) -> bytes:
+        """Дочитывает тело ответа кусками, не больше FEED_MAX_BYTES
+
+        chunks/size - уже прочитанное начало тела (при потоковом разборе).
+        Слишком большое тело обрезается: feedparser разберет записи, которые успели прийти.
+        """
+        chunks = list(chunks or [])
+        async for chunk in response.content.iter_chunked(self.chunk_size):
+            size += len(chunk)
+            if size > self.max_bytes:
+                self.stats['truncated'] += 1
+                logger.warning(f"✂️ Ответ {response.url} больше {self.max_bytes} байт, обрезан")
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    @asynccontextmanager
+    async def stream(self, url: str, headers: Optional[Dict[str, str]] = None) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Открывает ответ для чтения по кускам под лимитами соединений
+
+        Выход из контекста до конца тела закрывает соединение - остаток ленты не скачивается.
+        """
+        session = await self.get_session()
+
+        async with self._global_semaphore, self._get_host_semaphore(url):
+            self.stats['requests'] += 1
+            try:
+                async with session.get(url, headers=headers) as response:
+                    yield response
+            except Exception:
+                self.stats['errors'] += 1
+                raise
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict:
+        """Загружает URL через общий пул соединений
+
+        Возвращает словарь со статусом, телом ответа (не больше FEED_MAX_BYTES) и заголовками.
+        Исключения (таймауты, ошибки соединения) пробрасываются вызывающему коду.
+        """
+        async with self.stream(url, headers=headers) as response:
+            content = await self.read_body(response) if response.status == 200 else b''
+            return {
+                'status': response.status,
+                'content': content,
+                'headers': response.headers.copy()
+            }
+
+    async def close(self):
+        """Закрывает общую сессию"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+            logger.info(f"🌐 HTTP движок остановлен (запросов: {self.stats['requests']}, ошибок: {self.stats['errors']})")
+        self.session = None
+        self._loop = None
+
+# Создаем глобальный экземпляр движка
+fetch_engine = FetchEngine()
@@ -1,41 +1,60 @@
 import re
-import html
+from html.entities import html5 as html5_entities
 from typing import Dict, Optional
 from urllib.parse import urlparse
 
-def clean_html_entities(text: str) -> str:
-    """Очищает HTML entities из текста"""
+# Замены, которые отличаются от html.unescape: типографские кавычки -> прямые, nbsp -> пробел
+ENTITY_OVERRIDES = {
+    'ldquo': '"', 'rdquo': '"', 'lsquo': "'", 'rsquo': "'", 'nbsp': ' ',
+    '#8220': '"', '#8221': '"', '#8216': "'", '#8217': "'", '#160': ' ',
+}
+
+# Entity: числовая (&#8212; &#x2014;) или именованная, ';' у старых именованных необязательна
+_ENTITY = r'&(#[0-9]{1,7}|#[xX][0-9a-fA-F]{1,6}|[A-Za-z][A-Za-z0-9]{1,31});?'
+# Блочные теги разделяют слова даже без пробелов вокруг, строчные (<b>, <a>) просто удаляются
+_BLOCK_TAGS = r'p|br|div|li|ul|ol|h[1-6]|tr|td|blockquote|figure|figcaption'
+
+_CLEAN_HTML_RE = re.compile(rf'<(/?(?:{_BLOCK_TAGS})\b)?[^>]*>|{_ENTITY}', re.IGNORECASE)
+_ENTITY_RE = re.compile(_ENTITY)
+
+def _decode_entity(name: str, original: str) -> str:
+    replacement = ENTITY_OVERRIDES.get(name)
+    if replacement is not None:
+        return replacement
+    if name[0] == '#':
+        code = int(name[2:], 16) if name[1] in 'xX' else int(name[1:])
+        # Суррогаты и коды вне Unicode заменяются, как в html.unescape
+        return chr(code) if 0 < code < 0x110000 and not 0xD800 <= code <= 0xDFFF else '\ufffd'
+    # Без ';' декодируются только старые entity (&amp, &copy) - как в html.unescape
+    key = name + ';' if original.endswith(';') else name
+    return html5_entities.get(key, original)
+
+def _replace_entity(match) -> str:
+    return _decode_entity(match.group(1), match.group(0))
+
+def _replace_html_token(match) -> str:
+    entity = match.group(2)
+    if entity is not None:
+        return _decode_entity(entity, match.group(0))
+    return ' ' if match.group(1) is not None else ''
+
+def clean_html(text: str) -> str:
+    """Убирает HTML теги, декодирует entities и схлопывает пробелы
+
+    Теги и entities обрабатываются одним проходом скомпилированного выражения,
+    пробелы (включая nbsp) схлопываются split/join без регулярных выражений.
+    """
     if not text:
         return ""
-    
-    # Сначала используем стандартный html.unescape
-    text = html.unescape(text)
-    
-    # Дополнительные замены для специфичных случаев
-    replacements = {
-        '&laquo;': '«',
-        '&raquo;': '»',
-        '&ldquo;': '"',
-        '&rdquo;': '"',
-        '&lsquo;': ''',
-        '&rsquo;': ''',
-        '&mdash;': '—',
-        '&ndash;': '–',
-        '&hellip;': '…',
-        '&#8220;': '"',
-        '&#8221;': '"',
-        '&#8216;': ''',
-        '&#8217;': ''',
-        '&#8212;': '—',
-        '&#8211;': '–',
-        '&#8230;': '…',
-        '&nbsp;': ' '
-    }
-    
-    for entity, replacement in replacements.items():
-        text = text.replace(entity, replacement)
-    
-    return text
+    if '<' in text or '&' in text:
+        text = _CLEAN_HTML_RE.sub(_replace_html_token, text)
+    return ' '.join(text.split())
+
+def clean_html_entities(text: str) -> str:
+    """Очищает HTML entities из текста (разметка и переносы строк сохраняются)"""
+    if not text or '&' not in text:
+        return text or ""
+    return _ENTITY_RE.sub(_replace_entity, text)
 
 def remove_emoji_from_category(category_name: str) -> str:
     """Убирает эмодзи из названия категории"""
@@ -76,7 +95,7 @@ def escape_markdown(text: str) -> str:
 def format_processed_news(processed_news: Dict, source: str, image_url: Optional[str] = None) -> str:
     """Форматирует обработанную новость для отправки в Telegram"""
     try:
-        title = clean_html_entities(processed_news.get('title', 'Без заголовка'))
+        title = clean_html(processed_news.get('title', 'Без заголовка'))
         summary = clean_html_entities(processed_news.get('summary', 'Нет описания'))
         hashtags = processed_news.get('hashtags', [])
         
@@ -121,11 +140,11 @@ def format_news_for_storage(news_item: Dict) -> Dict:
     """Форматирует новость для сохранения в кеше"""
     return {
         'id': news_item.get('id', ''),
-        'title': clean_html_entities(news_item.get('title', '')),
+        'title': clean_html(news_item.get('title', '')),
         'summary': clean_html_entities(news_item.get('summary', '')),
         'link': news_item.get('link', ''),
         'published': news_item.get('published', ''),
-        'source_title': clean_html_entities(news_item.get('source_title', '')),
+        'source_title': clean_html(news_item.get('source_title', '')),
         'image_url': news_item.get('image_url'),
         'processed_at': news_item.get('processed_at', ''),
         'category': news_item.get('category', ''),
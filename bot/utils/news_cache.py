@@ -1,11 +1,11 @@
-import os
-import json
 import asyncio
 import logging
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from bot.config import config
+from bot.utils.news_storage import create_news_storage
 
 logger = logging.getLogger(__name__)
 
@@ -17,37 +17,62 @@ class NewsCache:
         
         # Создаем директорию архива если не существует
         self.archive_path.mkdir(parents=True, exist_ok=True)
-        logger.info(f"📁 Архив новостей: {self.archive_path}")
+        
+        # Хранилище подключается через NEWS_STORAGE_BACKEND (sqlite или json)
+        db_path = Path(config.NEWS_DB_PATH) if config.NEWS_DB_PATH else self.archive_path / "news.db"
+        self.storage = create_news_storage(config.NEWS_STORAGE_BACKEND, self.archive_path, db_path)
+        logger.info(f"📁 Архив новостей: {self.archive_path} (хранилище: {config.NEWS_STORAGE_BACKEND})")
+        
+        # Горячий слой в памяти: новости категорий, готовая выборка последних и статистика
+        self.hot_max_items = config.HOT_CACHE_MAX_ITEMS
+        self.latest_view_size = config.HOT_CACHE_LATEST_SIZE
+        self.hot_categories: "OrderedDict[str, Tuple[datetime, List[Dict]]]" = OrderedDict()
+        self.latest_view: Optional[List[Dict]] = None
+        self.stats_view: Optional[Dict] = None
+        self.storage_version = None
     
-    def _get_category_file(self, category: str) -> Path:
-        """Получает путь к файлу категории"""
-        return self.archive_path / f"{category}.json"
+    def _invalidate_hot(self):
+        """Сбрасывает горячий слой"""
+        self.hot_categories.clear()
+        self.latest_view = None
+        self.stats_view = None
     
-    def _get_daily_archive_file(self, date: datetime) -> Path:
-        """Получает путь к дневному архиву"""
-        date_str = date.strftime("%Y-%m-%d")
-        return self.archive_path / "daily" / f"{date_str}.json"
+    async def _sync_hot_with_storage(self):
+        """Сбрасывает горячий слой, если хранилище изменил другой процесс"""
+        version = await asyncio.to_thread(self.storage.version)
+        if version != self.storage_version:
+            if self.storage_version is not None:
+                logger.info("♻️ Хранилище новостей изменено другим процессом, сбрасываем горячий кеш")
+            self._invalidate_hot()
+            self.storage_version = version
+    
+    def _put_hot_category(self, category: str, updated_at: datetime, news_list: List[Dict]):
+        """Кладет новости категории в горячий слой с ограничением по памяти"""
+        self.hot_categories[category] = (updated_at, news_list)
+        self.hot_categories.move_to_end(category)
+        
+        # Вытесняем давно не читавшиеся категории
+        total_items = sum(len(items) for _, items in self.hot_categories.values())
+        while total_items > self.hot_max_items and len(self.hot_categories) > 1:
+            _, (_, evicted) = self.hot_categories.popitem(last=False)
+            total_items -= len(evicted)
     
     async def save_news(self, category: str, news_list: List[Dict]) -> bool:
         """Сохраняет новости категории"""
         async with self.lock:
             try:
-                category_file = self._get_category_file(category)
+                # Сначала учитываем чужие записи, затем пишем свою
+                await self._sync_hot_with_storage()
                 
-                # Подготавливаем данные для сохранения
-                cache_data = {
-                    'category': category,
-                    'updated_at': datetime.now().isoformat(),
-                    'news_count': len(news_list),
-                    'news': news_list
-                }
-                
-                # Сохраняем в файл категории
-                with open(category_file, 'w', encoding='utf-8') as f:
-                    json.dump(cache_data, f, ensure_ascii=False, indent=2)
+                # Запросы к хранилищу блокирующие - выполняются вне цикла событий
+                updated_at = datetime.now()
+                await asyncio.to_thread(self.storage.save, category, news_list, updated_at)
                 
-                # Также сохраняем в дневной архив
-                await self._save_to_daily_archive(news_list)
+                # Хранилище дописывает новости к категории - горячий слой перечитает ее при чтении
+                self.hot_categories.pop(category, None)
+                self.latest_view = None
+                self.stats_view = None
+                self.storage_version = await asyncio.to_thread(self.storage.version)
                 
                 logger.info(f"💾 Сохранено {len(news_list)} новостей для категории {category}")
                 return True
@@ -56,61 +81,35 @@ class NewsCache:
                 logger.error(f"❌ Ошибка сохранения новостей {category}: {e}")
                 return False
     
-    async def _save_to_daily_archive(self, news_list: List[Dict]):
-        """Сохраняет новости в дневной архив"""
-        try:
-            today = datetime.now()
-            daily_file = self._get_daily_archive_file(today)
-            
-            # Создаем директорию если не существует
-            daily_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Загружаем существующий архив или создаем новый
-            daily_data = []
-            if daily_file.exists():
-                with open(daily_file, 'r', encoding='utf-8') as f:
-                    daily_data = json.load(f)
-            
-            # Добавляем новые новости (избегаем дубликатов)
-            existing_ids = {item.get('id') for item in daily_data}
-            new_items = [item for item in news_list if item.get('id') not in existing_ids]
-            
-            if new_items:
-                daily_data.extend(new_items)
-                
-                # Сортируем по времени публикации
-                daily_data.sort(key=lambda x: x.get('published_timestamp', 0), reverse=True)
-                
-                # Сохраняем обновленный архив
-                with open(daily_file, 'w', encoding='utf-8') as f:
-                    json.dump(daily_data, f, ensure_ascii=False, indent=2)
-                
-                logger.info(f"📅 Добавлено {len(new_items)} новостей в дневной архив")
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения в дневной архив: {e}")
-    
     async def load_news(self, category: str) -> Optional[List[Dict]]:
         """Загружает новости категории"""
         try:
-            category_file = self._get_category_file(category)
-            
-            if not category_file.exists():
+            await self._sync_hot_with_storage()
+            
+            loaded = self.hot_categories.get(category)
+            if loaded is not None:
+                self.hot_categories.move_to_end(category)
+            else:
+                version = self.storage_version
+                loaded = await asyncio.to_thread(self.storage.load, category)
+                # Пока шло чтение, запись могла изменить категорию - такой результат не кешируем
+                if loaded is not None and version == self.storage_version:
+                    self._put_hot_category(category, *loaded)
+            
+            if loaded is None:
                 logger.warning(f"⚠️ Файл категории {category} не найден")
                 return None
             
-            with open(category_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
+            updated_at, news_list = loaded
             
             # Проверяем актуальность кеша
-            updated_at = datetime.fromisoformat(cache_data.get('updated_at', ''))
             if datetime.now() - updated_at > timedelta(hours=self.max_age_hours):
                 logger.warning(f"⚠️ Кеш категории {category} устарел")
                 return None
             
-            news_list = cache_data.get('news', [])
             logger.info(f"📰 Загружено {len(news_list)} новостей для категории {category}")
-            return news_list
+            # Копия: изменения у вызывающего кода не должны попадать в горячий слой
+            return list(news_list)
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки новостей {category}: {e}")
@@ -119,27 +118,14 @@ class NewsCache:
     async def get_latest_news(self, limit: int = 10) -> List[Dict]:
         """Получает последние новости из всех категорий"""
         try:
-            all_news = []
-            
-            # Собираем новости из всех категорий
-            for category_file in self.archive_path.glob("*.json"):
-                if category_file.name == "cache_stats.json":
-                    continue
-                
-                try:
-                    with open(category_file, 'r', encoding='utf-8') as f:
-                        cache_data = json.load(f)
-                    
-                    news_list = cache_data.get('news', [])
-                    all_news.extend(news_list)
-                    
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка чтения {category_file}: {e}")
-                    continue
+            await self._sync_hot_with_storage()
             
-            # Сортируем по времени публикации и берем последние
-            all_news.sort(key=lambda x: x.get('published_timestamp', 0), reverse=True)
-            latest_news = all_news[:limit]
+            if limit > self.latest_view_size:
+                latest_news = await asyncio.to_thread(self.storage.latest, limit)
+            else:
+                if self.latest_view is None:
+                    self.latest_view = await asyncio.to_thread(self.storage.latest, self.latest_view_size)
+                latest_news = self.latest_view[:limit]
             
             logger.info(f"📰 Получено {len(latest_news)} последних новостей")
             return latest_news
@@ -155,45 +141,12 @@ class NewsCache:
                 logger.info("🧹 Начинаем очистку устаревших новостей")
                 
                 cutoff_time = datetime.now() - timedelta(hours=self.max_age_hours)
-                cleaned_files = 0
+                cleaned = await asyncio.to_thread(self.storage.cleanup, cutoff_time)
                 
-                # Очищаем файлы категорий
-                for category_file in self.archive_path.glob("*.json"):
-                    if category_file.name == "cache_stats.json":
-                        continue
-                    
-                    try:
-                        with open(category_file, 'r', encoding='utf-8') as f:
-                            cache_data = json.load(f)
-                        
-                        updated_at = datetime.fromisoformat(cache_data.get('updated_at', ''))
-                        
-                        if updated_at < cutoff_time:
-                            category_file.unlink()
-                            cleaned_files += 1
-                            logger.info(f"🗑️ Удален устаревший файл: {category_file.name}")
-                    
-                    except Exception as e:
-                        logger.warning(f"⚠️ Ошибка обработки {category_file}: {e}")
+                self._invalidate_hot()
+                self.storage_version = await asyncio.to_thread(self.storage.version)
                 
-                # Очищаем старые дневные архивы
-                daily_dir = self.archive_path / "daily"
-                if daily_dir.exists():
-                    for daily_file in daily_dir.glob("*.json"):
-                        try:
-                            # Извлекаем дату из имени файла
-                            date_str = daily_file.stem
-                            file_date = datetime.strptime(date_str, "%Y-%m-%d")
-                            
-                            if file_date < cutoff_time:
-                                daily_file.unlink()
-                                cleaned_files += 1
-                                logger.info(f"🗑️ Удален старый дневной архив: {daily_file.name}")
-                        
-                        except Exception as e:
-                            logger.warning(f"⚠️ Ошибка обработки дневного архива {daily_file}: {e}")
-                
-                logger.info(f"✅ Очистка завершена, удалено файлов: {cleaned_files}")
+                logger.info(f"✅ Очистка завершена, удалено объектов: {cleaned}")
                 
             except Exception as e:
                 logger.error(f"❌ Ошибка очистки: {e}")
@@ -201,46 +154,14 @@ class NewsCache:
     async def get_cache_stats(self) -> Dict:
         """Получает статистику кеша"""
         try:
-            stats = {
-                'archive_location': str(self.archive_path),
-                'total_news': 0,
-                'categories': {},
-                'daily_archives': 0,
-                'cache_size_mb': 0
-            }
-            
-            # Статистика по категориям
-            for category_file in self.archive_path.glob("*.json"):
-                if category_file.name == "cache_stats.json":
-                    continue
-                
-                try:
-                    with open(category_file, 'r', encoding='utf-8') as f:
-                        cache_data = json.load(f)
-                    
-                    category = cache_data.get('category', category_file.stem)
-                    news_count = cache_data.get('news_count', 0)
-                    updated_at = cache_data.get('updated_at', 'Неизвестно')
-                    
-                    stats['categories'][category] = {
-                        'count': news_count,
-                        'last_updated': updated_at
-                    }
-                    stats['total_news'] += news_count
-                    
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка чтения статистики {category_file}: {e}")
+            await self._sync_hot_with_storage()
             
-            # Статистика дневных архивов
-            daily_dir = self.archive_path / "daily"
-            if daily_dir.exists():
-                stats['daily_archives'] = len(list(daily_dir.glob("*.json")))
-            
-            # Размер кеша
-            total_size = sum(f.stat().st_size for f in self.archive_path.rglob("*.json"))
-            stats['cache_size_mb'] = round(total_size / (1024 * 1024), 2)
-            
-            return stats
+            if self.stats_view is None:
+                self.stats_view = {
+                    'archive_location': str(self.archive_path),
+                    **(await asyncio.to_thread(self.storage.stats))
+                }
+            return dict(self.stats_view)
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения статистики кеша: {e}")
@@ -0,0 +1,486 @@
+import json
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class NewsStorage(ABC):
+    """Базовый класс хранилища новостей для NewsCache
+
+    Методы блокирующие: NewsCache вызывает их через asyncio.to_thread.
+    """
+
+    def __init__(self, archive_path: Path):
+        self.archive_path = archive_path
+
+    @abstractmethod
+    def save(self, category: str, news_list: List[Dict], updated_at: datetime) -> None:
+        """Сохраняет новости категории и дописывает их в дневной архив"""
+
+    @abstractmethod
+    def load(self, category: str) -> Optional[Tuple[datetime, List[Dict]]]:
+        """Возвращает время обновления и новости категории"""
+
+    @abstractmethod
+    def latest(self, limit: int) -> List[Dict]:
+        """Возвращает последние новости всех категорий"""
+
+    @abstractmethod
+    def cleanup(self, cutoff_time: datetime) -> int:
+        """Удаляет данные старше cutoff_time, возвращает число удаленных объектов"""
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        """Возвращает статистику по категориям, дневным архивам и размеру"""
+
+    @abstractmethod
+    def categories(self) -> List[str]:
+        """Возвращает список сохраненных категорий"""
+
+    @abstractmethod
+    def version(self):
+        """Возвращает метку версии данных, меняющуюся при записи другим процессом"""
+
+class JSONNewsStorage(NewsStorage):
+    """Хранилище в JSON файлах: файл на категорию и файл на день"""
+
+    def _get_category_file(self, category: str) -> Path:
+        """Получает путь к файлу категории"""
+        return self.archive_path / f"{category}.json"
+
+    def _get_daily_archive_file(self, date: datetime) -> Path:
+        """Получает путь к дневному архиву"""
+        date_str = date.strftime("%Y-%m-%d")
+        return self.archive_path / "daily" / f"{date_str}.json"
+
+    def _category_files(self):
+        for category_file in self.archive_path.glob("*.json"):
+            if category_file.name == "cache_stats.json":
+                continue
+            yield category_file
+
+    def save(self, category: str, news_list: List[Dict], updated_at: datetime) -> None:
+        # Подготавливаем данные для сохранения
+        cache_data = {
+            'category': category,
+            'updated_at': updated_at.isoformat(),
+            'news_count': len(news_list),
+            'news': news_list
+        }
+
+        # Сохраняем в файл категории
+        with open(self._get_category_file(category), 'w', encoding='utf-8') as f:
+            json.dump(cache_data, f, ensure_ascii=False, indent=2)
+
+        # Также сохраняем в дневной архив
+        self._save_to_daily_archive(news_list)
+
+    def _save_to_daily_archive(self, news_list: List[Dict]):
+        """Сохраняет новости в дневной архив"""
+        try:
+            daily_file = self._get_daily_archive_file(datetime.now())
+
+            # Создаем директорию если не существует
+            daily_file.parent.mkdir(parents=True, exist_ok=True)
+
+            # Загружаем существующий архив или создаем новый
+            daily_data = []
+            if daily_file.exists():
+                with open(daily_file, 'r', encoding='utf-8') as f:
+                    daily_data = json.load(f)
+
+            # Добавляем новые новости (избегаем дубликатов)
+            existing_ids = {item.get('id') for item in daily_data}
+            new_items = [item for item in news_list if item.get('id') not in existing_ids]
+
+            if new_items:
+                daily_data.extend(new_items)
+
+                # Сортируем по времени публикации
+                daily_data.sort(key=lambda x: x.get('published_timestamp', 0), reverse=True)
+
+                # Сохраняем обновленный архив
+                with open(daily_file, 'w', encoding='utf-8') as f:
+                    json.dump(daily_data, f, ensure_ascii=False, indent=2)
+
+                logger.info(f"📅 Добавлено {len(new_items)} новостей в дневной архив")
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения в дневной архив: {e}")
+
+    def load(self, category: str) -> Optional[Tuple[datetime, List[Dict]]]:
+        category_file = self._get_category_file(category)
+
+        if not category_file.exists():
+            return None
+
+        with open(category_file, 'r', encoding='utf-8') as f:
+            cache_data = json.load(f)
+
+        updated_at = datetime.fromisoformat(cache_data.get('updated_at', ''))
+        return updated_at, cache_data.get('news', [])
+
+    def latest(self, limit: int) -> List[Dict]:
+        all_news = []
+
+        # Собираем новости из всех категорий
+        for category_file in self._category_files():
+            try:
+                with open(category_file, 'r', encoding='utf-8') as f:
+                    cache_data = json.load(f)
+
+                all_news.extend(cache_data.get('news', []))
+
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка чтения {category_file}: {e}")
+                continue
+
+        # Сортируем по времени публикации и берем последние
+        all_news.sort(key=lambda x: x.get('published_timestamp', 0), reverse=True)
+        return all_news[:limit]
+
+    def cleanup(self, cutoff_time: datetime) -> int:
+        cleaned_files = 0
+
+        # Очищаем файлы категорий
+        for category_file in self._category_files():
+            try:
+                with open(category_file, 'r', encoding='utf-8') as f:
+                    cache_data = json.load(f)
+
+                updated_at = datetime.fromisoformat(cache_data.get('updated_at', ''))
+
+                if updated_at < cutoff_time:
+                    category_file.unlink()
+                    cleaned_files += 1
+                    logger.info(f"🗑️ Удален устаревший файл: {category_file.name}")
+
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка обработки {category_file}: {e}")
+
+        # Очищаем старые дневные архивы
+        daily_dir = self.archive_path / "daily"
+        if daily_dir.exists():
+            for daily_file in daily_dir.glob("*.json"):
+                try:
+                    # Извлекаем дату из имени файла
+                    file_date = datetime.strptime(daily_file.stem, "%Y-%m-%d")
+
+                    if file_date < cutoff_time:
+                        daily_file.unlink()
+                        cleaned_files += 1
+                        logger.info(f"🗑️ Удален старый дневной архив: {daily_file.name}")
+
+                except Exception as e:
+                    logger.warning(f"⚠️ Ошибка обработки дневного архива {daily_file}: {e}")
+
+        return cleaned_files
+
+    def stats(self) -> Dict:
+        stats = {
+            'total_news': 0,
+            'categories': {},
+            'daily_archives': 0,
+            'cache_size_mb': 0
+        }
+
+        # Статистика по категориям
+        for category_file in self._category_files():
+            try:
+                with open(category_file, 'r', encoding='utf-8') as f:
+                    cache_data = json.load(f)
+
+                category = cache_data.get('category', category_file.stem)
+                news_count = cache_data.get('news_count', 0)
+
+                stats['categories'][category] = {
+                    'count': news_count,
+                    'last_updated': cache_data.get('updated_at', 'Неизвестно')
+                }
+                stats['total_news'] += news_count
+
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка чтения статистики {category_file}: {e}")
+
+        # Статистика дневных архивов
+        daily_dir = self.archive_path / "daily"
+        if daily_dir.exists():
+            stats['daily_archives'] = len(list(daily_dir.glob("*.json")))
+
+        # Размер кеша
+        total_size = sum(f.stat().st_size for f in self.archive_path.rglob("*.json"))
+        stats['cache_size_mb'] = round(total_size / (1024 * 1024), 2)
+
+        return stats
+
+    def categories(self) -> List[str]:
+        return [category_file.stem for category_file in self._category_files()]
+
+    def version(self):
+        # Время изменения файлов категорий (без чтения и парсинга)
+        return tuple(sorted(
+            (category_file.name, category_file.stat().st_mtime_ns)
+            for category_file in self._category_files()
+        ))
+
+class SQLiteNewsStorage(NewsStorage):
+    """Хранилище в SQLite (WAL) с индексами по категории, времени, id и ленте
+
+    Категория хранит последний сохраненный список, дневной архив только дополняется.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS categories (
+            category TEXT PRIMARY KEY,
+            updated_at TEXT NOT NULL,
+            news_count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS news (
+            category TEXT NOT NULL,
+            id TEXT NOT NULL,
+            published_timestamp REAL NOT NULL,
+            feed_url TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (category, id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_news_category_published ON news (category, published_timestamp);
+        CREATE INDEX IF NOT EXISTS idx_news_published ON news (published_timestamp);
+        CREATE INDEX IF NOT EXISTS idx_news_id ON news (id);
+        CREATE INDEX IF NOT EXISTS idx_news_feed_url ON news (feed_url);
+        CREATE TABLE IF NOT EXISTS daily_archive (
+            id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            published_timestamp REAL NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (id, day)
+        );
+        CREATE INDEX IF NOT EXISTS idx_daily_archive_day ON daily_archive (day);
+    """
+
+    def __init__(self, archive_path: Path, db_path: Path):
+        super().__init__(archive_path)
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Одно соединение на процесс; запросы из потоков asyncio.to_thread сериализуются блокировкой
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate_daily_archive()
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+        self.lock = threading.Lock()
+        # data_version не меняется после коммитов своего соединения - свои записи считаем сами
+        self.local_writes = 0
+
+    def _migrate_daily_archive(self):
+        """Переводит дневной архив со старого ключа id на (id, day)"""
+        primary_key = [
+            name for _, name, _, _, _, pk in sorted(
+                self.conn.execute("PRAGMA table_info(daily_archive)"), key=lambda column: column[5]
+            ) if pk
+        ]
+        if primary_key != ['id']:
+            return
+
+        # Перестройка таблицы одной транзакцией (DDL не открывает ее неявно)
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute("ALTER TABLE daily_archive RENAME TO daily_archive_old")
+            self.conn.execute("DROP INDEX IF EXISTS idx_daily_archive_day")
+            self.conn.execute(
+                """CREATE TABLE daily_archive (
+                       id TEXT NOT NULL,
+                       day TEXT NOT NULL,
+                       published_timestamp REAL NOT NULL,
+                       data TEXT NOT NULL,
+                       PRIMARY KEY (id, day)
+                   )"""
+            )
+            self.conn.execute(
+                "INSERT OR IGNORE INTO daily_archive (id, day, published_timestamp, data) "
+                "SELECT id, day, published_timestamp, data FROM daily_archive_old"
+            )
+            self.conn.execute("DROP TABLE daily_archive_old")
+        logger.info("📦 Дневной архив переведен на ключ (id, day)")
+
+    @staticmethod
+    def _row_values(category: str, news_item: Dict) -> Tuple:
+        return (
+            category,
+            news_item.get('id', ''),
+            news_item.get('published_timestamp', 0),
+            news_item.get('feed_url'),
+            json.dumps(news_item, ensure_ascii=False)
+        )
+
+    def save(self, category: str, news_list: List[Dict], updated_at: datetime) -> None:
+        rows = [self._row_values(category, news_item) for news_item in news_list if news_item.get('id')]
+        day = datetime.now().strftime("%Y-%m-%d")
+
+        with self.lock, self.conn:
+            # Категория совпадает с последним сохраненным списком (его размер ограничивает
+            # MAX_NEWS_PER_CATEGORY): выбывшие новости удаляются, новые добавляются,
+            # а существующая запись переписывается, только если изменились данные
+            self.conn.execute(
+                f"DELETE FROM news WHERE category = ? AND id NOT IN ({','.join('?' * len(rows))})",
+                (category, *(row[1] for row in rows))
+            )
+            self.conn.executemany(
+                """INSERT INTO news (category, id, published_timestamp, feed_url, data)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (category, id) DO UPDATE SET
+                       published_timestamp = excluded.published_timestamp,
+                       feed_url = excluded.feed_url,
+                       data = excluded.data
+                   WHERE news.data <> excluded.data""",
+                rows
+            )
+            self.conn.execute(
+                """INSERT INTO categories (category, updated_at, news_count)
+                   VALUES (?, ?, (SELECT COUNT(*) FROM news WHERE category = ?))
+                   ON CONFLICT (category) DO UPDATE SET
+                       updated_at = excluded.updated_at, news_count = excluded.news_count""",
+                (category, updated_at.isoformat(), category)
+            )
+
+            # Дневной архив только дополняется, существующие записи не переписываются
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO daily_archive (id, day, published_timestamp, data) VALUES (?, ?, ?, ?)",
+                [(row[1], day, row[2], row[4]) for row in rows]
+            )
+
+        self.local_writes += 1
+        if cursor.rowcount > 0:
+            logger.info(f"📅 Добавлено {cursor.rowcount} новостей в дневной архив")
+
+    def load(self, category: str) -> Optional[Tuple[datetime, List[Dict]]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT updated_at FROM categories WHERE category = ?", (category,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            rows = self.conn.execute(
+                "SELECT data FROM news WHERE category = ? ORDER BY published_timestamp DESC", (category,)
+            ).fetchall()
+        return datetime.fromisoformat(row[0]), [json.loads(data) for (data,) in rows]
+
+    def latest(self, limit: int) -> List[Dict]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data FROM news ORDER BY published_timestamp DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def cleanup(self, cutoff_time: datetime) -> int:
+        cutoff_timestamp = cutoff_time.timestamp()
+        cutoff_day = cutoff_time.strftime("%Y-%m-%d")
+
+        with self.lock, self.conn:
+            stale_categories = [
+                category for (category,) in self.conn.execute(
+                    "SELECT category FROM categories WHERE updated_at < ?", (cutoff_time.isoformat(),)
+                )
+            ]
+            for category in stale_categories:
+                self.conn.execute("DELETE FROM news WHERE category = ?", (category,))
+                self.conn.execute("DELETE FROM categories WHERE category = ?", (category,))
+                logger.info(f"🗑️ Удалена устаревшая категория: {category}")
+
+            deleted_news = self.conn.execute(
+                "DELETE FROM news WHERE published_timestamp < ?", (cutoff_timestamp,)
+            ).rowcount
+            self.conn.execute(
+                """UPDATE categories SET news_count =
+                       (SELECT COUNT(*) FROM news WHERE news.category = categories.category)"""
+            )
+            deleted_archive = self.conn.execute(
+                "DELETE FROM daily_archive WHERE day < ?", (cutoff_day,)
+            ).rowcount
+            self.local_writes += 1
+
+        if deleted_news or deleted_archive:
+            logger.info(f"🗑️ Удалено устаревших новостей: {deleted_news}, из дневного архива: {deleted_archive}")
+
+        return len(stale_categories) + deleted_news + deleted_archive
+
+    def stats(self) -> Dict:
+        stats = {
+            'total_news': 0,
+            'categories': {},
+            'daily_archives': 0,
+            'cache_size_mb': 0
+        }
+
+        with self.lock:
+            categories = self.conn.execute(
+                "SELECT category, updated_at, news_count FROM categories"
+            ).fetchall()
+            stats['daily_archives'] = self.conn.execute(
+                "SELECT COUNT(DISTINCT day) FROM daily_archive"
+            ).fetchone()[0]
+
+        for category, updated_at, news_count in categories:
+            stats['categories'][category] = {
+                'count': news_count,
+                'last_updated': updated_at
+            }
+            stats['total_news'] += news_count
+
+        # Размер базы вместе с WAL журналом
+        total_size = sum(
+            path.stat().st_size
+            for path in (self.db_path, Path(f"{self.db_path}-wal"))
+            if path.exists()
+        )
+        stats['cache_size_mb'] = round(total_size / (1024 * 1024), 2)
+
+        return stats
+
+    def categories(self) -> List[str]:
+        with self.lock:
+            return [category for (category,) in self.conn.execute("SELECT category FROM categories")]
+
+    def version(self):
+        # data_version меняется после коммитов других соединений, local_writes - после своих
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0], self.local_writes
+
+    def import_from(self, source: NewsStorage) -> int:
+        """Переносит категории из другого хранилища (однократная миграция)"""
+        imported = 0
+        for category in source.categories():
+            try:
+                loaded = source.load(category)
+                if loaded:
+                    updated_at, news_list = loaded
+                    self.save(category, news_list, updated_at)
+                    imported += 1
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка переноса категории {category}: {e}")
+        return imported
+
+def create_news_storage(backend: str, archive_path: Path, db_path: Path) -> NewsStorage:
+    """Создает хранилище новостей по имени backend"""
+    if backend == 'json':
+        return JSONNewsStorage(archive_path)
+
+    if backend == 'sqlite':
+        storage = SQLiteNewsStorage(archive_path, db_path)
+
+        # При первом запуске переносим существующий JSON архив
+        if not storage.categories():
+            imported = storage.import_from(JSONNewsStorage(archive_path))
+            if imported:
+                logger.info(f"📦 Перенесено категорий из JSON архива в SQLite: {imported}")
+
+        return storage
+
+    raise ValueError(f"Неизвестное хранилище новостей: {backend}")
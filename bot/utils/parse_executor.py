@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+from bot.config import config
+from bot.utils.date_parser import date_parser
+
+logger = logging.getLogger(__name__)
+
+# Порядок полей в компактном кортеже новости, который возвращает процесс парсинга
+ITEM_FIELDS = (
+    'id', 'title', 'summary', 'link', 'published', 'published_timestamp',
+    'source_title', 'image_url', 'feed_url'
+)
+
+def parse_feed_bytes(content: bytes, feed_url: str, max_items: Optional[int], max_news_age_hours: int,
+                     date_format: Optional[str] = None) -> Tuple[Optional[str], Optional[str], List[tuple]]:
+    """Разбирает ленту: feedparser, очистка HTML и поиск изображений (выполняется в процессе пула)
+
+    date_format - формат дат ленты, известный родительскому процессу; возвращается
+    формат после разбора, чтобы родитель запомнил его и в следующий раз.
+    """
+    import feedparser
+    from bot.utils.rss_parser import RSSParser
+
+    if date_format:
+        date_parser.feed_formats[feed_url] = date_format
+
+    parser = RSSParser()
+    parser.max_news_age_hours = max_news_age_hours
+
+    feed = feedparser.parse(content)
+    bozo_message = str(feed.bozo_exception) if feed.bozo and feed.bozo_exception else None
+
+    news_items = parser._parse_entries(feed, feed_url, max_items)
+    return (
+        bozo_message,
+        date_parser.feed_formats.get(feed_url),
+        [tuple(item[field] for field in ITEM_FIELDS) for item in news_items]
+    )
+
+def convert_entries(entries: List[tuple], feed_url: str, source_title: str) -> List[tuple]:
+    """Превращает записи потокового разбора (запись, дата) в новости: очистка HTML, изображения"""
+    from bot.utils.rss_parser import RSSParser
+
+    parser = RSSParser()
+    rows = []
+    for entry, published_date in entries:
+        try:
+            news_item = parser._entry_to_item(entry, feed_url, source_title, published_date)
+        except Exception as e:
+            logger.warning(f"Ошибка обработки записи из {feed_url}: {e}")
+            continue
+        if news_item:
+            rows.append(tuple(news_item[field] for field in ITEM_FIELDS))
+    return rows
+
+# Поля сырых записей ленты для воркеров сохранения в БД
+RAW_ENTRY_FIELDS = ('link', 'title', 'summary', 'published')
+
+def parse_raw_entries(content: bytes) -> List[tuple]:
+    """Разбирает ленту feedparser'ом и возвращает только нужные поля записей"""
+    import feedparser
+
+    feed = feedparser.parse(content)
+    return [tuple(entry.get(field, '') for field in RAW_ENTRY_FIELDS) for entry in feed.entries]
+
+def items_from_rows(rows: List[tuple]) -> List[Dict]:
+    """Восстанавливает словари новостей из компактных кортежей"""
+    return [dict(zip(ITEM_FIELDS, row)) for row in rows]
+
+class ParseExecutor:
+    """Стадия парсинга лент вне event loop: пул процессов + разбор маленьких лент на месте"""
+
+    def __init__(self):
+        self.workers = config.PARSE_WORKERS
+        self.inline_max_bytes = config.PARSE_INLINE_MAX_BYTES
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {'pool': 0, 'inline': 0, 'pool_failures': 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info(f"🧮 Пул парсинга запущен (процессов: {self.workers})")
+        return self.pool
+
+    async def run(self, func, content, *args, size: Optional[int] = None):
+        """Выполняет func(content, *args) в пуле процессов или на месте для маленьких лент
+
+        size - объем работы в байтах, по умолчанию len(content).
+        """
+        # Маленькие ленты дешевле разобрать на месте, чем передавать в другой процесс
+        if self.workers <= 0 or (len(content) if size is None else size) <= self.inline_max_bytes:
+            self.stats['inline'] += 1
+            return func(content, *args)
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_pool(), func, content, *args)
+            self.stats['pool'] += 1
+            return result
+        except BrokenProcessPool:
+            # Процесс пула упал (например, по памяти) - пересоздаем пул, ленту разбираем на месте
+            self.stats['pool_failures'] += 1
+            logger.warning("⚠️ Пул парсинга сломан, пересоздаем")
+            self.shutdown()
+            return func(content, *args)
+
+    async def parse(self, content: bytes, feed_url: str, max_items: Optional[int],
+                    max_news_age_hours: int) -> Tuple[Optional[str], List[Dict]]:
+        """Возвращает (описание проблемы разбора или None, список новостей)"""
+        # Формат дат ленты запоминается в родительском процессе: процесс пула его не сохранит
+        bozo_message, date_format, rows = await self.run(
+            parse_feed_bytes, content, feed_url, max_items, max_news_age_hours,
+            date_parser.feed_formats.get(feed_url)
+        )
+        if date_format:
+            date_parser.feed_formats[feed_url] = date_format
+        return bozo_message, items_from_rows(rows)
+
+    async def convert(self, entries: List[tuple], feed_url: str, source_title: str) -> List[Dict]:
+        """Новости из записей потокового разбора (запись, дата публикации)"""
+        if not entries:
+            return []
+        # Объем работы оцениваем по тексту записей: очистка HTML пропорциональна ему
+        size = sum(len(entry.get('summary') or entry.get('description') or '') for entry, _ in entries)
+        rows = await self.run(convert_entries, entries, feed_url, source_title, size=size)
+        return items_from_rows(rows)
+
+    async def parse_raw(self, content: bytes) -> List[Dict]:
+        """Сырые записи ленты (link, title, summary, published)"""
+        rows = await self.run(parse_raw_entries, content)
+        return [dict(zip(RAW_ENTRY_FIELDS, row)) for row in rows]
+
+    def shutdown(self):
+        """Останавливает процессы пула"""
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+# Создаем глобальный экземпляр стадии парсинга
+parse_executor = ParseExecutor()
@@ -0,0 +1,117 @@
+import time
+import asyncio
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+class TokenBucket:
+    """Асинхронный token bucket: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        """Пополняет bucket за прошедшее время"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Ждет, пока в bucket не наберется amount токенов, и списывает их"""
+        if self.rate <= 0:
+            return
+
+        # Запрос больше емкости bucket иначе не выполнится никогда
+        amount = min(amount, self.capacity)
+
+        # Ожидающие обслуживаются по очереди
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def consume(self, amount: float):
+        """Списывает токены без ожидания (bucket может уйти в минус)"""
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens -= amount
+
+class RedisTokenBucket:
+    """Token bucket в Redis: та же логика, что у TokenBucket, но общая для всех процессов
+
+    Состояние (токены, время пополнения) хранится в хеше key и меняется
+    в оптимистичной транзакции WATCH/MULTI. Методы синхронные - для воркеров RQ.
+    """
+
+    def __init__(self, conn, key: str, rate: float, capacity: float):
+        self.conn = conn
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        # Полный bucket не нужно хранить: ключ истекает, когда успел бы наполниться
+        self.ttl = max(1, int(capacity / rate) + 1) if rate > 0 else 1
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """Списывает amount токенов; если их не хватает, возвращает секунды ожидания"""
+        from redis.exceptions import WatchError
+
+        if self.rate <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+
+        with self.conn.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.key)
+                    stored_tokens, stored_updated = pipe.hmget(self.key, 'tokens', 'updated')
+                    now = time.time()
+                    tokens = self.capacity if stored_tokens is None else float(stored_tokens)
+                    updated = now if stored_updated is None else float(stored_updated)
+                    tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+
+                    if tokens < amount:
+                        pipe.reset()
+                        return (amount - tokens) / self.rate
+
+                    pipe.multi()
+                    pipe.hset(self.key, mapping={'tokens': tokens - amount, 'updated': now})
+                    pipe.expire(self.key, self.ttl)
+                    pipe.execute()
+                    return 0.0
+                except WatchError:
+                    # Другой процесс успел изменить bucket - пересчитываем
+                    continue
+
+    def acquire(self, amount: float = 1.0):
+        """Ждет (блокируя поток), пока не наберется amount токенов, и списывает их"""
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Разбирает заголовок Retry-After (секунды или HTTP дата)"""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
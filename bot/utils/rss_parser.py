@@ -1,76 +1,41 @@
 import asyncio
-import aiohttp
 import feedparser
 import logging
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import ParseError
 import hashlib
+from bot.config import config
+from bot.utils.date_parser import date_parser
+from bot.utils.feed_stream import FeedStreamReader
+from bot.utils.feed_validators import feed_validators
+from bot.utils.fetch_engine import fetch_engine
+from bot.utils.html_utils import clean_html
+from bot.utils.parse_executor import parse_executor
 
 logger = logging.getLogger(__name__)
 
 class RSSParser:
-    def __init__(self, timeout: int = 30):
-        self.timeout = timeout
-        self.session = None
+    def __init__(self):
         # Настройки фильтрации по времени
         self.max_news_age_hours = 48  # Максимальный возраст новостей
+        # Статистика парсинга (304 и неизменившиеся ленты не парсятся повторно)
+        self.stats = {'parsed': 0, 'not_modified': 0, 'unchanged': 0, 'errors': 0, 'stopped_early': 0, 'fallback': 0}
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=self.timeout),
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-        )
+        # Загрузка идет через общий пул соединений процесса
+        await fetch_engine.get_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Общая сессия живет дольше парсера и закрывается при остановке бота
+        pass
     
     def clean_html(self, text: str) -> str:
         """Очищает HTML теги и entities из текста"""
-        if not text:
-            return ""
-        
-        # Убираем HTML теги
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        # Заменяем HTML entities
-        html_entities = {
-            '&amp;': '&',
-            '&lt;': '<',
-            '&gt;': '>',
-            '&quot;': '"',
-            '&apos;': "'",
-            '&nbsp;': ' ',
-            '&laquo;': '«',
-            '&raquo;': '»',
-            '&ldquo;': '"',
-            '&rdquo;': '"',
-            '&lsquo;': ''',
-            '&rsquo;': ''',
-            '&mdash;': '—',
-            '&ndash;': '–',
-            '&hellip;': '…',
-            '&#8220;': '"',
-            '&#8221;': '"',
-            '&#8216;': ''',
-            '&#8217;': ''',
-            '&#8212;': '—',
-            '&#8211;': '–',
-            '&#8230;': '…'
-        }
-        
-        for entity, replacement in html_entities.items():
-            text = text.replace(entity, replacement)
-        
-        # Убираем лишние пробелы и переносы
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        return clean_html(text)
     
     def extract_image_url(self, entry: Dict, feed_url: str) -> Optional[str]:
         """Извлекает URL изображения из RSS записи"""
@@ -111,39 +76,9 @@ class RSSParser:
             logger.warning(f"Ошибка извлечения изображения: {e}")
             return None
     
-    def parse_date(self, date_str: str) -> Optional[datetime]:
-        """Парсит дату из различных форматов"""
-        if not date_str:
-            return None
-        
-        try:
-            # Пробуем feedparser
-            parsed_time = feedparser._parse_date(date_str)
-            if parsed_time:
-                return datetime(*parsed_time[:6])
-        except:
-            pass
-        
-        # Пробуем различные форматы вручную
-        formats = [
-            '%a, %d %b %Y %H:%M:%S %z',
-            '%a, %d %b %Y %H:%M:%S %Z',
-            '%Y-%m-%dT%H:%M:%S%z',
-            '%Y-%m-%dT%H:%M:%SZ',
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%d',
-        ]
-        
-        for fmt in formats:
-            try:
-                # Убираем часовой пояс для простых форматов
-                clean_date = re.sub(r'\s*$$[^)]+$$', '', date_str.strip())
-                return datetime.strptime(clean_date, fmt.replace('%z', '').replace('%Z', ''))
-            except ValueError:
-                continue
-        
-        logger.warning(f"Не удалось распарсить дату: {date_str}")
-        return None
+    def parse_date(self, date_str: str, feed_url: Optional[str] = None) -> Optional[datetime]:
+        """Парсит дату из различных форматов (RFC 822, ISO 8601) в UTC"""
+        return date_parser.parse(date_str, feed_url)
     
     def is_news_fresh(self, published_date: Optional[datetime]) -> bool:
         """Проверяет, является ли новость свежей (не старше 48 часов)"""
@@ -151,7 +86,7 @@ class RSSParser:
             # Если дата не определена, считаем новость свежей
             return True
         
-        now = datetime.now()
+        now = datetime.now(timezone.utc)
         
         # Проверяем максимальный возраст (48 часов)
         max_age = timedelta(hours=self.max_news_age_hours)
@@ -161,84 +96,239 @@ class RSSParser:
         # Берем все новости от самых свежих до 48 часов назад
         return True
     
-    async def parse_feed(self, feed_url: str, max_items: int = 10) -> List[Dict]:
-        """Парсит одну RSS ленту с фильтрацией по времени"""
-        try:
-            async with self.session.get(feed_url) as response:
-                if response.status != 200:
-                    logger.warning(f"Ошибка загрузки {feed_url}: {response.status}")
-                    return []
-                
-                content = await response.text()
-                feed = feedparser.parse(content)
-                
-                if feed.bozo and feed.bozo_exception:
-                    logger.warning(f"Проблема с парсингом {feed_url}: {feed.bozo_exception}")
+    def _restore_cached_items(self, feed_url: str, max_items: int) -> List[Dict]:
+        """Возвращает сохраненные новости неизменившейся ленты"""
+        record = feed_validators.get(feed_url) or {}
+        news_items = [
+            item for item in record.get('items') or []
+            if self.is_news_fresh(datetime.fromtimestamp(item.get('published_timestamp', 0), timezone.utc))
+        ]
+        return news_items[:max_items]
+    
+    def _entry_date(self, entry, feed_url: Optional[str] = None) -> Optional[datetime]:
+        """Дата публикации записи"""
+        return self.parse_date(
+            entry.get('published', '') or 
+            entry.get('updated', '') or 
+            entry.get('pubDate', ''),
+            feed_url
+        )
+    
+    def _entry_to_item(self, entry, feed_url: str, source_title: str,
+                       published_date: Optional[datetime]) -> Optional[Dict]:
+        """Преобразует запись ленты в новость, None - если данных недостаточно"""
+        # Генерируем уникальный ID
+        news_id = hashlib.md5(
+            (entry.get('link', '') + entry.get('title', '')).encode()
+        ).hexdigest()
+        
+        # Извлекаем данные
+        title = self.clean_html(entry.get('title', ''))
+        summary = self.clean_html(
+            entry.get('summary', '') or 
+            entry.get('description', '') or 
+            entry.get('content', [{}])[0].get('value', '') if entry.get('content') else ''
+        )
+        
+        # Извлекаем изображение
+        image_url = self.extract_image_url(entry, feed_url)
+        
+        now = datetime.now(timezone.utc)
+        news_item = {
+            'id': news_id,
+            'title': title,
+            'summary': summary,
+            'link': entry.get('link', ''),
+            'published': (published_date or now).isoformat(),
+            'published_timestamp': (published_date or now).timestamp(),
+            'source_title': source_title,
+            'image_url': image_url,
+            'feed_url': feed_url
+        }
+        
+        # Проверяем что есть минимальные данные
+        if title and (summary or entry.get('link')):
+            return news_item
+        return None
+    
+    def _parse_entries(self, feed, feed_url: str, max_items: Optional[int]) -> List[Dict]:
+        """Извлекает свежие новости из распарсенной ленты (max_items=None - все свежие)"""
+        news_items = []
+        source_title = feed.feed.get('title', 'Неизвестный источник')
+        
+        for entry in feed.entries:
+            try:
+                # Парсим дату публикации
+                published_date = self._entry_date(entry, feed_url)
                 
-                news_items = []
+                # Проверяем свежесть новости (не старше 48 часов)
+                if not self.is_news_fresh(published_date):
+                    continue
                 
-                for entry in feed.entries:
-                    try:
-                        # Парсим дату публикации
-                        published_date = self.parse_date(
-                            entry.get('published', '') or 
-                            entry.get('updated', '') or 
-                            entry.get('pubDate', '')
-                        )
-                        
-                        # Проверяем свежесть новости (не старше 48 часов)
-                        if not self.is_news_fresh(published_date):
-                            continue
-                        
-                        # Генерируем уникальный ID
-                        news_id = hashlib.md5(
-                            (entry.get('link', '') + entry.get('title', '')).encode()
-                        ).hexdigest()
-                        
-                        # Извлекаем данные
-                        title = self.clean_html(entry.get('title', ''))
-                        summary = self.clean_html(
-                            entry.get('summary', '') or 
-                            entry.get('description', '') or 
-                            entry.get('content', [{}])[0].get('value', '') if entry.get('content') else ''
-                        )
-                        
-                        # Извлекаем изображение
-                        image_url = self.extract_image_url(entry, feed_url)
-                        
-                        news_item = {
-                            'id': news_id,
-                            'title': title,
-                            'summary': summary,
-                            'link': entry.get('link', ''),
-                            'published': published_date.isoformat() if published_date else datetime.now().isoformat(),
-                            'published_timestamp': published_date.timestamp() if published_date else datetime.now().timestamp(),
-                            'source_title': feed.feed.get('title', 'Неизвестный источник'),
-                            'image_url': image_url,
-                            'feed_url': feed_url
-                        }
-                        
-                        # Проверяем что есть минимальные данные
-                        if title and (summary or entry.get('link')):
-                            news_items.append(news_item)
+                news_item = self._entry_to_item(entry, feed_url, source_title, published_date)
+                if news_item:
+                    news_items.append(news_item)
+            
+            except Exception as e:
+                logger.warning(f"Ошибка обработки записи из {feed_url}: {e}")
+                continue
+        
+        # Сортируем по дате публикации (новые сначала)
+        news_items.sort(key=lambda x: x['published_timestamp'], reverse=True)
+        
+        # Ограничиваем количество
+        return news_items[:max_items]
+    
+    async def _stream_entries(self, response, feed_url: str, max_items: int) -> Dict:
+        """Разбирает XML ленты по мере загрузки и прекращает чтение, когда записей достаточно
+
+        В event loop выполняется только разбор XML и дат - очистка HTML и поиск
+        изображений идут пачкой в parse_executor. Ранняя остановка (max_items свежих
+        или FEED_STALE_ENTRIES_STOP устаревших подряд после свежих) срабатывает, только
+        пока записи идут от новых к старым; иначе лента читается целиком.
+
+        Возвращает словарь: entries - свежие записи с датами, source_title, entries_hash -
+        хеш прочитанных записей (для пропуска неизменившейся ленты) и content - тело
+        целиком, если XML не разбирается (в любом месте ленты) и нужен feedparser.
+        """
+        reader = FeedStreamReader()
+        entries = []
+        entries_hash = hashlib.sha1()
+        stale_run = 0
+        size = 0
+        newest_first = True
+        previous_date = None
+        # Прочитанное тело хранится (до FEED_MAX_BYTES) - для перехода на feedparser,
+        # если невалидный XML встретится после первых записей
+        body: List[bytes] = []
+        
+        def result(content: Optional[bytes] = None) -> Dict:
+            return {
+                'entries': entries,
+                'source_title': reader.source_title or 'Неизвестный источник',
+                'entries_hash': entries_hash.hexdigest(),
+                'content': content
+            }
+        
+        async for chunk in response.content.iter_chunked(config.FEED_STREAM_CHUNK):
+            size += len(chunk)
+            if size > config.FEED_MAX_BYTES:
+                fetch_engine.stats['truncated'] += 1
+                logger.warning(f"✂️ Лента {feed_url} больше {config.FEED_MAX_BYTES} байт, чтение остановлено")
+                break
+            body.append(chunk)
+            
+            try:
+                for entry in reader.feed(chunk):
+                    published_date = self._entry_date(entry, feed_url)
                     
-                    except Exception as e:
-                        logger.warning(f"Ошибка обработки записи из {feed_url}: {e}")
+                    # Ранняя остановка допустима, только пока записи идут от новых к старым
+                    if published_date is not None:
+                        if previous_date is not None and published_date > previous_date:
+                            newest_first = False
+                        previous_date = published_date
+                    
+                    if not self.is_news_fresh(published_date):
+                        stale_run += 1
+                        if newest_first and entries and stale_run >= config.FEED_STALE_ENTRIES_STOP:
+                            self.stats['stopped_early'] += 1
+                            return result()
                         continue
+                    stale_run = 0
+                    
+                    entries.append((entry, published_date))
+                    entries_hash.update(repr((
+                        entry.get('link'), entry.get('title'), entry.get('published') or entry.get('updated')
+                        or entry.get('pubDate'), entry.get('summary') or entry.get('description')
+                    )).encode())
+                    if newest_first and len(entries) >= max_items:
+                        self.stats['stopped_early'] += 1
+                        return result()
+            except ParseError:
+                # Невалидный XML (HTML entities вроде &nbsp;, битая кодировка) - разберет feedparser.
+                # Частичный список не возвращается: его хеш закрыл бы остальные записи как "без изменений"
+                self.stats['fallback'] += 1
+                entries.clear()
+                return result(await fetch_engine.read_body(response, body, size))
+        
+        reader.close()
+        return result()
+    
+    async def parse_feed(self, feed_url: str, max_items: int = 10) -> List[Dict]:
+        """Парсит одну RSS ленту с фильтрацией по времени"""
+        try:
+            headers = feed_validators.get_request_headers(feed_url)
+            
+            async with fetch_engine.stream(feed_url, headers=headers) as response:
+                status = response.status
                 
-                # Сортируем по дате публикации (новые сначала)
-                news_items.sort(key=lambda x: x['published_timestamp'], reverse=True)
+                # Лента не изменилась - feedparser не нужен
+                if status == 304:
+                    self.stats['not_modified'] += 1
+                    feed_validators.touch(feed_url)
+                    news_items = self._restore_cached_items(feed_url, max_items)
+                    logger.info(f"♻️ Лента не изменилась (304): {feed_url}, {len(news_items)} новостей из кеша")
+                    return news_items
+                
+                if status != 200:
+                    self.stats['errors'] += 1
+                    logger.warning(f"Ошибка загрузки {feed_url}: {status}")
+                    return []
                 
-                # Ограничиваем количество
-                news_items = news_items[:max_items]
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
                 
-                logger.info(f"Получено {len(news_items)} свежих новостей из {feed_url}")
+                streamed = None
+                if config.FEED_STREAMING:
+                    streamed = await self._stream_entries(response, feed_url, max_items)
+                    content = streamed['content']
+                else:
+                    content = await fetch_engine.read_body(response)
+            
+            if content is not None:
+                # Сервер не поддерживает валидаторы, но содержимое совпадает побайтно
+                content_hash = feed_validators.content_hash(content)
+            else:
+                # Тело прочитано не целиком - сравниваем прочитанные свежие записи
+                content_hash = streamed['entries_hash']
+            
+            record = feed_validators.get(feed_url)
+            if record and record.get('content_hash') == content_hash and record.get('items') is not None:
+                self.stats['unchanged'] += 1
+                feed_validators.update(feed_url, etag, last_modified, content_hash, record['items'])
+                news_items = self._restore_cached_items(feed_url, max_items)
+                logger.info(f"♻️ Содержимое ленты не изменилось: {feed_url}, {len(news_items)} новостей из кеша")
                 return news_items
+            
+            # feedparser, очистка HTML и поиск изображений - CPU работа, выполняется вне event loop.
+            # В кеш ленты идут все свежие новости: max_items применяется при выдаче, и вызов
+            # с большим лимитом по неизменившейся ленте получает полный список
+            if content is not None:
+                bozo_message, news_items = await parse_executor.parse(
+                    content, feed_url, None, self.max_news_age_hours
+                )
+                if bozo_message:
+                    logger.warning(f"Проблема с парсингом {feed_url}: {bozo_message}")
+            else:
+                news_items = await parse_executor.convert(
+                    streamed['entries'], feed_url, streamed['source_title']
+                )
+                # Сортируем по дате публикации (новые сначала), как _parse_entries
+                news_items.sort(key=lambda x: x['published_timestamp'], reverse=True)
+            
+            self.stats['parsed'] += 1
+            feed_validators.update(feed_url, etag, last_modified, content_hash, news_items)
+            news_items = news_items[:max_items]
+            
+            logger.info(f"Получено {len(news_items)} свежих новостей из {feed_url}")
+            return news_items
                 
         except asyncio.TimeoutError:
+            self.stats['errors'] += 1
             logger.error(f"Таймаут при загрузке {feed_url}")
             return []
         except Exception as e:
+            self.stats['errors'] += 1
             logger.error(f"Ошибка парсинга {feed_url}: {e}")
             return []
     
@@ -256,31 +346,87 @@ class RSSParser:
         
         return unique_news
 
-async def parse_multiple_feeds(feed_urls: List[str], max_items_per_feed: int = 5) -> List[Dict]:
-    """Парсит несколько RSS лент параллельно с сортировкой по времени"""
+async def parse_feeds_by_url(feed_urls: List[str], max_items_per_feed: int = 5) -> Dict[str, List[Dict]]:
+    """Парсит RSS ленты параллельно, каждую уникальную ленту ровно один раз"""
+    unique_urls = list(dict.fromkeys(feed_urls))
+    
     async with RSSParser() as parser:
         # Создаем задачи для параллельного парсинга
         tasks = [
             parser.parse_feed(url, max_items_per_feed) 
-            for url in feed_urls
+            for url in unique_urls
         ]
         
         # Выполняем все задачи параллельно
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        # Собираем все новости
-        all_news = []
-        for result in results:
+        parsed_feeds = {}
+        for url, result in zip(unique_urls, results):
             if isinstance(result, list):
-                all_news.extend(result)
-            elif isinstance(result, Exception):
-                logger.error(f"Ошибка при парсинге: {result}")
+                parsed_feeds[url] = result
+            else:
+                logger.error(f"Ошибка при парсинге {url}: {result}")
+                parsed_feeds[url] = []
         
-        # Удаляем дубликаты
-        unique_news = parser.remove_duplicates(all_news)
+        # Сохраняем валидаторы для следующего условного запроса
+        feed_validators.save()
         
-        # Сортируем по времени публикации (самые свежие сначала)
-        unique_news.sort(key=lambda x: x['published_timestamp'], reverse=True)
+        stats = parser.stats
+        skipped = stats['not_modified'] + stats['unchanged']
+        logger.info(
+            f"📊 Статистика парсинга: распарсено {stats['parsed']}, пропущено {skipped} "
+            f"(304: {stats['not_modified']}, без изменений: {stats['unchanged']}), ошибок {stats['errors']}"
+        )
         
-        logger.info(f"Всего получено {len(unique_news)} уникальных свежих новостей")
-        return unique_news
+        return parsed_feeds
+
+def merge_feed_news(feed_urls: List[str], parsed_feeds: Dict[str, List[Dict]]) -> List[Dict]:
+    """Собирает новости указанных лент из результатов парсинга"""
+    all_news = []
+    for url in dict.fromkeys(feed_urls):
+        all_news.extend(parsed_feeds.get(url, []))
+    
+    # Удаляем дубликаты
+    unique_news = RSSParser().remove_duplicates(all_news)
+    
+    # Сортируем по времени публикации (самые свежие сначала)
+    unique_news.sort(key=lambda x: x['published_timestamp'], reverse=True)
+    return unique_news
+
+async def parse_multiple_feeds(feed_urls: List[str], max_items_per_feed: int = 5) -> List[Dict]:
+    """Парсит несколько RSS лент параллельно с сортировкой по времени"""
+    parsed_feeds = await parse_feeds_by_url(feed_urls, max_items_per_feed)
+    unique_news = merge_feed_news(feed_urls, parsed_feeds)
+    
+    logger.info(f"Всего получено {len(unique_news)} уникальных свежих новостей")
+    return unique_news
+
+async def fetch_feed(feed_url: str):
+    """Загружает ленту через общий HTTP движок и возвращает записи в виде FeedParserDict"""
+    try:
+        response = await fetch_engine.fetch(feed_url)
+        if response['status'] != 200:
+            logger.warning(f"Ошибка загрузки {feed_url}: {response['status']}")
+            return None
+        # Разбор в пуле процессов; воркерам нужны только поля записей
+        entries = await parse_executor.parse_raw(response['content'])
+        return feedparser.FeedParserDict(entries=[feedparser.FeedParserDict(entry) for entry in entries])
+    except asyncio.TimeoutError:
+        logger.error(f"Таймаут при загрузке {feed_url}")
+        return None
+    except Exception as e:
+        logger.error(f"Ошибка загрузки {feed_url}: {e}")
+        return None
+
+async def parse_rss_feed(feed_url: str, max_items: int = 10) -> List[Dict]:
+    """Парсит одну RSS ленту для обработчиков команд"""
+    async with RSSParser() as parser:
+        return await parser.parse_feed(feed_url, max_items)
+
+async def get_first_news(feed_urls: List[str]) -> Optional[tuple]:
+    """Возвращает самую свежую новость из лент в виде (заголовок, описание, ссылка)"""
+    news = await parse_multiple_feeds(feed_urls, max_items_per_feed=1)
+    if not news:
+        return None
+    first = news[0]
+    return first['title'], first['summary'], first['link']
@@ -3,47 +3,183 @@ import aiohttp
 import logging
 from typing import Dict, Optional, List
 from bot.config import config
+from bot.utils.rate_limiter import TokenBucket, parse_retry_after
+from bot.utils.ai_cache import ai_cache
 
 logger = logging.getLogger(__name__)
 
 class TogetherAPI:
+    # Версия промпта редактора: меняйте при изменении промпта, чтобы не брать старые ответы из кеша
+    EDITOR_PROMPT_VERSION = "editor-v1"
+    
     def __init__(self):
         self.api_key = config.TOGETHER_API_KEY
         self.base_url = "https://api.together.xyz/v1"
+        self.model = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
         self.timeout = config.AI_TIMEOUT_SECONDS
         self.max_retries = config.MAX_RETRIES
         
+        # Общий бюджет одновременных запросов для всех категорий
+        self.request_semaphore = asyncio.Semaphore(config.AI_MAX_CONCURRENT_REQUESTS)
+        
+        # Лимиты API: запросы в секунду и токены в минуту
+        self.request_limiter = TokenBucket(
+            rate=config.AI_REQUESTS_PER_SECOND,
+            capacity=max(1.0, config.AI_REQUESTS_PER_SECOND)
+        )
+        self.token_limiter = TokenBucket(
+            rate=config.AI_TOKENS_PER_MINUTE / 60,
+            capacity=config.AI_TOKENS_PER_MINUTE
+        )
+        
+        # Адаптивная пауза после ответов 429
+        self.backoff_until = 0.0
+        self.backoff_seconds = 1.0
+        self.max_backoff_seconds = config.AI_MAX_BACKOFF_SECONDS
+        
+        # Постоянная сессия с пулом keep-alive соединений к API
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+        self.connection_stats = {'requests': 0, 'connections_created': 0, 'connections_reused': 0}
+        
+        # Ключ кеша -> ответ запроса редактирования, который сейчас выполняется
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        
         # Лимиты для Telegram
         self.max_message_length = config.MAX_MESSAGE_LENGTH  # 4096 символов
         self.max_caption_length = config.MAX_CAPTION_LENGTH  # 1024 символа
     
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        """Создает трассировку для учета новых и переиспользованных соединений"""
+        trace_config = aiohttp.TraceConfig()
+        
+        async def on_connection_create_end(session, context, params):
+            self.connection_stats['connections_created'] += 1
+        
+        async def on_connection_reuseconn(session, context, params):
+            self.connection_stats['connections_reused'] += 1
+        
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает постоянную сессию, открывая её при первом запросе"""
+        loop = asyncio.get_running_loop()
+        
+        # Сессия привязана к event loop - пересоздаем при смене loop
+        if self.session is None or self.session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=config.AI_MAX_CONCURRENT_REQUESTS,
+                ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                trace_configs=[self._create_trace_config()]
+            )
+            self._loop = loop
+            logger.info("🔌 Открыта сессия Together API")
+        
+        return self.session
+    
+    def _log_connection_stats(self):
+        """Логирует статистику переиспользования соединений"""
+        stats = self.connection_stats
+        total = stats['connections_created'] + stats['connections_reused']
+        reuse_rate = stats['connections_reused'] / total * 100 if total else 0
+        logger.info(
+            f"🔌 Together API: запросов {stats['requests']}, новых соединений {stats['connections_created']}, "
+            f"переиспользовано {stats['connections_reused']} ({reuse_rate:.0f}%)"
+        )
+    
+    async def close(self):
+        """Закрывает сессию Together API"""
+        if self.session and not self.session.closed:
+            self._log_connection_stats()
+            await self.session.close()
+            logger.info("🔌 Сессия Together API закрыта")
+        self.session = None
+        self._loop = None
+    
+    def _estimate_tokens(self, data: Dict) -> int:
+        """Оценивает число токенов запроса (промпт + ожидаемый ответ)"""
+        prompt_chars = sum(len(message.get('content', '')) for message in data.get('messages', []))
+        prompt_tokens = prompt_chars // 3 + 1
+        # Отредактированная новость по объему сопоставима с исходной
+        return prompt_tokens + min(data.get('max_tokens', 0), prompt_tokens)
+    
+    def _register_rate_limit(self, retry_after: Optional[float]):
+        """Включает общую паузу для всех запросов после ответа 429"""
+        if retry_after is None:
+            # Сервер не указал паузу - увеличиваем её экспоненциально
+            delay = self.backoff_seconds
+            self.backoff_seconds = min(self.backoff_seconds * 2, self.max_backoff_seconds)
+        else:
+            delay = min(retry_after, self.max_backoff_seconds)
+        
+        loop = asyncio.get_running_loop()
+        self.backoff_until = max(self.backoff_until, loop.time() + delay)
+        logger.warning(f"⏳ Лимит запросов API (429), пауза {delay:.1f} сек")
+    
+    async def _wait_for_backoff(self):
+        """Ждет окончания паузы после ответа 429"""
+        loop = asyncio.get_running_loop()
+        delay = self.backoff_until - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
     async def _make_request(self, endpoint: str, data: Dict) -> Optional[Dict]:
         """Выполняет запрос к Together API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         url = f"{self.base_url}/{endpoint}"
+        estimated_tokens = self._estimate_tokens(data)
         
         for attempt in range(self.max_retries):
+            rate_limited = False
             try:
-                timeout = aiohttp.ClientTimeout(total=self.timeout)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    async with session.post(url, json=data, headers=headers) as response:
+                await self._wait_for_backoff()
+                await self.request_limiter.acquire()
+                await self.token_limiter.acquire(estimated_tokens)
+                
+                session = await self._get_session()
+                async with self.request_semaphore:
+                    self.connection_stats['requests'] += 1
+                    async with session.post(url, json=data) as response:
                         if response.status == 200:
                             result = await response.json()
+                            
+                            # Списываем разницу между оценкой и фактическим расходом токенов
+                            used_tokens = (result.get('usage') or {}).get('total_tokens')
+                            if used_tokens and used_tokens > estimated_tokens:
+                                self.token_limiter.consume(used_tokens - estimated_tokens)
+                            
+                            self.backoff_seconds = 1.0
+                            if self.connection_stats['requests'] % 50 == 0:
+                                self._log_connection_stats()
                             return result
+                        elif response.status == 429:
+                            rate_limited = True
+                            self._register_rate_limit(parse_retry_after(response.headers.get('Retry-After')))
                         else:
                             error_text = await response.text()
                             logger.error(f"API ошибка {response.status}: {error_text}")
                             
             except asyncio.TimeoutError:
                 logger.warning(f"Таймаут API запроса (попытка {attempt + 1}/{self.max_retries})")
+            except aiohttp.ClientConnectionError as e:
+                # Сессию не закрываем: ее используют параллельные запросы, а разорванное
+                # соединение коннектор сам выбрасывает из пула и открывает новое
+                logger.error(f"Ошибка соединения с API (попытка {attempt + 1}/{self.max_retries}): {e}")
             except Exception as e:
                 logger.error(f"Ошибка API запроса (попытка {attempt + 1}/{self.max_retries}): {e}")
             
-            if attempt < self.max_retries - 1:
+            # После 429 пауза уже выставлена и выдерживается перед следующей попыткой
+            if attempt < self.max_retries - 1 and not rate_limited:
                 await asyncio.sleep(2 ** attempt)  # Экспоненциальная задержка
         
         return None
@@ -73,8 +209,13 @@ class TogetherAPI:
     "summary": "краткое описание (1-2 предложения)"
 }}"""
     
-    async def edit_news_as_editor(self, title: str, content: str) -> Optional[Dict[str, str]]:
-        """Редактирует новость как редактор Telegram канала"""
+    async def edit_news_as_editor(self, title: str, content: str,
+                                  story_id: Optional[str] = None) -> Optional[Dict[str, str]]:
+        """Редактирует новость как редактор Telegram канала
+
+        story_id - id истории из индекса почти одинаковых новостей: копия истории из
+        другого источника получает уже готовый результат канонической новости.
+        """
         try:
             # Проверяем длину контента
             if len(content) < 100:
@@ -85,114 +226,159 @@ class TogetherAPI:
                     'summary': content[:200] + '...' if len(content) > 200 else content
                 }
             
-            prompt = self._create_editor_prompt(title, content)
-            
-            data = {
-                "model": "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.3,
-                "top_p": 0.9,
-                "repetition_penalty": 1.1
-            }
-            
-            response = await self._make_request("chat/completions", data)
+            # Та же новость уже редактировалась - берем результат из кеша
+            cache_key = ai_cache.make_key(self.model, self.EDITOR_PROMPT_VERSION, title, content)
+            cached = ai_cache.get(cache_key)
+            if cached:
+                return dict(cached)
             
-            if not response or 'choices' not in response:
-                logger.error("Некорректный ответ от API")
-                return None
+            story_key = None
+            if story_id:
+                story_key = ai_cache.make_key(self.model, self.EDITOR_PROMPT_VERSION, f"story:{story_id}", '')
+                cached = ai_cache.get(story_key)
+                if cached:
+                    return dict(cached)
             
-            ai_response = response['choices'][0]['message']['content'].strip()
+            # Та же новость или история уже редактируется для другой категории -
+            # ждем ответа на ее запрос вместо повторного
+            flight_key = story_key or cache_key
+            pending = self.in_flight.get(flight_key)
+            if pending is not None:
+                edited = await asyncio.shield(pending)
+                return dict(edited) if edited else None
             
-            # Пытаемся извлечь JSON из ответа
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[flight_key] = future
+            edited = None
             try:
-                import json
-                import re
-                
-                # Ищем JSON в ответе
-                json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group()
-                    result = json.loads(json_str)
-                    
-                    # Проверяем длину для Telegram
-                    edited_title = result.get('title', title)[:200]  # Ограничиваем заголовок
-                    edited_content = result.get('content', content)
-                    
-                    # Если контент слишком длинный для Telegram, сокращаем
-                    if len(edited_content) > self.max_message_length - 200:  # Оставляем место для заголовка
-                        edited_content = edited_content[:self.max_message_length - 200] + '...'
-                    
-                    return {
-                        'title': edited_title,
-                        'content': edited_content,
-                        'summary': result.get('summary', edited_content[:200] + '...')
-                    }
-                else:
-                    logger.warning("JSON не найден в ответе AI")
-                    return None
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"Ошибка парсинга JSON: {e}")
-                logger.debug(f"Ответ AI: {ai_response}")
-                return None
+                edited = await self._request_edit(title, content)
+                if edited:
+                    ai_cache.set(cache_key, edited)
+                    if story_key:
+                        ai_cache.set(story_key, edited)
+                return edited
+            finally:
+                del self.in_flight[flight_key]
+                if not future.done():
+                    future.set_result(edited)
             
         except Exception as e:
             logger.error(f"Ошибка редактирования новости: {e}")
             return None
     
-    async def process_news_batch(self, news_list: List[Dict]) -> List[Dict]:
-        """Обрабатывает батч новостей"""
-        processed_news = []
+    async def _request_edit(self, title: str, content: str) -> Optional[Dict[str, str]]:
+        """Запрос редактирования к API и разбор ответа"""
+        prompt = self._create_editor_prompt(title, content)
         
-        for news_item in news_list:
-            try:
-                title = news_item.get('title', '')
-                content = news_item.get('summary', '') or news_item.get('description', '')
+        data = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "max_tokens": 2000,
+            "temperature": 0.3,
+            "top_p": 0.9,
+            "repetition_penalty": 1.1
+        }
+        
+        response = await self._make_request("chat/completions", data)
+        
+        if not response or 'choices' not in response:
+            logger.error("Некорректный ответ от API")
+            return None
+        
+        ai_response = response['choices'][0]['message']['content'].strip()
+        
+        # Пытаемся извлечь JSON из ответа
+        try:
+            import json
+            import re
+            
+            # Ищем JSON в ответе
+            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
+            if json_match:
+                json_str = json_match.group()
+                result = json.loads(json_str)
                 
-                # Редактируем новость
-                edited = await self.edit_news_as_editor(title, content)
+                # Проверяем длину для Telegram
+                edited_title = result.get('title', title)[:200]  # Ограничиваем заголовок
+                edited_content = result.get('content', content)
                 
-                if edited:
-                    # Обновляем новость
-                    processed_item = {
-                        **news_item,
-                        'original_title': title,
-                        'original_content': content,
-                        'title': edited['title'],
-                        'content': edited['content'],
-                        'summary': edited['summary'],
-                        'ai_processed': True,
-                        'processed_at': asyncio.get_event_loop().time()
-                    }
-                    processed_news.append(processed_item)
-                else:
-                    # Если обработка не удалась, оставляем оригинал
-                    processed_item = {
-                        **news_item,
-                        'content': content,
-                        'summary': content[:200] + '...' if len(content) > 200 else content,
-                        'ai_processed': False
-                    }
-                    processed_news.append(processed_item)
+                # Если контент слишком длинный для Telegram, сокращаем
+                if len(edited_content) > self.max_message_length - 200:  # Оставляем место для заголовка
+                    edited_content = edited_content[:self.max_message_length - 200] + '...'
                 
-                # Небольшая пауза между запросами
-                await asyncio.sleep(0.5)
+                edited = {
+                    'title': edited_title,
+                    'content': edited_content,
+                    'summary': result.get('summary', edited_content[:200] + '...')
+                }
+                return edited
+            else:
+                logger.warning("JSON не найден в ответе AI")
+                return None
                 
-            except Exception as e:
-                logger.error(f"Ошибка обработки новости: {e}")
-                # Добавляем необработанную новость
-                processed_news.append({
+        except json.JSONDecodeError as e:
+            logger.error(f"Ошибка парсинга JSON: {e}")
+            logger.debug(f"Ответ AI: {ai_response}")
+            return None
+    
+    async def _process_news_item(self, news_item: Dict) -> Dict:
+        """Обрабатывает одну новость из батча"""
+        try:
+            title = news_item.get('title', '')
+            content = news_item.get('summary', '') or news_item.get('description', '')
+            
+            # Редактируем новость
+            edited = await self.edit_news_as_editor(title, content, news_item.get('story_id'))
+            
+            if edited:
+                # Обновляем новость
+                return {
                     **news_item,
-                    'content': news_item.get('summary', ''),
-                    'ai_processed': False,
-                    'error': str(e)
-                })
+                    'original_title': title,
+                    'original_content': content,
+                    'title': edited['title'],
+                    'content': edited['content'],
+                    'summary': edited['summary'],
+                    'ai_processed': True,
+                    'processed_at': asyncio.get_event_loop().time()
+                }
+            
+            # Если обработка не удалась, оставляем оригинал
+            return {
+                **news_item,
+                'content': content,
+                'summary': content[:200] + '...' if len(content) > 200 else content,
+                'ai_processed': False
+            }
+            
+        except Exception as e:
+            logger.error(f"Ошибка обработки новости: {e}")
+            # Возвращаем необработанную новость
+            return {
+                **news_item,
+                'content': news_item.get('summary', ''),
+                'ai_processed': False,
+                'error': str(e)
+            }
+    
+    async def process_news_batch(self, news_list: List[Dict]) -> List[Dict]:
+        """Обрабатывает батч новостей параллельно в пределах лимитов API"""
+        # Темп запросов задают семафор и token bucket в _make_request
+        processed_news = list(await asyncio.gather(
+            *(self._process_news_item(news_item) for news_item in news_list)
+        ))
+        
+        cache_stats = ai_cache.get_stats()
+        logger.info(
+            f"🗄️ AI кеш: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']} "
+            f"({cache_stats['hit_rate']}%), записей {cache_stats['entries']}, вытеснено {cache_stats['evictions']}"
+        )
+        await ai_cache.save_async()
         
         return processed_news
     
@@ -200,7 +386,7 @@ class TogetherAPI:
         """Тестирует соединение с API"""
         try:
             data = {
-                "model": "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo",
+                "model": self.model,
                 "messages": [
                     {
                         "role": "user",
@@ -1,58 +1,39 @@
-import feedparser
 import asyncio
-import hashlib
-from datetime import datetime
-from database import Session, User, News  # модель News нужно добавить
-from bot.user_manager import get_favorites, get_subscription, is_night_enabled
+from bot.db.database import AsyncSessionLocal
+from bot.db.news_ingest import entry_to_row, insert_new_news
+from bot.subscriber_index import subscriber_index
 from bot.bot_instance import bot  # вынеси объект бота отдельно
+from bot.services.delivery import delivery_queue, deliver
+from bot.services.near_duplicates import near_duplicates
+from bot.utils.rss_parser import fetch_feed
 from rss_feeds import RSS_FEEDS
 
 async def parse_and_distribute():
-    seen = set()
+    await subscriber_index.refresh()
 
-    session = Session()
-
-    for category, urls in RSS_FEEDS.items():
-        for url in urls:
-            feed = feedparser.parse(url)
-            for entry in feed.entries:
-                uid = hashlib.md5((entry.link).encode()).hexdigest()
-                if session.query(News).filter_by(uid=uid).first():
+    async with AsyncSessionLocal() as session:
+        for category, urls in RSS_FEEDS.items():
+            code = category_code(category)
+            for url in urls:
+                feed = await fetch_feed(url)
+                if not feed:
                     continue
 
-                title = entry.title
-                link = entry.link
-                published = entry.get("published", str(datetime.now()))
-                summary = entry.get("summary", "")
-
-                # 💾 Сохраняем новость
-                news = News(
-                    uid=uid,
-                    title=title,
-                    link=link,
-                    category=category,
-                    summary=summary,
-                    published=published
-                )
-                session.add(news)
-                session.commit()
+                # 💾 Сохраняем новые новости одной пачкой на ленту
+                rows = [entry_to_row(entry, category) for entry in feed.entries if entry.get("link")]
+                new_rows = await insert_new_news(session, rows)
+                if not new_rows:
+                    continue
 
-                # 📣 Рассылаем премиумам
-                users = session.query(User).filter(User.subscription_level == 2).all()
-                for user in users:
-                    if not is_night_enabled(user.telegram_id):
-                        now = datetime.now().hour
-                        if now < 7 or now > 22:
-                            continue
-                    favorites = get_favorites(user.telegram_id)
-                    if category_code(category) in favorites:
-                        try:
-                            msg = f"<b>{title}</b>\n{link}"
-                            await bot.send_message(user.telegram_id, msg, parse_mode="HTML")
-                        except Exception:
-                            continue
+                # 🧬 Копии одной истории получают общий id: повтор отсеивается для каждого чата
+                story_ids = await near_duplicates.assign_async(new_rows, key="uid")
 
-    session.close()
+                # 📣 Рассылаем премиумам, подписанным на категорию (тихие часы учитывает доставка)
+                await deliver([
+                    (telegram_id, story_id, f"<b>{news['title']}</b>\n{news['link']}")
+                    for news, story_id in zip(new_rows, story_ids)
+                    for telegram_id in subscriber_index.subscribers(code)
+                ], lane="premium")
 
 def category_code(label):
     mapping = {
@@ -71,6 +52,7 @@ def category_code(label):
     return mapping.get(label, "other")
 
 async def main():
+    delivery_queue.start(bot)
     while True:
         try:
             await parse_and_distribute()
@@ -1,82 +1,78 @@
 import asyncio
 import argparse
-import feedparser
-import hashlib
-from datetime import datetime
 
 from bot.bot_instance import bot
 from bot.config import logger
-from bot.user_manager import get_favorites
-from bot.db.database import Session
-from bot.models import News, User
+from bot.services.delivery import delivery_queue, deliver
+from bot.services.near_duplicates import near_duplicates
+from bot.subscriber_index import subscriber_index
+from bot.db.database import AsyncSessionLocal
+from bot.db.news_ingest import entry_to_row, insert_new_news
+from bot.utils.rss_parser import fetch_feed
 from data.rss_feeds import RSS_FEEDS
 
 
-def label_to_code(label: str) -> str:
-    mapping = {
-        "🧠 Искусственный интеллект": "ai",
-        "💻 Технологии": "technology",
-        "🎮 Игры": "gaming",
-        "📈 Крипта": "crypto",
-        "🔬 Наука": "science",
-        "📰 Политика": "politics",
-        "📉 Экономика": "economy",
-        "🎨 Культура": "culture",
-        "🌍 Мир": "world",
-        "🎬 Кино": "cinema",
-        "🩺 Медицина": "medicine"
-    }
-    reverse = {v: k for k, v in mapping.items()}
-    return reverse.get(label, None), label
-
-
-async def process_category(code: str):
-    session = Session()
-    label = None
-
-    # Найдём соответствующий emoji-label для категории
-    for lbl, urls in RSS_FEEDS.items():
-        if label_to_code(lbl) == code:
-            label = lbl
-            break
+CATEGORY_LABELS = {
+    "ai": "Искусственный интеллект",
+    "technology": "Технологии",
+    "gaming": "Игры",
+    "crypto": "Крипта",
+    "science": "Наука",
+    "politics": "Политика",
+    "economy": "Экономика",
+    "culture": "Культура",
+    "world": "Мир",
+    "cinema": "Кино",
+    "medicine": "Медицина"
+}
+
+
+async def process_category(code: str, refresh_index: bool = True) -> int:
+    """Парсит ленты категории, сохраняет новое и ставит рассылку; возвращает число новых новостей"""
+    # Найдём соответствующее название категории в RSS_FEEDS
+    label = CATEGORY_LABELS.get(code)
 
     if not label or label not in RSS_FEEDS:
         logger.error(f"⚠️ Категория {code} не найдена в RSS_FEEDS")
-        return
+        return 0
+
+    # Подписчики индексируются один раз за цикл
+    if refresh_index:
+        await subscriber_index.refresh()
 
-    for url in RSS_FEEDS[label]:
-        try:
-            feed = feedparser.parse(url)
-            for entry in feed.entries:
-                uid = hashlib.md5(entry.link.encode()).hexdigest()
+    new_total = 0
 
-                if session.query(News).filter_by(uid=uid).first():
+    async with AsyncSessionLocal() as session:
+        for url in RSS_FEEDS[label]:
+            try:
+                feed = await fetch_feed(url)
+                if not feed:
                     continue
+                # Одна проверка существующих uid и один INSERT на всю ленту
+                rows = [entry_to_row(entry, code) for entry in feed.entries if entry.get("link")]
+                new_rows = await insert_new_news(session, rows)
+                new_total += len(new_rows)
+
+                # Копии одной истории из других источников и категорий получают общий id истории:
+                # доставка отсеивает повтор для каждого чата отдельно
+                story_ids = await near_duplicates.assign_async(new_rows, key="uid")
+
+                # Рассылка уходит в очередь доставки, парсинг не ждет Telegram
+                subscribers = subscriber_index.subscribers(code)
+                await deliver([
+                    (telegram_id, story_id, f"<b>{news['title']}</b>\n{news['link']}")
+                    for news, story_id in zip(new_rows, story_ids)
+                    for telegram_id in subscribers
+                ], lane="premium")
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Парсинг {url} не удался: {e}")
 
-                news = News(
-                    uid=uid,
-                    title=entry.title,
-                    link=entry.link,
-                    category=code,
-                    summary=entry.get("summary", "")[:1000],
-                    published=datetime.now()
-                )
-                session.add(news)
-                session.commit()
-
-                for user in session.query(User).filter(User.subscription_level == 2).all():
-                    if code in get_favorites(user.telegram_id):
-                        try:
-                            await bot.send_message(user.telegram_id, f"<b>{entry.title}</b>\n{entry.link}", parse_mode="HTML")
-                        except Exception as e:
-                            logger.warning(f"Не отправлено {user.telegram_id}: {e}")
-        except Exception as e:
-            logger.error(f"Парсинг {url} не удался: {e}")
-
-    session.close()
+    return new_total
 
 
 async def category_loop(code: str):
+    delivery_queue.start(bot)
     while True:
         await process_category(code)
         await asyncio.sleep(600)
@@ -1,20 +1,28 @@
 import asyncio
 from datetime import datetime, timedelta
-from bot.db.database import Session
-from bot.models import News
+from sqlalchemy import delete
+from bot.db.database import AsyncSessionLocal
+from bot.db.news_partitions import maintain_partitions, drop_expired_partitions
+from bot.models import News, NewsUid
 from bot.config import logger
 
 async def cleanup_old_news():
-    session = Session()
-    try:
-        threshold = datetime.now() - timedelta(hours=48)
-        deleted = session.query(News).filter(News.published < threshold).delete()
-        session.commit()
-        logger.info(f"🧹 Удалено {deleted} устаревших новостей")
-    except Exception as e:
-        logger.error(f"Ошибка автоудаления: {e}")
-    finally:
-        session.close()
+    async with AsyncSessionLocal() as session:
+        try:
+            threshold = datetime.now() - timedelta(hours=48)
+            # uid старше окна хранения больше не защищают от повторной вставки
+            await session.execute(delete(NewsUid).where(NewsUid.seen_at < threshold))
+            if await maintain_partitions(session):
+                # Секционированная таблица: вместо большого DELETE удаляем дневные секции целиком
+                dropped = await drop_expired_partitions(session, threshold)
+                await session.commit()
+                logger.info(f"🧹 Удалено секций новостей: {len(dropped)} {dropped}")
+            else:
+                result = await session.execute(delete(News).where(News.published < threshold))
+                await session.commit()
+                logger.info(f"🧹 Удалено {result.rowcount} устаревших новостей")
+        except Exception as e:
+            logger.error(f"Ошибка автоудаления: {e}")
 
 async def cleanup_loop():
     while True:
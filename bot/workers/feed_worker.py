@@ -1,14 +1,13 @@
 import asyncio
-import feedparser
-import hashlib
-from datetime import datetime
-from bot.user_manager import get_subscription, get_favorites
+from bot.subscriber_index import subscriber_index
 from bot.config import logger
 from bot.bot_instance import bot  # объект Bot должен быть импортирован отсюда
+from bot.services.delivery import delivery_queue, deliver
+from bot.services.near_duplicates import near_duplicates
+from bot.db.news_ingest import entry_to_row, insert_new_news
+from bot.utils.rss_parser import fetch_feed
 from data.rss_feeds import RSS_FEEDS
-from data.database import Session
-from data.models.news import News
-from data.models.user import User
+from bot.db.database import AsyncSessionLocal
 
 
 def category_code(label: str) -> str:
@@ -29,46 +28,37 @@ def category_code(label: str) -> str:
 
 
 async def parse_and_distribute():
-    session = Session()
-    for label, urls in RSS_FEEDS.items():
-        code = category_code(label)
-        for url in urls:
-            try:
-                feed = feedparser.parse(url)
-                for entry in feed.entries:
-                    uid = hashlib.md5(entry.link.encode()).hexdigest()
-
-                    # пропускаем если уже есть
-                    if session.query(News).filter_by(uid=uid).first():
+    # подписчики индексируются один раз за цикл
+    await subscriber_index.refresh()
+    async with AsyncSessionLocal() as session:
+        for label, urls in RSS_FEEDS.items():
+            code = category_code(label)
+            for url in urls:
+                try:
+                    feed = await fetch_feed(url)
+                    if not feed:
                         continue
+                    # пакетная вставка: уже существующие uid отсеиваются одним запросом
+                    rows = [entry_to_row(entry, code) for entry in feed.entries if entry.get("link")]
+                    new_rows = await insert_new_news(session, rows)
 
-                    news = News(
-                        uid=uid,
-                        title=entry.title,
-                        link=entry.link,
-                        category=code,
-                        summary=entry.get("summary", "")[:1000],
-                        published=datetime.now()
-                    )
-                    session.add(news)
-                    session.commit()
+                    # копии одной истории получают общий id: повтор отсеивается для каждого чата
+                    story_ids = await near_duplicates.assign_async(new_rows, key="uid")
 
-                    # отсылаем премиумам
-                    premium_users = session.query(User).filter(User.subscription_level == 2).all()
-                    for user in premium_users:
-                        favorites = get_favorites(user.telegram_id)
-                        if code in favorites:
-                            try:
-                                text = f"<b>{entry.title}</b>\n{entry.link}"
-                                await bot.send_message(user.telegram_id, text, parse_mode="HTML")
-                            except Exception as e:
-                                logger.warning(f"Не удалось отправить {user.telegram_id}: {e}")
-            except Exception as e:
-                logger.error(f"Ошибка парсинга {url}: {e}")
-    session.close()
+                    # отсылаем премиумам через очередь доставки
+                    subscribers = subscriber_index.subscribers(code)
+                    await deliver([
+                        (telegram_id, story_id, f"<b>{news['title']}</b>\n{news['link']}")
+                        for news, story_id in zip(new_rows, story_ids)
+                        for telegram_id in subscribers
+                    ], lane="premium")
+                except Exception as e:
+                    await session.rollback()
+                    logger.error(f"Ошибка парсинга {url}: {e}")
 
 
 async def worker_loop():
+    delivery_queue.start(bot)
     while True:
         await parse_and_distribute()
         await asyncio.sleep(600)  # каждые 10 минут
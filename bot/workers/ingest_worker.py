@@ -0,0 +1,122 @@
+import asyncio
+import argparse
+import time
+
+from bot.bot_instance import bot
+from bot.config import config, logger
+from bot.db.database import AsyncSessionLocal, async_engine
+from bot.db.news_partitions import maintain_partitions
+from bot.services.delivery import delivery_queue
+from bot.subscriber_index import subscriber_index
+from bot.utils.fetch_engine import fetch_engine
+from bot.utils.parse_executor import parse_executor
+from bot.workers.category_worker import CATEGORY_LABELS, process_category
+
+
+# Время обработки по категориям: код -> статистика последних запусков
+category_timings = {}
+
+
+def parse_shard(value: str):
+    """Разбирает --shard i/N"""
+    index, total = (int(part) for part in value.split("/"))
+    if total < 1 or not 0 <= index < total:
+        raise argparse.ArgumentTypeError("shard должен быть в виде i/N, где 0 <= i < N")
+    return index, total
+
+
+def shard_categories(index: int, total: int):
+    """Категории, которые обрабатывает этот процесс"""
+    return [code for position, code in enumerate(CATEGORY_LABELS) if position % total == index]
+
+
+async def run_category(code: str, interval: int, offset: float):
+    """Цикл одной категории внутри общего процесса"""
+    # Старты разнесены по интервалу, чтобы категории не опрашивались одновременно
+    await asyncio.sleep(offset)
+
+    while True:
+        started = time.monotonic()
+        try:
+            new_items = await process_category(code, refresh_index=False)
+        except Exception as e:
+            new_items = 0
+            logger.error(f"❌ Ошибка ingest категории {code}: {e}")
+        duration = time.monotonic() - started
+
+        timing = category_timings.setdefault(code, {"runs": 0, "total_seconds": 0.0})
+        timing["runs"] += 1
+        timing["total_seconds"] += duration
+        timing["last_seconds"] = round(duration, 2)
+        timing["last_new_items"] = new_items
+        logger.info(f"⏱️ {code}: {duration:.1f} сек, новых новостей {new_items}")
+
+        await asyncio.sleep(max(0, interval - duration))
+
+
+async def refresh_index_loop(interval: int):
+    """Один общий индекс подписчиков на все категории процесса"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await subscriber_index.refresh()
+        except Exception as e:
+            logger.error(f"❌ Ошибка обновления индекса подписчиков: {e}")
+
+
+async def partition_loop(interval: int = 3600):
+    """Секции news на несколько дней вперед создаются до того, как в них пойдут вставки"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as session:
+                await maintain_partitions(session)
+        except Exception as e:
+            logger.error(f"❌ Ошибка подготовки секций news: {e}")
+        await asyncio.sleep(interval)
+
+
+async def report_loop(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        report = ", ".join(
+            f"{code} {timing['last_seconds']}с/ср {timing['total_seconds'] / timing['runs']:.1f}с"
+            for code, timing in sorted(category_timings.items())
+        )
+        logger.info(f"📊 Время категорий: {report}")
+
+
+async def ingest_loop(categories, interval: int):
+    logger.info(f"🚀 Ingest процесс: {len(categories)} категорий ({', '.join(categories)})")
+
+    # Пул HTTP соединений, движок БД и клиент бота общие для всех категорий процесса
+    delivery_queue.start(bot)
+    await subscriber_index.refresh()
+
+    step = interval / max(len(categories), 1)
+    tasks = [
+        asyncio.create_task(partition_loop()),
+        asyncio.create_task(refresh_index_loop(interval)),
+        asyncio.create_task(report_loop(interval)),
+    ]
+    tasks += [
+        asyncio.create_task(run_category(code, interval, position * step))
+        for position, code in enumerate(categories)
+    ]
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await delivery_queue.stop()
+        await fetch_engine.close()
+        parse_executor.shutdown()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Общий RSS воркер для всех категорий")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="Доля категорий процесса: i/N")
+    args = parser.parse_args()
+
+    asyncio.run(ingest_loop(shard_categories(*args.shard), config.INGEST_INTERVAL_SECONDS))
@@ -10,6 +10,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 # ✅ Импорт модели базы и, при необходимости, настроек
 from bot.db.base import Base
+import bot.models  # noqa: F401 - регистрирует таблицы в Base.metadata
 
 # Alembic конфигурация
 config = context.config
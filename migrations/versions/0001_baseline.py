@@ -0,0 +1,58 @@
+"""baseline: users и news
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Таблицы могли быть созданы раньше через init_db() - создаем только отсутствующие
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if "news" not in tables:
+        op.create_table(
+            "news",
+            sa.Column("uid", sa.String(), primary_key=True),
+            sa.Column("title", sa.Text()),
+            sa.Column("link", sa.String()),
+            sa.Column("category", sa.String()),
+            sa.Column("summary", sa.Text()),
+            sa.Column("published", sa.DateTime()),
+        )
+
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("telegram_id", sa.BigInteger(), primary_key=True),
+            sa.Column("subscription_level", sa.Integer(), server_default="0"),
+            sa.Column("night_news", sa.Boolean(), server_default=sa.false()),
+            sa.Column("favorite_categories", sa.Text(), server_default="[]"),
+        )
+        return
+
+    columns = {column["name"]: column for column in inspector.get_columns("users")}
+    if not isinstance(columns["telegram_id"]["type"], sa.BigInteger):
+        op.alter_column(
+            "users", "telegram_id",
+            type_=sa.BigInteger(),
+            postgresql_using="telegram_id::bigint",
+        )
+    if "night_news" not in columns:
+        op.add_column("users", sa.Column("night_news", sa.Boolean(), server_default=sa.false()))
+    if "favorite_categories" not in columns:
+        op.add_column("users", sa.Column("favorite_categories", sa.Text(), server_default="[]"))
+
+
+def downgrade():
+    op.drop_table("users")
+    op.drop_table("news")
@@ -0,0 +1,97 @@
+"""news: индексы по (category, published) и published, опционально секционирование по дням
+
+Секционирование включается переменной окружения NEWS_PARTITIONING=true при запуске миграции.
+Тогда news становится RANGE (published) таблицей с дневными секциями, и
+cleanup_worker удаляет устаревшие секции целиком вместо DELETE.
+
+Revision ID: 0002_news_indexes_partitions
+Revises: 0001_baseline
+Create Date: 2026-10-18
+"""
+import os
+from datetime import date, timedelta
+
+from alembic import op
+
+from bot.db.news_partitions import DEFAULT_PARTITION, create_partition_sql
+
+
+revision = "0002_news_indexes_partitions"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+PARTITIONING = os.getenv("NEWS_PARTITIONING", "false").lower() == "true"
+
+
+def create_indexes(**kwargs):
+    op.create_index("ix_news_category_published", "news", ["category", "published"], **kwargs)
+    op.create_index("ix_news_published", "news", ["published"], **kwargs)
+
+
+def upgrade():
+    if not PARTITIONING:
+        # CONCURRENTLY не блокирует запись в news на время построения индексов
+        with op.get_context().autocommit_block():
+            create_indexes(postgresql_concurrently=True, if_not_exists=True)
+        return
+
+    op.execute("ALTER TABLE news RENAME TO news_unpartitioned")
+    op.execute("ALTER TABLE news_unpartitioned RENAME CONSTRAINT news_pkey TO news_unpartitioned_pkey")
+    # Индексы могли появиться через init_db() - имена нужны новой таблице
+    op.execute("DROP INDEX IF EXISTS ix_news_category_published")
+    op.execute("DROP INDEX IF EXISTS ix_news_published")
+
+    # Ключ секционирования обязан входить в первичный ключ
+    op.execute("""
+        CREATE TABLE news (
+            uid VARCHAR NOT NULL,
+            title TEXT,
+            link VARCHAR,
+            category VARCHAR,
+            summary TEXT,
+            published TIMESTAMP NOT NULL,
+            PRIMARY KEY (uid, published)
+        ) PARTITION BY RANGE (published)
+    """)
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF news DEFAULT")
+
+    today = date.today()
+    for offset in range(-2, 4):
+        op.execute(create_partition_sql(today + timedelta(days=offset)))
+
+    # Индексы на родительской таблице создаются во всех секциях
+    create_indexes()
+
+    # Переносим только новости из окна хранения, остальное все равно ушло бы в очистку
+    op.execute("""
+        INSERT INTO news (uid, title, link, category, summary, published)
+        SELECT uid, title, link, category, summary, COALESCE(published, now())
+        FROM news_unpartitioned
+        WHERE published IS NULL OR published >= now() - interval '48 hours'
+    """)
+    op.execute("DROP TABLE news_unpartitioned")
+
+
+def downgrade():
+    if not PARTITIONING:
+        op.drop_index("ix_news_published", table_name="news")
+        op.drop_index("ix_news_category_published", table_name="news")
+        return
+
+    op.execute("ALTER TABLE news RENAME TO news_partitioned")
+    op.execute("""
+        CREATE TABLE news (
+            uid VARCHAR PRIMARY KEY,
+            title TEXT,
+            link VARCHAR,
+            category VARCHAR,
+            summary TEXT,
+            published TIMESTAMP
+        )
+    """)
+    op.execute("""
+        INSERT INTO news SELECT DISTINCT ON (uid) uid, title, link, category, summary, published
+        FROM news_partitioned ORDER BY uid, published
+    """)
+    op.execute("DROP TABLE news_partitioned CASCADE")
@@ -0,0 +1,22 @@
+"""users.timezone для тихих часов
+
+Revision ID: 0003_user_timezone
+Revises: 0002_news_indexes_partitions
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_user_timezone"
+down_revision = "0002_news_indexes_partitions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("timezone", sa.String(), server_default="Europe/Moscow"))
+
+
+def downgrade():
+    op.drop_column("users", "timezone")
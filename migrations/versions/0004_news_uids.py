@@ -0,0 +1,36 @@
+"""news_uids: уникальность uid новостей независимо от секционирования news
+
+Revision ID: 0004_news_uids
+Revises: 0003_user_timezone
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_news_uids"
+down_revision = "0003_user_timezone"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "news_uids",
+        sa.Column("uid", sa.String(), primary_key=True),
+        sa.Column("seen_at", sa.DateTime(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_news_uids_seen_at", "news_uids", ["seen_at"], if_not_exists=True)
+
+    # Уже сохраненные новости не должны разослаться повторно
+    op.execute("""
+        INSERT INTO news_uids (uid, seen_at)
+        SELECT uid, COALESCE(max(published), now()) FROM news GROUP BY uid
+        ON CONFLICT (uid) DO NOTHING
+    """)
+
+
+def downgrade():
+    op.drop_index("ix_news_uids_seen_at", table_name="news_uids")
+    op.drop_table("news_uids")
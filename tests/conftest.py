@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Конфигурация читается при импорте bot.config - окружение задается до импорта модулей бота
+os.environ.setdefault("BOT_TOKEN", "123456789:test-token")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ.setdefault("TOGETHER_API_KEY", "test-key")
+os.environ.setdefault("NEWS_ARCHIVE_PATH", tempfile.mkdtemp(prefix="news_archive_"))
+os.environ["REDIS_URL"] = "fakeredis://"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import asynccontextmanager
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import feedparser
+
+from bot.config import config
+from bot.utils import rss_parser
+from bot.utils.rss_parser import RSSParser
+
+
+class FakeContent:
+    def __init__(self, body: bytes, chunk_size: int):
+        self.chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)]
+
+    async def iter_chunked(self, size):
+        while self.chunks:
+            yield self.chunks.pop(0)
+
+
+class FakeResponse:
+    url = "https://example.com/feed.xml"
+    status = 200
+    headers = {}
+
+    def __init__(self, body: bytes, chunk_size: int = 64):
+        self.body = body
+        self.content = FakeContent(body, chunk_size)
+
+
+def make_feed(descriptions):
+    now = datetime.now(timezone.utc)
+    items = "".join(
+        f"<item><title>T{number}</title><link>https://example.com/{number}</link>"
+        f"<pubDate>{format_datetime(now - timedelta(minutes=number))}</pubDate>"
+        f"<description>{description}</description></item>"
+        for number, description in enumerate(descriptions, 1)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title>{items}</channel></rss>'.encode()
+
+
+def test_stream_falls_back_to_feedparser_on_mid_feed_entity():
+    body = make_feed(["one", "two", "three&nbsp;four", "four", "five"])
+    parser = RSSParser()
+
+    streamed = asyncio.run(parser._stream_entries(FakeResponse(body), FakeResponse.url, max_items=10))
+
+    # Частичный список (T1, T2) не возвращается - тело целиком уходит в feedparser
+    assert streamed['entries'] == []
+    assert streamed['content'] == body
+    assert parser.stats['fallback'] == 1
+    assert len(feedparser.parse(streamed['content']).entries) == 5
+
+
+def test_stream_reads_valid_feed_without_fallback():
+    body = make_feed(["one", "two", "three"])
+    parser = RSSParser()
+
+    streamed = asyncio.run(parser._stream_entries(FakeResponse(body), FakeResponse.url, max_items=10))
+
+    assert [entry['title'] for entry, _ in streamed['entries']] == ["T1", "T2", "T3"]
+    assert streamed['content'] is None
+
+
+def test_unchanged_feed_restores_all_fresh_items(monkeypatch):
+    body = make_feed(["one", "two", "three", "four", "five"])
+    url = "https://example.com/unchanged.xml"
+
+    @asynccontextmanager
+    async def stream(feed_url, headers=None):
+        yield FakeResponse(body)
+
+    async def read_body(response, chunks=None, size=0):
+        return response.body
+
+    monkeypatch.setattr(config, "FEED_STREAMING", False)
+    monkeypatch.setattr(rss_parser.fetch_engine, "stream", stream)
+    monkeypatch.setattr(rss_parser.fetch_engine, "read_body", read_body)
+    parser = RSSParser()
+
+    first = asyncio.run(parser.parse_feed(url, max_items=2))
+    second = asyncio.run(parser.parse_feed(url, max_items=5))
+
+    # В кеше ленты все свежие новости, а не первые max_items первого вызова
+    assert [item['title'] for item in first] == ["T1", "T2"]
+    assert [item['title'] for item in second] == ["T1", "T2", "T3", "T4", "T5"]
+    assert parser.stats['unchanged'] == 1
@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+import pytest
+from rq import SimpleWorker
+
+from bot import tasks
+from bot.utils.rate_limiter import RedisTokenBucket
+
+
+class FakeResponse:
+    def __init__(self, data, headers=None):
+        self.data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture(autouse=True)
+def clean_redis():
+    tasks.conn.flushall()
+    yield
+    tasks.conn.flushall()
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    """Подменяет Bot API: ответы берутся из списка, запросы записываются"""
+    calls = []
+    responses = []
+
+    def post(url, json=None, timeout=None):
+        calls.append(json)
+        return responses.pop(0) if responses else FakeResponse({"ok": True})
+
+    monkeypatch.setattr(tasks.http, "post", post)
+    return SimpleNamespace(calls=calls, responses=responses)
+
+
+def test_enqueue_deliveries_is_idempotent():
+    deliveries = [(1, "premium", "uid-1", "text"), (2, "basic", "uid-1", "text")]
+
+    assert tasks.enqueue_deliveries(deliveries) == 2
+    # Повторная постановка тех же доставок (другой воркер, повтор цикла) ничего не добавляет
+    assert tasks.enqueue_deliveries(deliveries) == 0
+
+    assert tasks.queues["premium"].count == 1
+    assert tasks.queues["basic"].count == 1
+    assert tasks.conn.get(f"delivery:{tasks.delivery_id(1, 'uid-1')}") == b"queued"
+
+
+def test_send_news_skips_already_sent(telegram):
+    key = f"delivery:{tasks.delivery_id(1, 'uid-1')}"
+
+    assert tasks.send_news(1, "text", key) == "sent"
+    assert tasks.conn.get(key) == b"sent"
+
+    # Повтор задачи после сбоя воркера не отправляет сообщение второй раз
+    assert tasks.send_news(1, "text", key) == "duplicate"
+    assert len(telegram.calls) == 1
+
+
+def test_send_news_blocked_is_not_retried(telegram):
+    key = f"delivery:{tasks.delivery_id(1, 'uid-1')}"
+    telegram.responses.append(FakeResponse({"ok": False, "error_code": 403, "description": "blocked"}))
+
+    assert tasks.send_news(1, "text", key) == "blocked"
+    assert tasks.conn.get(key) == b"blocked"
+
+
+def test_failed_job_is_scheduled_for_retry(telegram):
+    telegram.responses.append(FakeResponse({"ok": False, "error_code": 500, "description": "error"}))
+    tasks.enqueue_deliveries([(1, "basic", "uid-1", "text")])
+
+    SimpleWorker([tasks.queues["basic"]], connection=tasks.conn).work(burst=True)
+
+    job = tasks.queues["basic"].fetch_job(f"delivery-{tasks.delivery_id(1, 'uid-1')}")
+    assert job.get_status() == "scheduled"
+    assert job.retries_left == 2
+    # Пока попытки остались, ключ держит доставку от повторной постановки
+    assert tasks.conn.get(f"delivery:{tasks.delivery_id(1, 'uid-1')}") == b"queued"
+
+
+def test_last_failure_releases_delivery_key():
+    key = f"delivery:{tasks.delivery_id(1, 'uid-1')}"
+    tasks.conn.set(key, "queued")
+
+    tasks.delivery_failed(SimpleNamespace(retries_left=1, args=(1, "text", key)), tasks.conn, RuntimeError, RuntimeError(), None)
+    assert tasks.conn.get(key) == b"queued"
+
+    tasks.delivery_failed(SimpleNamespace(retries_left=0, args=(1, "text", key)), tasks.conn, RuntimeError, RuntimeError(), None)
+    assert tasks.conn.get(key) is None
+    assert tasks.enqueue_deliveries([(1, "basic", "uid-1", "text")]) == 1
+
+
+def test_rate_limited_send_pauses_and_defers(telegram):
+    telegram.responses.append(FakeResponse({"ok": False, "error_code": 429, "parameters": {"retry_after": 5}}))
+
+    assert tasks.send_news(1, "text", "delivery:x") == "deferred"
+    assert 0 < tasks.conn.pttl(tasks.PAUSE_KEY) <= 5000
+    assert tasks.queues["basic"].scheduled_job_registry.count == 1
+
+    # Во время паузы другие отправки тоже откладываются, не обращаясь к Telegram
+    assert tasks.send_news(2, "text", "delivery:y") == "deferred"
+    assert len(telegram.calls) == 1
+
+
+def test_redis_token_bucket_limits_rate():
+    bucket = RedisTokenBucket(tasks.conn, "test:bucket", rate=1, capacity=2)
+
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+
+
+def test_sent_news_is_marked_viewed(telegram):
+    from bot.news_memory import read_history
+
+    tasks.send_news(7, "text", "delivery:z", "uid-7")
+
+    assert read_history.filter_unseen(7, ["uid-7", "uid-8"]) == ["uid-8"]
+    assert not read_history.pending
+
+
+def test_deliveries_without_uid_are_not_deduplicated():
+    deliveries = [(1, "basic", None, "first"), (1, "basic", None, "second"), (1, "basic", None, "third")]
+
+    assert tasks.enqueue_deliveries(deliveries) == 3
+    # Без uid нет ключа идемпотентности - следующая рассылка тоже ставится
+    assert tasks.enqueue_deliveries([(1, "basic", None, "next day")]) == 1
+    assert tasks.queues["basic"].count == 4
+    assert not tasks.conn.keys("delivery:*")